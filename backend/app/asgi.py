@@ -1,4 +1,6 @@
 import os
 from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+os.environ.setdefault('ASYNC_READ_VIEWS', '1')
+os.environ.setdefault('DB_CONNECTION_MODE', 'pool')
 application = get_asgi_application()
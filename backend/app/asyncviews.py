@@ -0,0 +1,128 @@
+from functools import update_wrapper
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.http import Http404
+from rest_framework import exceptions
+from rest_framework.response import Response
+from app.users.permissions import aget_roles
+
+
+class AsyncReadMixin:
+    """
+    Executa as leituras listadas em `async_handlers` (ação ou método HTTP -> handler
+    assíncrono) fora de uma thread de worker: autenticação, papéis e consultas usam o
+    ORM assíncrono. Escritas e demais ações seguem pelo caminho síncrono do DRF.
+    Ligado com `ASYNC_READ_VIEWS = True` (padrão do `app/asgi.py`). Com
+    `async_prime_roles` os papéis do usuário são carregados antes das permissões, que
+    assim podem chamar `is_admin`/`is_instructor` sem consultar o banco.
+    """
+    async_handlers = {}
+    async_prime_roles = True
+    async_dispatch = False
+
+    @classmethod
+    def as_view(cls, *args, **initkwargs):
+        if not (cls.async_handlers and getattr(settings, 'ASYNC_READ_VIEWS', False)):
+            return super().as_view(*args, **initkwargs)
+        view = super().as_view(*args, async_dispatch=True, **initkwargs)
+        sync_view = sync_to_async(view)
+
+        async def async_view(request, *args, **kwargs):
+            if cls._async_handler_name(getattr(view, 'actions', None), request.method.lower()):
+                return await view(request, *args, **kwargs).run()
+            return await sync_view(request, *args, **kwargs)
+
+        return update_wrapper(async_view, view)
+
+    @classmethod
+    def _async_handler_name(cls, actions, method):
+        return cls.async_handlers.get(actions.get(method) if actions is not None else method)
+
+    def dispatch(self, request, *args, **kwargs):
+        name = self._async_handler_name(getattr(self, 'action_map', None), request.method.lower())
+        if self.async_dispatch and name:
+            return AsyncDispatch(self, getattr(self, name), request, args, kwargs)
+        return super().dispatch(request, *args, **kwargs)
+
+    async def aperform_authentication(self, request):
+        for authenticator in request.authenticators:
+            try:
+                if hasattr(authenticator, 'aauthenticate'):
+                    user_auth_tuple = await authenticator.aauthenticate(request)
+                else:
+                    user_auth_tuple = await sync_to_async(authenticator.authenticate)(request)
+            except exceptions.APIException:
+                request._not_authenticated()
+                raise
+            if user_auth_tuple is not None:
+                request._authenticator = authenticator
+                request.user, request.auth = user_auth_tuple
+                return
+        request._not_authenticated()
+
+    async def ainitial(self, request, *args, **kwargs):
+        self.format_kwarg = self.get_format_suffix(**kwargs)
+        request.accepted_renderer, request.accepted_media_type = self.perform_content_negotiation(request)
+        request.version, request.versioning_scheme = self.determine_version(request, *args, **kwargs)
+        await self.aperform_authentication(request)
+        if self.async_prime_roles:
+            await aget_roles(request.user)
+        self.check_permissions(request)
+        if any(getattr(throttle, 'applies', lambda r: True)(request) for throttle in self.get_throttles()):
+            await sync_to_async(self.check_throttles)(request)
+
+    async def afilter_queryset(self, queryset):
+        return await sync_to_async(self.filter_queryset)(queryset)
+
+    async def aget_object(self):
+        queryset = await self.afilter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            obj = await queryset.aget(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        except (queryset.model.DoesNotExist, TypeError, ValueError, ValidationError):
+            raise Http404
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+    def list_response(self, queryset):
+        """`ListModelMixin.list` sobre `queryset` já filtrado (os filtros validam uma vez só)."""
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        return Response(self.get_serializer(queryset, many=True).data)
+
+    async def alist_response(self, queryset):
+        page = await self.paginator.apaginate_queryset(queryset, self.request, view=self) if self.paginator else None
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        return Response(self.get_serializer([obj async for obj in queryset], many=True).data)
+
+    async def aretrieve_response(self):
+        return Response(self.get_serializer(await self.aget_object()).data)
+
+
+class AsyncDispatch:
+    """Equivalente assíncrono de `APIView.dispatch` para um handler de leitura."""
+
+    def __init__(self, view, handler, request, args, kwargs):
+        self.view = view
+        self.handler = handler
+        self.request = request
+        self.args = args
+        self.kwargs = kwargs
+
+    async def run(self):
+        view, args, kwargs = self.view, self.args, self.kwargs
+        view.args = args
+        view.kwargs = kwargs
+        request = view.initialize_request(self.request, *args, **kwargs)
+        view.request = request
+        view.headers = view.default_response_headers
+        try:
+            await view.ainitial(request, *args, **kwargs)
+            response = await self.handler(request, *args, **kwargs)
+        except Exception as exc:
+            response = view.handle_exception(exc)
+        view.response = view.finalize_response(request, response, *args, **kwargs)
+        return view.response
@@ -4,3 +4,6 @@ class ClassesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'app.classes'
     label = 'classes'
+
+    def ready(self):
+        from . import signals
@@ -0,0 +1,69 @@
+import time
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from app.enrollments.models import ArchivedEnrollment, Enrollment
+from .models import ArchivedClass, Class, archive_cutoff
+
+CLASS_FIELDS = (
+    'id', 'title', 'description', 'start_datetime', 'instructor_id', 'capacity', 'participants_count',
+    'created_at', 'updated_at',
+)
+ENROLLMENT_FIELDS = ('id', 'student_id', 'class_ref_id', 'created_at', 'updated_at')
+
+
+def pending(cutoff):
+    """(aulas, inscrições) anteriores a `cutoff` ainda nas tabelas vivas."""
+    classes = Class.objects.filter(start_datetime__lt=cutoff)
+    return classes.count(), Enrollment.objects.filter(class_ref__in=classes).count()
+
+
+def archive_classes(cutoff, batch_size=1000, class_batch_size=100, pause=0):
+    """
+    Move aulas com início antes de `cutoff`, e suas inscrições, para `ArchivedClass` e
+    `ArchivedEnrollment`. Cada transação copia e apaga no máximo `batch_size` inscrições
+    (abaixo do limite de escalonamento de locks do SQL Server, 5000), e a última de cada
+    grupo de `class_batch_size` aulas move as aulas já sem inscrições, travando-as para
+    que nenhuma inscrição nova entre no meio. Gera `(aulas, inscrições, segundos)` por
+    transação; `pause` espera entre transações para dar vez às requisições. `cutoff` não
+    pode passar de `archive_cutoff()`: só aulas que já recusam inscrições são movidas.
+    """
+    if cutoff > archive_cutoff():
+        raise ValueError('cutoff posterior ao corte de inscrições (CLASS_ARCHIVE_AFTER_DAYS).')
+    while True:
+        ids = list(
+            Class.objects.filter(start_datetime__lt=cutoff)
+            .order_by('start_datetime', 'id')
+            .values_list('pk', flat=True)[:class_batch_size]
+        )
+        if not ids:
+            return
+        while True:
+            start = time.perf_counter()
+            with transaction.atomic():
+                rows = list(
+                    Enrollment.objects.filter(class_ref_id__in=ids)
+                    .order_by('pk')
+                    .values(*ENROLLMENT_FIELDS)[:batch_size]
+                )
+                if not rows:
+                    break
+                ArchivedEnrollment.objects.bulk_create([ArchivedEnrollment(**row) for row in rows])
+                # Sem descontar vagas: a aula sai logo depois com o contador que tinha.
+                Enrollment.objects.filter(pk__in=[row['id'] for row in rows]).delete(release=False)
+            yield 0, len(rows), time.perf_counter() - start
+            time.sleep(pause)
+        start = time.perf_counter()
+        with transaction.atomic():
+            rows = list(
+                Class.objects.select_for_update()
+                .filter(pk__in=ids)
+                .exclude(Exists(Enrollment.objects.filter(class_ref=OuterRef('pk'))))
+                .values(*CLASS_FIELDS)
+            )
+            moved = [row['id'] for row in rows]
+            ArchivedClass.objects.bulk_create([ArchivedClass(**row) for row in rows])
+            if moved:
+                # O `post_delete` de `Class` invalida o cache e publica `class.deleted`.
+                Class.objects.filter(pk__in=moved).delete()
+        yield len(moved), 0, time.perf_counter() - start
+        time.sleep(pause)
@@ -0,0 +1,107 @@
+import hashlib
+import time
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+VERSION_KEY = 'classes:version'
+HITS_KEY = 'classes:stats:hits'
+MISSES_KEY = 'classes:stats:misses'
+
+
+def get_cache():
+    return caches[getattr(settings, 'CLASS_CACHE_ALIAS', 'default')]
+
+
+def _incr(key):
+    cache = get_cache()
+    cache.add(key, 0, None)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+        return 1
+
+
+async def _aincr(key):
+    cache = get_cache()
+    await cache.aadd(key, 0, None)
+    try:
+        return await cache.aincr(key)
+    except ValueError:
+        await cache.aset(key, 1, None)
+        return 1
+
+
+def current_version():
+    cache = get_cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, time.time_ns(), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+async def acurrent_version():
+    cache = get_cache()
+    version = await cache.aget(VERSION_KEY)
+    if version is None:
+        await cache.aadd(VERSION_KEY, time.time_ns(), None)
+        version = await cache.aget(VERSION_KEY)
+    return version
+
+
+def _bump():
+    cache = get_cache()
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, time.time_ns(), None)
+
+
+def bump_version():
+    _bump()
+    transaction.on_commit(_bump)
+
+
+def stats():
+    cache = get_cache()
+    return {
+        'version': current_version(),
+        'hits': cache.get(HITS_KEY, 0),
+        'misses': cache.get(MISSES_KEY, 0),
+    }
+
+
+def page_key(request, version):
+    params = sorted((k, v) for k, values in request.query_params.lists() for v in values)
+    raw = f'{request.scheme}://{request.get_host()}{request.path}|{params}'
+    return f'classes:v{version}:{hashlib.md5(raw.encode()).hexdigest()}'
+
+
+def lookup(request):
+    if not getattr(settings, 'CLASS_CACHE_TIMEOUT', 300):
+        return None, None
+    key = page_key(request, current_version())
+    data = get_cache().get(key)
+    _incr(HITS_KEY if data is not None else MISSES_KEY)
+    return key, data
+
+
+async def alookup(request):
+    if not getattr(settings, 'CLASS_CACHE_TIMEOUT', 300):
+        return None, None
+    key = page_key(request, await acurrent_version())
+    data = await get_cache().aget(key)
+    await _aincr(HITS_KEY if data is not None else MISSES_KEY)
+    return key, data
+
+
+def store(key, data):
+    if key:
+        get_cache().set(key, data, getattr(settings, 'CLASS_CACHE_TIMEOUT', 300))
+
+
+async def astore(key, data):
+    if key:
+        await get_cache().aset(key, data, getattr(settings, 'CLASS_CACHE_TIMEOUT', 300))
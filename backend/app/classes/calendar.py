@@ -0,0 +1,99 @@
+import secrets
+from datetime import timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.db.models import Q
+from django.utils import timezone
+from app.users.models import UserProfile
+from .filters import involving
+from .models import Class
+
+SALT = 'app.classes.calendar'
+CONTENT_TYPE = 'text/calendar; charset=utf-8'
+
+
+def _sign(user, nonce):
+    return signing.Signer(salt=SALT).sign(f'{user.pk}:{nonce}')
+
+
+def feed_token(user):
+    """
+    Token assinado do feed de `user` (calendários não enviam cabeçalhos). Leva o
+    `UserProfile.calendar_nonce` atual, então vale até `rotate_feed_token`.
+    """
+    return _sign(user, UserProfile.objects.filter(user=user).values_list('calendar_nonce', flat=True).first() or '')
+
+
+def rotate_feed_token(user):
+    """Troca o nonce de `user`, invalidando os links já distribuídos, e devolve o token novo."""
+    nonce = secrets.token_urlsafe(16)
+    UserProfile.objects.update_or_create(user=user, defaults={'calendar_nonce': nonce})
+    return _sign(user, nonce)
+
+
+def feed_user(token):
+    try:
+        pk, _, nonce = signing.Signer(salt=SALT).unsign(token).partition(':')
+    except signing.BadSignature:
+        return None
+    current = Q(profile__calendar_nonce=nonce)
+    if not nonce:
+        current |= Q(profile__isnull=True)
+    return get_user_model().objects.filter(current, pk=pk, is_active=True).first()
+
+
+def feed_queryset(user):
+    """Aulas do feed: ministradas ou inscritas, de `CLASS_CALENDAR_PAST_DAYS` atrás em diante."""
+    since = timezone.now() - timedelta(days=getattr(settings, 'CLASS_CALENDAR_PAST_DAYS', 30))
+    return Class.objects.filter(involving(user), start_datetime__gte=since)
+
+
+def _escape(value):
+    return (value or '').replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\r\n', '\\n').replace('\n', '\\n')
+
+
+def _fold(line):
+    # RFC 5545: linhas de no máximo 75 octetos, continuação começa com espaço.
+    raw = line.encode()
+    if len(raw) <= 75:
+        return line
+    parts, start, limit = [], 0, 75
+    while start < len(raw):
+        end = min(start + limit, len(raw))
+        while end < len(raw) and (raw[end] & 0xC0) == 0x80:
+            end -= 1
+        parts.append(raw[start:end].decode())
+        start, limit = end, 74
+    return '\r\n '.join(parts)
+
+
+def _stamp(value):
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def render_calendar(classes, host):
+    duration = timedelta(minutes=getattr(settings, 'CLASS_CALENDAR_DURATION_MINUTES', 60))
+    lines = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//Gerenciamento de Aulas//Aulas//PT-BR',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        'X-WR-CALNAME:Aulas',
+    ]
+    for obj in classes:
+        lines += [
+            'BEGIN:VEVENT',
+            f'UID:class-{obj.pk}@{host}',
+            f'DTSTAMP:{_stamp(obj.updated_at)}',
+            f'LAST-MODIFIED:{_stamp(obj.updated_at)}',
+            f'DTSTART:{_stamp(obj.start_datetime)}',
+            f'DTEND:{_stamp(obj.start_datetime + duration)}',
+            f'SUMMARY:{_escape(obj.title)}',
+        ]
+        if obj.description:
+            lines.append(f'DESCRIPTION:{_escape(obj.description)}')
+        lines.append('END:VEVENT')
+    lines.append('END:VCALENDAR')
+    return ''.join(_fold(line) + '\r\n' for line in lines)
@@ -0,0 +1,99 @@
+import asyncio
+import threading
+from functools import lru_cache
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+CREATED = 'class.created'
+UPDATED = 'class.updated'
+DELETED = 'class.deleted'
+COUNT = 'class.count'
+RESYNC = 'resync'
+
+
+class Subscription:
+    def __init__(self, broker, loop, class_ids=None, max_queue=100):
+        self.broker = broker
+        self.loop = loop
+        self.class_ids = class_ids
+        self.queue = asyncio.Queue(maxsize=max_queue)
+
+    def offer(self, event):
+        if self.class_ids and event.get('id') not in self.class_ids:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({'type': RESYNC})
+
+    async def get(self, timeout=None):
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class InProcessBroker:
+    """Fan-out em memória: cada processo só entrega o que foi publicado nele mesmo."""
+
+    def __init__(self):
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+
+    def has_subscribers(self):
+        return bool(self._subscriptions)
+
+    def subscribe(self, class_ids=None):
+        subscription = Subscription(
+            self, asyncio.get_running_loop(), class_ids,
+            getattr(settings, 'CLASS_EVENTS_QUEUE_SIZE', 100),
+        )
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def publish(self, events):
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            for event in events:
+                try:
+                    subscription.loop.call_soon_threadsafe(subscription.offer, event)
+                except RuntimeError:
+                    self.unsubscribe(subscription)
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    return import_string(getattr(settings, 'CLASS_EVENTS_BROKER', 'app.classes.events.InProcessBroker'))()
+
+
+def _send(kind, class_ids):
+    from .models import Class
+
+    broker = get_broker()
+    if not broker.has_subscribers():
+        return
+    if kind == DELETED:
+        events = [{'type': kind, 'id': pk} for pk in class_ids]
+    else:
+        rows = Class.objects.filter(pk__in=class_ids).values('id', 'participants_count', 'capacity')
+        events = [{'type': kind, **row} for row in rows]
+    if events:
+        broker.publish(events)
+
+
+def publish(kind, class_ids, using=None):
+    class_ids = sorted(set(class_ids))
+    if class_ids:
+        transaction.on_commit(lambda: _send(kind, class_ids), using=using)
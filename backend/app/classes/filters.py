@@ -0,0 +1,66 @@
+import re
+from datetime import date, datetime, time, timedelta
+import django_filters
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from app.enrollments.models import Enrollment
+from .models import ArchivedClass, Class
+
+WEEK_RE = re.compile(r'^(\d{4})-W(\d{2})$')
+
+
+def involving(user):
+    """Aulas que `user` ministra ou em que está inscrito."""
+    return Q(instructor=user) | Exists(Enrollment.objects.filter(class_ref=OuterRef('pk'), student=user))
+
+
+def week_window(value):
+    """`'2026-W42'` -> (segunda 00:00, segunda seguinte 00:00) no fuso do projeto."""
+    match = WEEK_RE.match(value.strip())
+    try:
+        monday = date.fromisocalendar(int(match[1]), int(match[2]), 1) if match else None
+    except ValueError:
+        monday = None
+    if monday is None:
+        raise ValidationError({'week': 'Semana inválida (use AAAA-Www, ex.: 2026-W42).'})
+    start = timezone.make_aware(datetime.combine(monday, time.min))
+    return start, start + timedelta(days=7)
+
+
+class ClassFilter(django_filters.FilterSet):
+    """
+    Janelas sobre `start_datetime` (índice `class_start_idx`, mesma ordem da listagem):
+    `start_after` (inclusivo), `start_before` (exclusivo), `week` (semana ISO inteira) e
+    `upcoming` (aulas futuras que o usuário ministra ou em que está inscrito). `instructor`
+    filtra pelo id, sem consultar o usuário.
+    """
+    start_after = django_filters.IsoDateTimeFilter(field_name='start_datetime', lookup_expr='gte')
+    start_before = django_filters.IsoDateTimeFilter(field_name='start_datetime', lookup_expr='lt')
+    week = django_filters.CharFilter(method='filter_week', label='Semana ISO (AAAA-Www)')
+    upcoming = django_filters.BooleanFilter(method='filter_upcoming', label='Próximas aulas do usuário')
+    instructor = django_filters.NumberFilter(field_name='instructor_id')
+
+    class Meta:
+        model = Class
+        fields = []
+
+    def filter_week(self, queryset, name, value):
+        start, end = week_window(value)
+        return queryset.filter(start_datetime__gte=start, start_datetime__lt=end)
+
+    def filter_upcoming(self, queryset, name, value):
+        user = getattr(self.request, 'user', None)
+        if not value or not (user and user.is_authenticated):
+            return queryset
+        return queryset.filter(involving(user), start_datetime__gte=timezone.now())
+
+
+class ArchivedClassFilter(ClassFilter):
+    class Meta:
+        model = ArchivedClass
+        fields = []
+
+    def filter_upcoming(self, queryset, name, value):
+        # Só aulas passadas são arquivadas.
+        return queryset.none() if value else queryset
@@ -0,0 +1,48 @@
+from datetime import datetime, time, timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from app.classes.archive import archive_classes, pending
+from app.classes.models import archive_cutoff
+
+
+class Command(BaseCommand):
+    help = 'Move aulas passadas e suas inscrições para as tabelas de arquivo, em lotes curtos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--before', help='Data de corte (AAAA-MM-DD); padrão: hoje menos --days.')
+        parser.add_argument('--days', type=int, default=settings.CLASS_ARCHIVE_AFTER_DAYS,
+                            help='Arquiva aulas que começaram há mais de N dias.')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Inscrições por transação.')
+        parser.add_argument('--class-batch-size', type=int, default=100, help='Aulas por grupo.')
+        parser.add_argument('--pause', type=float, default=0, help='Segundos de espera entre transações.')
+        parser.add_argument('--dry-run', action='store_true', help='Apenas conta o que seria arquivado.')
+
+    def handle(self, *args, before, days, batch_size, class_batch_size, pause, dry_run, **options):
+        if before:
+            try:
+                cutoff = timezone.make_aware(datetime.combine(datetime.strptime(before, '%Y-%m-%d').date(), time.min))
+            except ValueError:
+                raise CommandError('--before deve estar no formato AAAA-MM-DD.')
+        else:
+            cutoff = timezone.now() - timedelta(days=days)
+        if cutoff > archive_cutoff():
+            raise CommandError(
+                f'Só aulas com mais de {settings.CLASS_ARCHIVE_AFTER_DAYS} dias (CLASS_ARCHIVE_AFTER_DAYS) '
+                'podem ser arquivadas: as mais novas ainda aceitam inscrições.'
+            )
+        if dry_run:
+            classes, enrollments = pending(cutoff)
+            self.stdout.write(self.style.SUCCESS(f'{classes} aulas e {enrollments} inscrições seriam arquivadas.'))
+            return
+        classes = enrollments = transactions = 0
+        longest = 0.0
+        for moved_classes, moved_enrollments, seconds in archive_classes(cutoff, batch_size, class_batch_size, pause):
+            classes += moved_classes
+            enrollments += moved_enrollments
+            transactions += 1
+            longest = max(longest, seconds)
+        self.stdout.write(self.style.SUCCESS(
+            f'{classes} aulas e {enrollments} inscrições arquivadas em {transactions} transações '
+            f'(mais longa: {longest * 1000:.1f} ms).'
+        ))
@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from app.classes.cache import bump_version
+from app.classes.models import Class
+from app.enrollments.models import Enrollment
+
+
+class Command(BaseCommand):
+    help = 'Recalcula participants_count das aulas a partir das inscrições e corrige divergências.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Quantidade de aulas por lote.')
+        parser.add_argument('--dry-run', action='store_true', help='Apenas relata as divergências, sem corrigir.')
+
+    def handle(self, *args, batch_size, dry_run, **options):
+        actual = Coalesce(
+            Subquery(
+                Enrollment.objects
+                .filter(class_ref=OuterRef('pk'))
+                .order_by()
+                .values('class_ref')
+                .annotate(total=Count('pk'))
+                .values('total')
+            ),
+            Value(0),
+        )
+        last_id = 0
+        checked = drifted = 0
+        while True:
+            ids = list(
+                Class.objects.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            last_id = ids[-1]
+            checked += len(ids)
+            with transaction.atomic():
+                stale_ids = list(
+                    Class.objects
+                    .filter(pk__in=ids)
+                    .annotate(actual=actual)
+                    .exclude(participants_count=F('actual'))
+                    .values_list('pk', flat=True)
+                )
+                drifted += len(stale_ids)
+                if stale_ids and not dry_run:
+                    Class.objects.filter(pk__in=stale_ids).update(participants_count=actual, updated_at=timezone.now())
+
+        if drifted and not dry_run:
+            bump_version()
+        verb = 'divergentes' if dry_run else 'corrigidas'
+        self.stdout.write(self.style.SUCCESS(f'{checked} aulas verificadas, {drifted} {verb}.'))
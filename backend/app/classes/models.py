@@ -1,5 +1,15 @@
+from datetime import timedelta
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
+
+
+def archive_cutoff():
+    """
+    Aulas com início antes deste instante podem ser arquivadas (`CLASS_ARCHIVE_AFTER_DAYS`)
+    e por isso não aceitam inscrições: o contador nunca diverge das linhas em movimento.
+    """
+    return timezone.now() - timedelta(days=settings.CLASS_ARCHIVE_AFTER_DAYS)
 
 class Class(models.Model):
     title = models.CharField(max_length=200)
@@ -12,7 +22,49 @@ class Class(models.Model):
         null=True,
         blank=True,
     )
+    capacity = models.PositiveIntegerField(null=True, blank=True)
+    participants_count = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['start_datetime']
+        indexes = [
+            models.Index(fields=['start_datetime', 'id'], name='class_start_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # `participants_count` só muda por UPDATE com F() (admissões, liberação de vagas,
+        # recontagem): salvar uma instância já gravada nunca devolve um valor lido antes.
+        if not self._state.adding:
+            update_fields = kwargs.get('update_fields')
+            if update_fields is None:
+                update_fields = [f.name for f in self._meta.concrete_fields if not f.primary_key]
+            kwargs['update_fields'] = [name for name in update_fields if name != 'participants_count']
+        super().save(*args, **kwargs)
+
+
+class ArchivedClass(models.Model):
+    """Aula passada movida pelo `archive_classes`; mantém o id que tinha em `Class`."""
+    id = models.BigIntegerField(primary_key=True)
+    title = models.CharField(max_length=200)
+    description = models.TextField(blank=True)
+    start_datetime = models.DateTimeField()
+    instructor = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        related_name='archived_instructor_classes',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+    )
+    capacity = models.PositiveIntegerField(null=True, blank=True)
+    participants_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ['start_datetime']
+        indexes = [
+            models.Index(fields=['start_datetime', 'id'], name='archived_class_start_idx'),
+        ]
@@ -1,12 +1,15 @@
+from datetime import datetime, timedelta
 from rest_framework import serializers
-from .models import Class
+from django.utils import timezone
+from .models import ArchivedClass, Class
 from app.enrollments.models import Enrollment
 from django.contrib.auth import get_user_model
+from app.users.permissions import role_values
 User = get_user_model()
 
 class ClassSerializer(serializers.ModelSerializer):
     instructor = serializers.PrimaryKeyRelatedField(
-        queryset=User.objects.filter(groups__name='instructor'),
+        queryset=User.objects.filter(profile__role__in=role_values('instructor')),
         required=False,
         allow_null=True
     )
@@ -23,6 +26,7 @@ class ClassSerializer(serializers.ModelSerializer):
             'start_datetime',
             'instructor',
             'instructor_username',
+            'capacity',
             'enrolled',
             'participants_count',
         ]
@@ -32,4 +36,80 @@ class ClassSerializer(serializers.ModelSerializer):
         request = self.context.get('request')
         if not request or not request.user.is_authenticated:
             return False
+        enrolled = getattr(obj, 'enrolled', None)
+        if enrolled is not None:
+            return bool(enrolled)
         return Enrollment.objects.filter(class_ref=obj, student=request.user).exists()
+
+class ArchivedClassSerializer(serializers.ModelSerializer):
+    instructor_username = serializers.CharField(source='instructor.username', read_only=True)
+    enrolled = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ArchivedClass
+        fields = ClassSerializer.Meta.fields
+        read_only_fields = fields
+
+    def get_enrolled(self, obj):
+        return bool(getattr(obj, 'enrolled', False))
+
+class BulkClassItemSerializer(serializers.ModelSerializer):
+    instructor = serializers.IntegerField(required=False, allow_null=True)
+
+    class Meta:
+        model = Class
+        fields = ['title', 'description', 'start_datetime', 'instructor', 'capacity']
+
+class ClassRecurrenceSerializer(BulkClassItemSerializer):
+    weekdays = serializers.ListField(
+        child=serializers.IntegerField(min_value=0, max_value=6),
+        min_length=1,
+        help_text='Dias da semana (0 = segunda ... 6 = domingo).'
+    )
+    until = serializers.DateField(help_text='Data limite (inclusiva) da série.')
+
+    class Meta(BulkClassItemSerializer.Meta):
+        fields = BulkClassItemSerializer.Meta.fields + ['weekdays', 'until']
+
+    def validate(self, attrs):
+        if attrs['until'] < timezone.localtime(attrs['start_datetime']).date():
+            raise serializers.ValidationError({'until': 'A data limite deve ser posterior ao início.'})
+        return attrs
+
+def expand_recurrence(rule):
+    first = timezone.localtime(rule['start_datetime'])
+    weekdays = set(rule['weekdays'])
+    base = {k: v for k, v in rule.items() if k not in ('start_datetime', 'weekdays', 'until')}
+    day = first.date()
+    while day <= rule['until']:
+        if day.weekday() in weekdays:
+            yield {**base, 'start_datetime': datetime.combine(day, first.time(), tzinfo=first.tzinfo)}
+        day += timedelta(days=1)
+
+class BulkClassSerializer(serializers.Serializer):
+    max_items = 500
+
+    classes = BulkClassItemSerializer(many=True, required=False)
+    recurrence = ClassRecurrenceSerializer(required=False)
+
+    def validate(self, attrs):
+        items = list(attrs.get('classes', []))
+        if attrs.get('recurrence'):
+            for item in expand_recurrence(attrs['recurrence']):
+                items.append(item)
+                if len(items) > self.max_items:
+                    break
+        if not items:
+            raise serializers.ValidationError({'detail': 'Informe `classes` ou `recurrence`.'})
+        if len(items) > self.max_items:
+            raise serializers.ValidationError({'detail': f'Máximo de {self.max_items} aulas por requisição.'})
+
+        instructor_ids = {item['instructor'] for item in items if item.get('instructor')}
+        instructors = User.objects.filter(pk__in=instructor_ids, profile__role__in=role_values('instructor')).in_bulk() if instructor_ids else {}
+        missing = sorted(instructor_ids - set(instructors))
+        if missing:
+            raise serializers.ValidationError({'instructor': f'Instrutor(es) inválido(s): {missing}.'})
+        for item in items:
+            item['instructor'] = instructors.get(item.get('instructor'))
+        attrs['items'] = items
+        return attrs
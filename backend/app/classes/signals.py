@@ -0,0 +1,15 @@
+from django.dispatch import receiver
+from django.db.models.signals import post_save, post_delete
+from . import events
+from .cache import bump_version
+from .models import Class
+
+@receiver(post_save, sender=Class)
+def class_saved(sender, instance, created, using, **kwargs):
+    bump_version()
+    events.publish(events.CREATED if created else events.UPDATED, [instance.pk], using=using)
+
+@receiver(post_delete, sender=Class)
+def class_deleted(sender, instance, using, **kwargs):
+    bump_version()
+    events.publish(events.DELETED, [instance.pk], using=using)
@@ -1,18 +1,34 @@
+import asyncio
+import json
 from datetime import timedelta
+from io import StringIO
 
+from asgiref.sync import sync_to_async
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
 from django.urls import reverse
+from django.core.signals import request_finished
+from django.db import IntegrityError, close_old_connections, connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
 
-from app.classes.models import Class
-from app.enrollments.models import Enrollment
+from app.classes import events
+from app.classes.models import ArchivedClass, Class
+from app.classes.views import ClassEventStreamView
+from app.metrics import registry
+from app.enrollments.models import ArchivedEnrollment, Enrollment
+from app.testing import AsyncReadViewsMixin
 
 
 class ClassAPITests(APITestCase):
     def setUp(self):
+        cache.clear()
         self.User = get_user_model()
         Group.objects.get_or_create(name='admin')
         Group.objects.get_or_create(name='instructor')
@@ -76,3 +92,484 @@ class ClassAPITests(APITestCase):
         detail = self.client.get(reverse('classes-detail', args=[self.class_obj.id]))
         self.assertEqual(detail.status_code, status.HTTP_200_OK)
         self.assertTrue(detail.data['enrolled'])
+
+    def _count_list_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('classes-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(ctx.captured_queries), response.data['results']
+
+    def test_list_query_count_does_not_grow_with_page_size(self):
+        self.client.force_authenticate(self.student)
+        Enrollment.objects.create(class_ref=self.class_obj, student=self.student)
+        small_count, small_rows = self._count_list_queries()
+        self.assertEqual(len(small_rows), 1)
+
+        for i in range(15):
+            Class.objects.create(
+                title=f'Aula {i}',
+                start_datetime=timezone.now() + timedelta(days=3 + i),
+                instructor=self.instructor,
+            )
+        large_count, large_rows = self._count_list_queries()
+        self.assertEqual(len(large_rows), 16)
+        self.assertEqual(small_count, large_count)
+
+        enrolled = {row['id']: row['enrolled'] for row in large_rows}
+        self.assertTrue(enrolled.pop(self.class_obj.id))
+        self.assertFalse(any(enrolled.values()))
+
+    def test_saving_a_loaded_class_does_not_write_the_counter(self):
+        stale = Class.objects.get(pk=self.class_obj.pk)
+        Enrollment.objects.create(class_ref=self.class_obj, student=self.student)
+        stale.title = 'Renomeada'
+        stale.save()
+        stale.refresh_from_db()
+        self.assertEqual((stale.title, stale.participants_count), ('Renomeada', 1))
+
+    def test_recount_participants_repairs_drift(self):
+        Enrollment.objects.create(class_ref=self.class_obj, student=self.student)
+        Class.objects.filter(pk=self.class_obj.pk).update(participants_count=7)
+
+        out = StringIO()
+        call_command('recount_participants', '--dry-run', stdout=out)
+        self.assertIn('1 divergentes', out.getvalue())
+        self.class_obj.refresh_from_db()
+        self.assertEqual(self.class_obj.participants_count, 7)
+
+        call_command('recount_participants', '--batch-size', '1', stdout=StringIO())
+        self.class_obj.refresh_from_db()
+        self.assertEqual(self.class_obj.participants_count, 1)
+
+    def _authenticate_fresh(self, user):
+        # Usuário recém-carregado e cache vazio: a contagem inclui a leitura dos papéis.
+        cache.clear()
+        self.client.force_authenticate(self.User.objects.get(pk=user.pk))
+
+    def test_bulk_create_list_of_classes(self):
+        self._authenticate_fresh(self.instructor)
+        payload = {'classes': [dict(self._future_payload(), title=f'Aula {i}') for i in range(5)]}
+        with CaptureQueriesContext(connection) as small:
+            response = self.client.post(reverse('classes-bulk'), payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data), 5)
+        self.assertTrue(all(row['instructor'] == self.instructor.id for row in response.data))
+
+        payload = {'classes': [dict(self._future_payload(), title=f'Aula {i}') for i in range(40)]}
+        self._authenticate_fresh(self.instructor)
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.post(reverse('classes-bulk'), payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+        self.assertEqual(len(large.captured_queries), 2)  # papéis do instrutor + INSERT em lote
+
+    def test_bulk_create_weekly_recurrence(self):
+        self.client.force_authenticate(self.admin)
+        first_monday = timezone.localtime() + timedelta(days=7 - timezone.localtime().weekday())
+        payload = {
+            'recurrence': {
+                'title': 'Semanal',
+                'start_datetime': first_monday.replace(hour=19, minute=0, second=0, microsecond=0).isoformat(),
+                'instructor': self.instructor.id,
+                'weekdays': [0, 2],
+                'until': (first_monday + timedelta(days=13)).date().isoformat(),
+            }
+        }
+        response = self.client.post(reverse('classes-bulk'), payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        starts = [timezone.localtime(c.start_datetime) for c in Class.objects.filter(title='Semanal')]
+        self.assertEqual([dt.weekday() for dt in starts], [0, 2, 0, 2])
+        self.assertTrue(all(dt.hour == 19 for dt in starts))
+
+    def test_bulk_create_rejects_invalid_instructor_atomically(self):
+        self.client.force_authenticate(self.admin)
+        payload = {'classes': [
+            dict(self._future_payload(), instructor=self.instructor.id),
+            dict(self._future_payload(), instructor=self.student.id),
+        ]}
+        response = self.client.post(reverse('classes-bulk'), payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Class.objects.count(), 1)
+
+    def test_student_cannot_bulk_create(self):
+        self.client.force_authenticate(self.student)
+        response = self.client.post(reverse('classes-bulk'), {'classes': [self._future_payload()]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_cursor_pagination_walks_all_pages_without_count(self):
+        for i in range(4):
+            Class.objects.create(title=f'Aula {i}', start_datetime=timezone.now() + timedelta(days=3 + i))
+        self.client.force_authenticate(self.student)
+        url = reverse('classes-list') + '?pagination=cursor&page_size=2'
+        seen = []
+        with CaptureQueriesContext(connection) as ctx:
+            while url:
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertNotIn('count', response.data)
+                seen += [row['id'] for row in response.data['results']]
+                url = response.data['next']
+        expected = list(Class.objects.order_by('start_datetime', 'id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+        self.assertFalse(any('COUNT(*)' in q['sql'] for q in ctx.captured_queries))
+
+    def test_page_number_mode_still_reports_count(self):
+        self.client.force_authenticate(self.student)
+        response = self.client.get(reverse('classes-list'))
+        self.assertEqual(response.data['count'], 1)
+
+    def test_start_datetime_index_exists(self):
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, Class._meta.db_table)
+        indexes = {tuple(c['columns']) for c in constraints.values() if c['index']}
+        self.assertIn(('start_datetime', 'id'), indexes)
+
+    def test_catalogue_cache_shared_across_users_with_own_enrolled_flag(self):
+        Enrollment.objects.create(class_ref=self.class_obj, student=self.student)
+        self.client.force_authenticate(self.instructor)
+        first = self.client.get(reverse('classes-list'))
+        self.assertFalse(first.data['results'][0]['enrolled'])
+
+        self.client.force_authenticate(self.student)
+        with CaptureQueriesContext(connection) as ctx:
+            second = self.client.get(reverse('classes-list'))
+        self.assertTrue(second.data['results'][0]['enrolled'])
+        page_queries = [q for q in ctx.captured_queries if 'classes_class' in q['sql'] and 'MAX(' not in q['sql']]
+        self.assertEqual(page_queries, [])
+
+        self.client.force_authenticate(self.admin)
+        stats = self.client.get(reverse('classes-cache-stats')).data
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+
+    def test_enrollment_writes_invalidate_catalogue_cache(self):
+        self.client.force_authenticate(self.student)
+        detail_url = reverse('classes-detail', args=[self.class_obj.id])
+        self.assertEqual(self.client.get(detail_url).data['participants_count'], 0)
+
+        self.client.post(reverse('enrollments-list'), {'class_ref': self.class_obj.id}, format='json')
+        detail = self.client.get(detail_url).data
+        self.assertEqual(detail['participants_count'], 1)
+        self.assertTrue(detail['enrolled'])
+
+    def test_student_cannot_read_cache_stats(self):
+        self.client.force_authenticate(self.student)
+        response = self.client.get(reverse('classes-cache-stats'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_list_and_detail_answer_304_until_something_changes(self):
+        self.client.force_authenticate(self.student)
+        for url in (reverse('classes-list'), reverse('classes-detail', args=[self.class_obj.id])):
+            first = self.client.get(url)
+            self.assertIn('ETag', first)
+            self.assertIn('Last-Modified', first)
+            with CaptureQueriesContext(connection) as ctx:
+                again = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+            self.assertEqual(again.status_code, status.HTTP_304_NOT_MODIFIED)
+            self.assertEqual(len(ctx.captured_queries), 1)
+
+            Enrollment.objects.create(class_ref=self.class_obj, student=self.student)
+            changed = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+            self.assertEqual(changed.status_code, status.HTTP_200_OK)
+            self.assertNotEqual(changed['ETag'], first['ETag'])
+            Enrollment.objects.filter(class_ref=self.class_obj).delete()
+
+    def test_etag_is_not_shared_between_users(self):
+        self.client.force_authenticate(self.student)
+        etag = self.client.get(reverse('classes-list'))['ETag']
+        self.client.force_authenticate(self.instructor)
+        response = self.client.get(reverse('classes-list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class AsyncClassAPITests(AsyncReadViewsMixin, ClassAPITests):
+    """Os mesmos cenários com as leituras pelas views assíncronas."""
+
+
+class ClassEventStreamTests(TestCase):
+    def setUp(self):
+        self.student = get_user_model().objects.create_user(username='aluno')
+        self.class_obj = Class.objects.create(
+            title='Aula', description='Demo', start_datetime=timezone.now() + timedelta(days=2), capacity=5
+        )
+        self.token = str(RefreshToken.for_user(self.student).access_token)
+        self.addCleanup(events.get_broker.cache_clear)
+
+    def _enroll(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Enrollment.objects.create(class_ref=self.class_obj, student=self.student)
+
+    def _close(self, response):
+        request_finished.disconnect(close_old_connections)
+        try:
+            response.close()
+        finally:
+            request_finished.connect(close_old_connections)
+
+    async def _next_event(self, stream):
+        while True:
+            chunk = (await asyncio.wait_for(anext(stream), 5)).decode()
+            if not chunk.startswith(':'):
+                return chunk
+
+    async def test_stream_pushes_participant_count_changes(self):
+        response = await self.async_client.get(reverse('classes-events'), {'token': self.token})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = response.streaming_content
+        try:
+            self.assertTrue((await anext(stream)).startswith(b'retry:'))
+            await sync_to_async(self._enroll)()
+            chunk = await self._next_event(stream)
+        finally:
+            await sync_to_async(self._close)(response)
+        self.assertTrue(chunk.startswith('event: class.count\n'))
+        payload = json.loads(chunk.split('data: ', 1)[1])
+        self.assertEqual(payload, {'type': 'class.count', 'id': self.class_obj.id, 'participants_count': 1, 'capacity': 5})
+
+    async def test_closing_the_stream_unsubscribes(self):
+        # O handler ASGI consome a resposta com `aclosing`: ao desconectar, o gerador é fechado.
+        stream = ClassEventStreamView().stream(None)
+        self.assertTrue((await anext(stream)).startswith('retry:'))
+        self.assertTrue(events.get_broker().has_subscribers())
+        await stream.aclose()
+        self.assertFalse(events.get_broker().has_subscribers())
+
+    async def test_stream_filters_by_class(self):
+        other = await Class.objects.acreate(title='Outra', description='', start_datetime=timezone.now())
+        response = await self.async_client.get(reverse('classes-events'), {'token': self.token, 'classes': str(other.id)})
+        stream = response.streaming_content
+        try:
+            await anext(stream)
+            await sync_to_async(self._enroll)()
+            with self.assertRaises(asyncio.TimeoutError):
+                await asyncio.wait_for(anext(stream), 0.2)
+        finally:
+            await sync_to_async(self._close)(response)
+
+    async def test_stream_requires_token(self):
+        response = await self.async_client.get(reverse('classes-events'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_stream_is_refused_under_wsgi(self):
+        response = self.client.get(reverse('classes-events'), {'token': self.token})
+        self.assertEqual(response.status_code, status.HTTP_501_NOT_IMPLEMENTED)
+
+    def test_writes_without_subscribers_do_not_query_for_events(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self._enroll()
+        self.assertFalse(any('"capacity"' in q['sql'] for q in ctx.captured_queries))
+
+
+class MetricsTests(APITestCase):
+    def setUp(self):
+        registry.reset()
+        self.addCleanup(registry.reset)
+        self.admin = get_user_model().objects.create_superuser(username='admin', password='pass123')
+        self.student = get_user_model().objects.create_user(username='aluno', password='pass123')
+        Class.objects.create(title='Aula', description='', start_datetime=timezone.now())
+
+    def _metrics(self):
+        self.client.force_authenticate(self.admin)
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        return response.content.decode()
+
+    def test_requests_are_aggregated_per_route(self):
+        self.client.force_authenticate(self.admin)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('users-list'))
+        queries = len(ctx)
+        self.client.get(reverse('classes-detail', args=[999]))
+        text = self._metrics()
+        self.assertIn('app_http_requests_total{route="users-list",method="GET",status="200"} 1', text)
+        self.assertIn('app_http_requests_total{route="classes-detail",method="GET",status="404"} 1', text)
+        self.assertIn(f'app_http_request_db_queries_sum{{route="users-list",method="GET"}} {queries}', text)
+        self.assertIn(f'app_http_response_size_bytes_sum{{route="users-list",method="GET"}} {len(response.content)}', text)
+        self.assertIn('app_http_request_duration_seconds_bucket{route="users-list",method="GET",le="+Inf"} 1', text)
+
+    async def test_async_views_count_queries(self):
+        token = await sync_to_async(lambda: str(RefreshToken.for_user(self.student).access_token))()
+        response = await self.async_client.get(reverse('classes-list'), headers={'Authorization': f'Bearer {token}'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        text = await sync_to_async(registry.render)()
+        self.assertRegex(text, r'app_http_request_db_queries_sum\{route="classes-list",method="GET"\} [1-9]')
+
+    def test_metrics_require_admin(self):
+        self.client.force_authenticate(self.student)
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, status.HTTP_403_FORBIDDEN)
+
+    @override_settings(METRICS_SLOW_REQUEST_MS=0.001)
+    def test_slow_requests_are_logged_with_sql(self):
+        self.client.force_authenticate(self.student)
+        with self.assertLogs('app.metrics', 'WARNING') as logs:
+            self.client.get(reverse('classes-list'))
+        self.assertIn('classes-list', logs.output[0])
+        self.assertIn('SELECT', logs.output[0])
+
+
+class ClassCalendarTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.instructor = User.objects.create_user(username='instr', password='pass123')
+        self.instructor.groups.add(Group.objects.get_or_create(name='instructor')[0])
+        self.student = User.objects.create_user(username='aluno', password='pass123')
+        now = timezone.now()
+        self.past = Class.objects.create(title='Passada', start_datetime=now - timedelta(days=2), instructor=self.instructor)
+        self.soon = Class.objects.create(title='Logo', start_datetime=now + timedelta(days=1))
+        self.later = Class.objects.create(
+            title='Depois; com vírgula, e barra \\', description='Linha 1\nLinha 2',
+            start_datetime=now + timedelta(days=20), instructor=self.instructor,
+        )
+        Enrollment.objects.create(class_ref=self.past, student=self.student)
+        Enrollment.objects.create(class_ref=self.soon, student=self.student)
+
+    def _ids(self, query):
+        response = self.client.get(reverse('classes-list') + query)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        return [row['id'] for row in response.data['results']]
+
+    def test_date_range_and_week_filters(self):
+        self.client.force_authenticate(self.student)
+        start = self.soon.start_datetime
+        self.assertEqual(self._ids(f'?start_after={start.isoformat()}'.replace('+', '%2B')), [self.soon.id, self.later.id])
+        window = f'?start_after={(start - timedelta(days=3)).isoformat()}&start_before={start.isoformat()}'
+        self.assertEqual(self._ids(window.replace('+', '%2B')), [self.past.id])
+        year, week, _ = timezone.localtime(self.later.start_datetime).isocalendar()
+        self.assertIn(self.later.id, self._ids(f'?week={year}-W{week:02d}'))
+        self.assertNotIn(self.soon.id, self._ids(f'?week={year}-W{week:02d}'))
+        self.assertEqual(self.client.get(reverse('classes-list') + '?week=2026-W60').status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_upcoming_is_per_user(self):
+        self.client.force_authenticate(self.student)
+        self.assertEqual(self._ids('?upcoming=true'), [self.soon.id])
+        self.client.force_authenticate(self.instructor)
+        self.assertEqual(self._ids('?upcoming=true'), [self.later.id])
+
+    def test_calendar_feed_with_conditional_get(self):
+        self.client.force_authenticate(self.student)
+        url = self.client.get(reverse('classes-calendar-link')).data['url']
+        self.client.force_authenticate(None)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/calendar'))
+        body = response.content.decode()
+        self.assertIn(f'UID:class-{self.soon.id}@', body)
+        self.assertIn('SUMMARY:Passada\r\n', body)
+        self.assertNotIn('Depois', body)
+
+        cached = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
+        Enrollment.objects.create(class_ref=self.later, student=self.student)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('SUMMARY:Depois\\; com vírgula\\, e barra \\\\\r\n', response.content.decode())
+        self.assertIn('DESCRIPTION:Linha 1\\nLinha 2\r\n', response.content.decode())
+
+    def test_calendar_link_can_be_rotated(self):
+        self.client.force_authenticate(self.student)
+        old = self.client.get(reverse('classes-calendar-link')).data['url']
+        rotated = self.client.post(reverse('classes-calendar-link'))
+        self.assertEqual(rotated.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get(reverse('classes-calendar-link')).data['url'], rotated.data['url'])
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get(old).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.client.get(rotated.data['url']).status_code, status.HTTP_200_OK)
+
+    def test_calendar_requires_valid_token(self):
+        self.assertEqual(self.client.get(reverse('classes-calendar')).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(
+            self.client.get(reverse('classes-calendar') + '?token=1:forjado').status_code,
+            status.HTTP_401_UNAUTHORIZED,
+        )
+        token = str(RefreshToken.for_user(self.instructor).access_token)
+        response = self.client.get(reverse('classes-calendar'), HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('SUMMARY:Passada', response.content.decode())
+
+
+class ArchiveTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.student = User.objects.create_user(username='aluno', password='pass123')
+        other = User.objects.create_user(username='outro', password='pass123')
+        now = timezone.now()
+        self.oldest = Class.objects.create(title='Retrasada', start_datetime=now - timedelta(days=500))
+        self.old = Class.objects.create(title='Antiga', start_datetime=now - timedelta(days=400))
+        self.recent = Class.objects.create(title='Recente', start_datetime=now - timedelta(days=10))
+        self.future = Class.objects.create(title='Futura', start_datetime=now + timedelta(days=10))
+        for class_obj, student in ((self.old, self.student), (self.old, other), (self.oldest, other), (self.recent, self.student)):
+            Enrollment.objects.create(class_ref=class_obj, student=student)
+
+    def _archive(self, *args):
+        out = StringIO()
+        call_command('archive_classes', *args, stdout=out)
+        return out.getvalue()
+
+    def test_command_moves_old_classes_and_enrollments_in_batches(self):
+        self.assertIn('2 aulas e 3 inscrições seriam arquivadas', self._archive('--dry-run'))
+        self.assertEqual(ArchivedClass.objects.count(), 0)
+
+        output = self._archive('--batch-size', '1', '--class-batch-size', '1')
+        self.assertIn('2 aulas e 3 inscrições arquivadas em 5 transações', output)
+        self.assertEqual(set(Class.objects.values_list('pk', flat=True)), {self.recent.pk, self.future.pk})
+        self.assertEqual(list(Enrollment.objects.values_list('class_ref_id', flat=True)), [self.recent.pk])
+        archived = ArchivedClass.objects.get(pk=self.old.pk)
+        self.assertEqual((archived.title, archived.participants_count), ('Antiga', 2))
+        self.assertEqual(ArchivedEnrollment.objects.filter(class_ref=archived).count(), 2)
+        self.assertEqual(Class.objects.get(pk=self.recent.pk).participants_count, 1)
+        self.assertIn('0 aulas e 0 inscrições arquivadas', self._archive())
+
+    def test_classes_past_the_cutoff_refuse_enrollments(self):
+        newcomer = get_user_model().objects.create_user(username='novo', password='pass123')
+        self.client.force_authenticate(newcomer)
+        response = self.client.post(reverse('enrollments-list'), {'class_ref': self.old.pk}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        results = Enrollment.objects.bulk_admit([(self.old.pk, newcomer.pk), (self.recent.pk, newcomer.pk)])
+        self.assertEqual(results, {(self.old.pk, newcomer.pk): 'class_closed', (self.recent.pk, newcomer.pk): 'created'})
+        self.old.refresh_from_db()
+        self.assertEqual(self.old.participants_count, 2)
+        with self.assertRaises(CommandError):
+            self._archive('--days', '5')
+
+    def test_archived_enrollments_are_unique_per_student_and_class(self):
+        self._archive()
+        row = ArchivedEnrollment.objects.filter(class_ref_id=self.old.pk).first()
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            ArchivedEnrollment.objects.create(
+                id=row.pk + 1000, student_id=row.student_id, class_ref_id=row.class_ref_id,
+                created_at=row.created_at, updated_at=row.updated_at,
+            )
+
+    def test_lists_touch_live_tables_unless_history_is_requested(self):
+        self._archive()
+        self.client.force_authenticate(self.student)
+        url = reverse('classes-list')
+        self.assertEqual([row['id'] for row in self.client.get(url).data['results']], [self.recent.pk, self.future.pk])
+
+        response = self.client.get(url + '?include_archived=true')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 4)
+        rows = [(row['id'], row['archived'], row['enrolled']) for row in response.data['results']]
+        self.assertEqual(rows, [
+            (self.oldest.pk, True, False), (self.old.pk, True, True), (self.recent.pk, False, True), (self.future.pk, False, False),
+        ])
+        window = self.client.get(url + '?include_archived=true&page_size=1&page=2&start_before=' + timezone.now().date().isoformat())
+        self.assertEqual([row['id'] for row in window.data['results']], [self.old.pk])
+        cursor = self.client.get(url + '?include_archived=true&pagination=cursor')
+        self.assertEqual(cursor.status_code, status.HTTP_400_BAD_REQUEST)
+
+        detail = reverse('classes-detail', args=[self.old.pk])
+        self.assertEqual(self.client.get(detail).status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get(detail + '?include_archived=true')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['title'], response.data['archived']), ('Antiga', True))
+
+        enrollments = self.client.get(reverse('enrollments-list') + '?include_archived=true')
+        self.assertEqual(
+            [(row['class_id'], row['archived']) for row in enrollments.data['results']],
+            [(self.recent.pk, False), (self.old.pk, True)],
+        )
+        self.assertEqual(len(self.client.get(reverse('enrollments-list')).data['results']), 1)
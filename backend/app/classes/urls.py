@@ -1,6 +1,10 @@
+from django.urls import path
 from rest_framework.routers import DefaultRouter
-from .views import ClassViewSet
+from .views import ClassViewSet, ClassCalendarView, ClassEventStreamView
 
 router = DefaultRouter()
 router.register('', ClassViewSet, basename='classes')
-urlpatterns = router.urls
+urlpatterns = [
+    path('events/', ClassEventStreamView.as_view(), name='classes-events'),
+    path('calendar.ics', ClassCalendarView.as_view(), name='classes-calendar'),
+] + router.urls
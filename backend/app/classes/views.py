@@ -1,19 +1,51 @@
-from rest_framework import viewsets
-from django.db.models import Count
-from .models import Class
-from .serializers import ClassSerializer
-from app.users.permissions import is_admin, is_instructor, ReadOnlyOrAdminInstructor
+import json
+from urllib.parse import urlencode
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.views import View
+from rest_framework import permissions, viewsets, status
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from django.db.models import Exists, OuterRef
+from .models import ArchivedClass, Class
+from . import cache as class_cache, calendar, events
+from .filters import ArchivedClassFilter, ClassFilter
+from .serializers import ArchivedClassSerializer, ClassSerializer, BulkClassSerializer
+from app.enrollments.models import ArchivedEnrollment, Enrollment
+from app.history import apply_filterset, history_page, include_archived
+from app.asyncviews import AsyncReadMixin
+from app.exports import CSVRenderer, NDJSONRenderer, stream_export
+from app.conditional import aconditional_response, aqueryset_fingerprint, conditional_response, make_etag, queryset_fingerprint
+from app.pagination import OptionalCursorPagination
+from app.users.authentication import JWTAuthentication
+from app.users.permissions import is_admin, is_instructor, IsAdmin, ReadOnlyOrAdminInstructor
+from rest_framework_simplejwt.exceptions import InvalidToken
 from drf_spectacular.utils import extend_schema, extend_schema_view
 
+class ClassPagination(OptionalCursorPagination):
+    cursor_ordering = ('start_datetime', 'id')
+
 @extend_schema_view(
     list=extend_schema(
         summary='Listar aulas',
-        description='Retorna uma lista paginada de aulas. Suporta busca, ordenação e filtros configurados no projeto.',
+        description=(
+            'Retorna uma lista paginada de aulas. Suporta busca, ordenação e filtros configurados no projeto. '
+            'Janelas por data: `start_after`/`start_before` (ISO 8601) ou `week=2026-W42`; `upcoming=true` '
+            'retorna só as próximas aulas que o usuário ministra ou em que está inscrito. '
+            '`include_archived=true` inclui as aulas arquivadas (`archived: true`), em ordem de início. '
+            'Use `?pagination=cursor` para paginação por cursor (custo constante em páginas profundas, sem `count`).'
+        ),
         tags=['classes']
     ),
     retrieve=extend_schema(
         summary='Detalhar aula',
-        description='Retorna os dados completos de uma aula pelo ID.',
+        description='Retorna os dados completos de uma aula pelo ID. Com `include_archived=true` também busca no arquivo.',
         tags=['classes']
     ),
     create=extend_schema(
@@ -37,15 +69,156 @@ from drf_spectacular.utils import extend_schema, extend_schema_view
         tags=['classes']
     ),
 )
-class ClassViewSet(viewsets.ModelViewSet):
+class ClassViewSet(AsyncReadMixin, viewsets.ModelViewSet):
     queryset = (
         Class.objects
         .select_related('instructor')
-        .annotate(participants_count=Count('enrollments'))
         .order_by('start_datetime', 'id')
     )
     serializer_class = ClassSerializer
     permission_classes = [ReadOnlyOrAdminInstructor]
+    pagination_class = ClassPagination
+    filterset_class = ClassFilter
+    async_handlers = {'list': 'alist', 'retrieve': 'aretrieve'}
+    async_prime_roles = False
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        u = self.request.user
+        if u and u.is_authenticated:
+            qs = qs.annotate(enrolled=Exists(
+                Enrollment.objects.filter(class_ref=OuterRef('pk'), student=u)
+            ))
+        return qs
+
+    def _archived_queryset(self):
+        return ArchivedClass.objects.select_related('instructor').annotate(enrolled=Exists(
+            ArchivedEnrollment.objects.filter(class_ref=OuterRef('pk'), student=self.request.user)
+        ))
+
+    def _serialize(self, objects, archived):
+        serializer_class = ArchivedClassSerializer if archived else ClassSerializer
+        return serializer_class(objects, many=True, context=self.get_serializer_context()).data
+
+    def history_list(self, request):
+        live = apply_filterset(ClassFilter, request, self.get_queryset())
+        archived = apply_filterset(ArchivedClassFilter, request, self._archived_queryset())
+        stamps = [queryset_fingerprint(qs, 'updated_at') for qs in (live, archived)]
+        last_modified = max((stamp for stamp, _ in stamps if stamp), default=None)
+        return conditional_response(
+            request,
+            lambda: history_page(self, live, archived, ('start_datetime', 'id'), self._serialize),
+            make_etag('classes-history', request.user.pk, request.get_full_path(), last_modified, *(n for _, n in stamps)),
+            last_modified,
+        )
+
+    def history_retrieve(self, request, pk):
+        """Aula arquivada `pk`; `None` se ela ainda estiver viva (segue o fluxo normal)."""
+        if not str(pk).isdigit() or Class.objects.filter(pk=pk).exists():
+            return None
+        obj = get_object_or_404(self._archived_queryset(), pk=pk)
+        return Response({**ArchivedClassSerializer(obj, context=self.get_serializer_context()).data, 'archived': True})
+
+    # Carimbos e ETags compartilhados por `list`/`retrieve` e `alist`/`aretrieve`: os dois
+    # caminhos só diferem em como executam as consultas.
+    def _list_stamps(self):
+        return self.filter_queryset(Class.objects.all())
+
+    def _list_validators(self, request, last_modified, total):
+        return make_etag('classes', request.user.pk, request.get_full_path(), last_modified, total), last_modified
+
+    def _detail_stamp(self, pk):
+        return Class.objects.filter(pk=pk).values_list('updated_at', flat=True) if str(pk).isdigit() else None
+
+    def _detail_validators(self, request, pk, last_modified):
+        return make_etag('class', request.user.pk, pk, last_modified), last_modified
+
+    def list(self, request, *args, **kwargs):
+        if include_archived(request):
+            return self.history_list(request)
+        last_modified, total = queryset_fingerprint(self._list_stamps(), 'updated_at')
+        return conditional_response(
+            request,
+            lambda: self._cached(request, lambda: super(ClassViewSet, self).list(request, *args, **kwargs)),
+            *self._list_validators(request, last_modified, total),
+        )
+
+    async def alist(self, request, *args, **kwargs):
+        if include_archived(request):
+            return await sync_to_async(self.history_list)(request)
+        last_modified, total = await aqueryset_fingerprint(self._list_stamps(), 'updated_at')
+        return await aconditional_response(
+            request,
+            lambda: self._acached(request, lambda: self.alist_response(self.filter_queryset(self.get_queryset()))),
+            *self._list_validators(request, last_modified, total),
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        archived = self.history_retrieve(request, kwargs['pk']) if include_archived(request) else None
+        if archived is not None:
+            return archived
+        stamp = self._detail_stamp(kwargs['pk'])
+        last_modified = stamp.first() if stamp is not None else None
+        return conditional_response(
+            request,
+            lambda: self._cached(request, lambda: super(ClassViewSet, self).retrieve(request, *args, **kwargs)),
+            *self._detail_validators(request, kwargs['pk'], last_modified),
+        )
+
+    async def aretrieve(self, request, *args, **kwargs):
+        archived = await sync_to_async(self.history_retrieve)(request, kwargs['pk']) if include_archived(request) else None
+        if archived is not None:
+            return archived
+        stamp = self._detail_stamp(kwargs['pk'])
+        last_modified = await stamp.afirst() if stamp is not None else None
+        return await aconditional_response(
+            request,
+            lambda: self._acached(request, self.aretrieve_response),
+            *self._detail_validators(request, kwargs['pk'], last_modified),
+        )
+
+    def _cached_rows(self, data):
+        return data['results'] if self.action == 'list' else [data]
+
+    def _enrolled_ids(self, rows):
+        return (
+            Enrollment.objects
+            .filter(student=self.request.user, class_ref_id__in=[row['id'] for row in rows])
+            .values_list('class_ref_id', flat=True)
+        )
+
+    def _with_enrolled(self, data, rows, enrolled):
+        for row in rows:
+            row['enrolled'] = row['id'] in enrolled
+        return Response(data)
+
+    def _personal(self, request):
+        # `upcoming` depende do usuário e do horário: fora do cache compartilhado do catálogo.
+        return request.query_params.get('upcoming', '').lower() in ('true', '1')
+
+    def _cached(self, request, build):
+        if self._personal(request):
+            return build()
+        key, data = class_cache.lookup(request)
+        if data is None:
+            response = build()
+            if response.status_code == 200:
+                class_cache.store(key, response.data)
+            return response
+        rows = self._cached_rows(data)
+        return self._with_enrolled(data, rows, set(self._enrolled_ids(rows)))
+
+    async def _acached(self, request, build):
+        if self._personal(request):
+            return await build()
+        key, data = await class_cache.alookup(request)
+        if data is None:
+            response = await build()
+            if response.status_code == 200:
+                await class_cache.astore(key, response.data)
+            return response
+        rows = self._cached_rows(data)
+        return self._with_enrolled(data, rows, {pk async for pk in self._enrolled_ids(rows)})
 
     def perform_create(self, serializer):
         u = self.request.user
@@ -60,3 +233,165 @@ class ClassViewSet(viewsets.ModelViewSet):
 
     def perform_update(self, serializer):
         serializer.save()
+
+    @extend_schema(
+        summary='Criar aulas em lote',
+        description=(
+            'Cria várias aulas em uma única transação. Aceita `classes` (lista de aulas) e/ou '
+            '`recurrence` (aula semanal nos `weekdays` informados, de `start_datetime` até `until`). '
+            'Instrutor (não admin) sem `instructor` no item recebe a aula atribuída a si.'
+        ),
+        tags=['classes'],
+        request=BulkClassSerializer,
+        responses={201: ClassSerializer(many=True), 400: dict, 403: dict}
+    )
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk(self, request):
+        ser = BulkClassSerializer(data=request.data)
+        ser.is_valid(raise_exception=True)
+        u = request.user
+        default_instructor = u if is_instructor(u) and not is_admin(u) else None
+        objs = [
+            Class(**{**item, 'instructor': item['instructor'] or default_instructor})
+            for item in ser.validated_data['items']
+        ]
+        created = Class.objects.bulk_create(objs, batch_size=200)
+        class_cache.bump_version()
+        events.publish(events.CREATED, [obj.pk for obj in created if obj.pk is not None])
+        for obj in created:
+            obj.enrolled = False
+        data = ClassSerializer(created, many=True, context=self.get_serializer_context()).data
+        return Response(data, status=status.HTTP_201_CREATED)
+
+    @extend_schema(
+        summary='Exportar lista de inscritos',
+        description=(
+            'Transmite os inscritos da aula em CSV (`?format=csv`, padrão) ou NDJSON (`?format=ndjson`), '
+            'do mais recente ao mais antigo. Admin/instrutor recebe todos; aluno apenas a própria inscrição.'
+        ),
+        tags=['classes'],
+        responses={(200, 'text/csv'): str, (200, 'application/x-ndjson'): str, 404: dict},
+    )
+    @action(detail=True, methods=['get'], url_path='roster', renderer_classes=[CSVRenderer, NDJSONRenderer])
+    def roster(self, request, pk=None):
+        class_obj = self.get_object()
+        queryset = Enrollment.objects.visible_to(request.user).filter(class_ref=class_obj).order_by('-created_at', '-id')
+        return stream_export(
+            request,
+            Enrollment.objects.export_rows(queryset),
+            [column for column, _ in Enrollment.objects.EXPORT_COLUMNS],
+            f'aula-{class_obj.pk}-inscritos',
+        )
+
+    @extend_schema(
+        summary='Link do calendário (iCalendar)',
+        description=(
+            'Retorna a URL do feed `.ics` do usuário autenticado (aulas que ministra ou em que está inscrito), '
+            'com um token assinado para assinatura em Google Agenda, Outlook etc. `POST` gera um token novo '
+            'e invalida os links anteriores (por exemplo, se o link vazou).'
+        ),
+        tags=['classes'],
+        request=None,
+        responses={200: dict}
+    )
+    @action(detail=False, methods=['get', 'post'], url_path='calendar-link', permission_classes=[permissions.IsAuthenticated])
+    def calendar_link(self, request):
+        token = calendar.rotate_feed_token(request.user) if request.method == 'POST' else calendar.feed_token(request.user)
+        url = f"{reverse('classes-calendar')}?{urlencode({'token': token})}"
+        return Response({'url': request.build_absolute_uri(url)})
+
+    @extend_schema(
+        summary='Estatísticas do cache de aulas',
+        description='Retorna a versão atual do cache do catálogo de aulas e os contadores de acertos/falhas. Requer **admin**.',
+        tags=['classes'],
+        responses={200: dict, 403: dict}
+    )
+    @action(detail=False, methods=['get'], url_path='cache-stats', permission_classes=[IsAdmin])
+    def cache_stats(self, request):
+        return Response(class_cache.stats())
+
+
+async def _stream_user(request):
+    auth = JWTAuthentication()
+    header = auth.get_header(request)
+    raw = auth.get_raw_token(header) if header else request.GET.get('token')
+    if not raw:
+        return None
+    try:
+        return await auth.aget_user(auth.get_validated_token(raw))
+    except (InvalidToken, AuthenticationFailed):
+        return None
+
+
+class ClassCalendarView(View):
+    """
+    Feed iCalendar das aulas que o usuário ministra ou em que está inscrito. Aceita o JWT
+    no cabeçalho ou o token de `calendar-link` em `?token=`. Responde 304 enquanto nenhuma
+    aula do feed mudar (`ETag`/`Last-Modified`), então os clientes podem consultar sempre.
+    """
+
+    def get(self, request):
+        token = request.GET.get('token')
+        user = calendar.feed_user(token) if token else None
+        if user is None and not token:
+            try:
+                user_auth = JWTAuthentication().authenticate(request)
+            except (InvalidToken, AuthenticationFailed):
+                user_auth = None
+            user = user_auth[0] if user_auth else None
+        if user is None:
+            return JsonResponse({'detail': 'Credenciais de autenticação não foram fornecidas ou são inválidas.'}, status=401)
+        queryset = calendar.feed_queryset(user)
+        last_modified, total = queryset_fingerprint(queryset, 'updated_at')
+        return conditional_response(
+            request,
+            lambda: HttpResponse(
+                calendar.render_calendar(
+                    queryset.only('id', 'title', 'description', 'start_datetime', 'updated_at').order_by('start_datetime', 'id'),
+                    request.get_host(),
+                ),
+                content_type=calendar.CONTENT_TYPE,
+            ),
+            make_etag('calendar', user.pk, last_modified, total),
+            last_modified,
+        )
+
+
+def _sse(event):
+    return f"event: {event['type']}\ndata: {json.dumps(event, cls=DjangoJSONEncoder)}\n\n"
+
+
+class ClassEventStreamView(View):
+    """
+    Server-sent events com as mudanças do catálogo de aulas (`class.created`,
+    `class.updated`, `class.deleted`, `class.count`). `resync` pede que o cliente
+    recarregue a lista. Aceita o JWT no cabeçalho ou em `?token=` (EventSource não
+    envia cabeçalhos) e `?classes=1,2` para restringir as aulas. Requer ASGI.
+    """
+
+    async def get(self, request):
+        if not isinstance(request, ASGIRequest):
+            return JsonResponse({'detail': 'Stream de eventos disponível apenas sob ASGI.'}, status=501)
+        if await _stream_user(request) is None:
+            return JsonResponse({'detail': 'Credenciais de autenticação não foram fornecidas ou são inválidas.'}, status=401)
+        try:
+            class_ids = {int(pk) for pk in request.GET.get('classes', '').split(',') if pk.strip()}
+        except ValueError:
+            return JsonResponse({'detail': 'Parâmetro classes deve conter ids separados por vírgula.'}, status=400)
+        response = StreamingHttpResponse(self.stream(class_ids or None), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    async def stream(self, class_ids):
+        # A inscrição nasce dentro do gerador: o `finally` (também no `aclose()` de uma
+        # conexão encerrada) sempre a remove do broker.
+        heartbeat = getattr(settings, 'CLASS_EVENTS_HEARTBEAT', 15)
+        subscription = events.get_broker().subscribe(class_ids)
+        try:
+            yield f'retry: {heartbeat * 1000}\n\n'
+            while True:
+                event = await subscription.get(heartbeat)
+                yield ': ping\n\n' if event is None else _sse(event)
+        finally:
+            subscription.close()
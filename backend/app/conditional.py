@@ -0,0 +1,63 @@
+import hashlib
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+
+def make_etag(*parts):
+    return quote_etag(hashlib.sha1('|'.join(str(p) for p in parts).encode()).hexdigest())
+
+
+def _fingerprint_query(fields):
+    return {f'last_{i}': Max(field) for i, field in enumerate(fields)}
+
+
+def _fingerprint(values, aggregates):
+    stamps = [values[key] for key in aggregates if values[key] is not None]
+    return (max(stamps) if stamps else None), values['total']
+
+
+def queryset_fingerprint(queryset, *fields):
+    """Retorna (maior timestamp entre `fields`, quantidade de linhas) numa única consulta agregada."""
+    aggregates = _fingerprint_query(fields)
+    return _fingerprint(queryset.order_by().aggregate(total=Count('pk'), **aggregates), aggregates)
+
+
+async def aqueryset_fingerprint(queryset, *fields):
+    aggregates = _fingerprint_query(fields)
+    return _fingerprint(await queryset.order_by().aaggregate(total=Count('pk'), **aggregates), aggregates)
+
+
+def _timestamp(last_modified):
+    return int(last_modified.timestamp()) if last_modified else None
+
+
+def _finalize(response, etag, timestamp):
+    if response.status_code in (200, 304):
+        response['ETag'] = etag
+        if timestamp is not None:
+            response['Last-Modified'] = http_date(timestamp)
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ['Authorization'])
+    return response
+
+
+def conditional_response(request, build, etag, last_modified=None):
+    """
+    Responde 304 quando `If-None-Match`/`If-Modified-Since` ainda valem, sem chamar `build`;
+    caso contrário devolve `build()` com `ETag`/`Last-Modified` para a próxima revalidação.
+    """
+    timestamp = _timestamp(last_modified)
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is None:
+        response = build()
+    return _finalize(response, etag, timestamp)
+
+
+async def aconditional_response(request, build, etag, last_modified=None):
+    """Como `conditional_response`, para `build` assíncrono."""
+    timestamp = _timestamp(last_modified)
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is None:
+        response = await build()
+    return _finalize(response, etag, timestamp)
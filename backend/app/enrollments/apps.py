@@ -4,3 +4,6 @@ class EnrollmentsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'app.enrollments'
     label = 'enrollments'
+
+    def ready(self):
+        from . import signals
@@ -0,0 +1,7 @@
+import django_filters
+
+
+class EnrollmentHistoryFilter(django_filters.FilterSet):
+    """Filtros do histórico (`include_archived`): por id, válidos nas tabelas viva e de arquivo."""
+    class_ref = django_filters.NumberFilter(field_name='class_ref_id')
+    student = django_filters.NumberFilter(field_name='student_id')
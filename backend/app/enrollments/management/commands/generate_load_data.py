@@ -0,0 +1,105 @@
+import random
+from datetime import timedelta
+from itertools import islice
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from app.classes.models import Class
+from app.enrollments.models import Enrollment
+from app.users.models import UserProfile, UserSearchToken
+from app.users.search import user_tokens
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Gera um volume sintético de alunos, instrutores, aulas e inscrições para testes de carga.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=100_000)
+        parser.add_argument('--instructors', type=int, default=200)
+        parser.add_argument('--classes', type=int, default=10_000)
+        parser.add_argument('--enrollments', type=int, default=2_000_000)
+        parser.add_argument('--seed', type=int, default=42, help='Semente do gerador (dados determinísticos).')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--password', default='Senha@123', help='Senha comum a todos os usuários gerados.')
+        parser.add_argument('--prefix', default='carga', help='Prefixo dos usernames e títulos gerados.')
+
+    def handle(self, *args, **opts):
+        students, classes, enrollments = opts['students'], opts['classes'], opts['enrollments']
+        if students < 1 or classes < 1 or opts['instructors'] < 1:
+            raise CommandError('--students, --instructors e --classes devem ser positivos.')
+        if enrollments > students * classes:
+            raise CommandError('Inscrições demais para a quantidade de alunos e aulas.')
+        prefix = opts['prefix']
+        if User.objects.filter(username__startswith=f'{prefix}_').exists():
+            raise CommandError(f'Já existem usuários com o prefixo "{prefix}". Use outro --prefix.')
+
+        self.batch_size = opts['batch_size']
+        self.rng = random.Random(opts['seed'])
+        self.now = timezone.now()
+        password = make_password(opts['password'])
+
+        instructor_ids = self._create_users(f'{prefix}_instrutor', opts['instructors'], password, is_staff=True, role='instructor')
+        group, _ = Group.objects.get_or_create(name='instructor')
+        self._bulk(User.groups.through, (User.groups.through(user_id=pk, group_id=group.pk) for pk in instructor_ids))
+        student_ids = self._create_users(f'{prefix}_aluno', students, password)
+        class_ids = self._create_classes(prefix, classes, instructor_ids)
+        self._bulk(Enrollment, self._enrollments(student_ids, class_ids, enrollments))
+        call_command('recount_participants', batch_size=self.batch_size, stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(instructor_ids)} instrutores, {len(student_ids)} alunos, '
+            f'{len(class_ids)} aulas e {enrollments} inscrições gerados.'
+        ))
+
+    def _bulk(self, model, objs):
+        objs = iter(objs)
+        while True:
+            batch = list(islice(objs, self.batch_size))
+            if not batch:
+                return
+            model.objects.bulk_create(batch, batch_size=self.batch_size)
+
+    def _create_users(self, username_prefix, count, password, is_staff=False, role=''):
+        self._bulk(User, (
+            User(
+                username=f'{username_prefix}{i}',
+                email=f'{username_prefix}{i}@example.com',
+                first_name=username_prefix.rsplit('_', 1)[-1].capitalize(),
+                last_name=str(i),
+                password=password,
+                is_staff=is_staff,
+            )
+            for i in range(count)
+        ))
+        users = list(
+            User.objects.filter(username__startswith=username_prefix).order_by('pk')
+            .only('pk', 'username', 'email', 'first_name', 'last_name')
+        )
+        self._bulk(UserProfile, (UserProfile(user_id=u.pk, email_normalized=u.email.lower(), role=role) for u in users))
+        self._bulk(UserSearchToken, (UserSearchToken(user_id=u.pk, token=t) for u in users for t in user_tokens(u)))
+        return [u.pk for u in users]
+
+    def _create_classes(self, prefix, count, instructor_ids):
+        half_year = 180 * 24 * 60
+        self._bulk(Class, (
+            Class(
+                title=f'[{prefix}] Aula {i}',
+                start_datetime=self.now + timedelta(minutes=self.rng.randint(-half_year, half_year)),
+                instructor_id=self.rng.choice(instructor_ids),
+            )
+            for i in range(count)
+        ))
+        return list(
+            Class.objects.filter(title__startswith=f'[{prefix}] ').order_by('pk').values_list('pk', flat=True)
+        )
+
+    def _enrollments(self, student_ids, class_ids, total):
+        per_student, extra = divmod(total, len(student_ids))
+        for i, student_id in enumerate(student_ids):
+            count = per_student + (1 if i < extra else 0)
+            for class_id in self.rng.sample(class_ids, count):
+                yield Enrollment(student_id=student_id, class_ref_id=class_id)
@@ -1,14 +1,229 @@
-from django.db import models
+from collections import Counter, defaultdict
+from django.db import IntegrityError, models, transaction
+from django.db.models import Case, Count, F, Q, Value, When
+from django.utils import timezone
 from django.contrib.auth import get_user_model
-from app.classes.models import Class
+from app.classes import events
+from app.classes.cache import bump_version
+from app.classes.models import ArchivedClass, Class, archive_cutoff
+from app.users.permissions import is_admin, is_instructor
 
 User = get_user_model()
 
+class ClassFull(Exception):
+    pass
+
+
+class ClassClosed(Exception):
+    """Aula anterior a `archive_cutoff()`: pode estar sendo arquivada."""
+
+
+def release_seats(counts, using=None):
+    """Desconta `{class_id: inscrições removidas}` de `participants_count`, um UPDATE por quantidade."""
+    by_amount = defaultdict(list)
+    for class_id, amount in counts.items():
+        by_amount[amount].append(class_id)
+    for amount, class_ids in by_amount.items():
+        Class.objects.using(using).filter(pk__in=class_ids).update(
+            participants_count=Case(
+                When(participants_count__gt=amount, then=F('participants_count') - amount), default=Value(0),
+            ),
+            updated_at=timezone.now(),
+        )
+    if counts:
+        bump_version()
+        events.publish(events.COUNT, counts, using=using)
+
+
+class EnrollmentQuerySet(models.QuerySet):
+    def delete(self, release=True):
+        """
+        DELETE em lote (sem sinais por linha) que desconta as vagas uma vez por aula.
+        `release=False` apaga sem mexer nos contadores (aulas que saem junto).
+        """
+        with transaction.atomic(using=self.db):
+            counts = dict(
+                self.order_by().values('class_ref').annotate(total=Count('pk')).values_list('class_ref', 'total')
+            ) if release else {}
+            deleted = super().delete()
+            release_seats(counts, using=self.db)
+        return deleted
+
+
+class EnrollmentManager(models.Manager.from_queryset(EnrollmentQuerySet)):
+    EXPORT_COLUMNS = (
+        ('id', 'id'),
+        ('class_id', 'class_ref_id'),
+        ('class_title', 'class_ref__title'),
+        ('class_start_datetime', 'class_ref__start_datetime'),
+        ('student_id', 'student_id'),
+        ('student_username', 'student__username'),
+        ('student_first_name', 'student__first_name'),
+        ('student_last_name', 'student__last_name'),
+        ('student_email', 'student__email'),
+        ('created_at', 'created_at'),
+        ('updated_at', 'updated_at'),
+    )
+
+    def visible_to(self, user):
+        qs = self.all()
+        if is_admin(user) or is_instructor(user):
+            return qs
+        return qs.filter(student=user)
+
+    def export_rows(self, queryset):
+        return queryset.values_list(*(field for _, field in self.EXPORT_COLUMNS))
+
+    def admit(self, student, class_ref):
+        cutoff = archive_cutoff()
+        with transaction.atomic():
+            admitted = (
+                Class.objects
+                .filter(pk=class_ref.pk, start_datetime__gte=cutoff)
+                .filter(Q(capacity__isnull=True) | Q(participants_count__lt=F('capacity')))
+                .update(participants_count=F('participants_count') + 1, updated_at=timezone.now())
+            )
+            if not admitted:
+                raise ClassClosed() if class_ref.start_datetime < cutoff else ClassFull()
+            enrollment = self.model(student=student, class_ref=class_ref)
+            enrollment._participants_counted = True
+            enrollment.save(force_insert=True)
+        return enrollment
+
+    def _plan_admissions(self, pairs, lock):
+        """Classifica cada `(class_id, student_id)` só com leituras; `lock` trava as aulas."""
+        results = {}
+        cutoff = archive_cutoff()
+        classes = Class.objects.select_for_update() if lock else Class.objects.all()
+        classes = (
+            classes
+            .only('id', 'capacity', 'participants_count', 'start_datetime')
+            .in_bulk({class_id for class_id, _ in pairs})
+        )
+        taken = set(
+            self.filter(class_ref_id__in=classes, student_id__in={student_id for _, student_id in pairs})
+            .order_by()
+            .values_list('class_ref_id', 'student_id')
+        )
+        seats = {
+            pk: None if c.capacity is None else max(c.capacity - c.participants_count, 0)
+            for pk, c in classes.items()
+        }
+        admitted = Counter()
+        to_create = []
+        for pair in pairs:
+            class_id, student_id = pair
+            if class_id not in classes:
+                results[pair] = 'invalid_class'
+            elif classes[class_id].start_datetime < cutoff:
+                results[pair] = 'class_closed'
+            elif pair in taken:
+                results[pair] = 'already_enrolled'
+            elif seats[class_id] is not None and seats[class_id] <= admitted[class_id]:
+                results[pair] = 'class_full'
+            else:
+                results[pair] = 'created'
+                taken.add(pair)
+                admitted[class_id] += 1
+                to_create.append(self.model(class_ref_id=class_id, student_id=student_id))
+        return results, to_create, admitted
+
+    def _insert_admissions(self, to_create, batch_size):
+        """
+        Grava as inscrições e devolve as que entraram de fato. Se alguma já existir (gravada
+        por fora depois da leitura), refaz linha a linha e deixa as repetidas de fora.
+        """
+        try:
+            with transaction.atomic(using=self.db):
+                return self.bulk_create(to_create, batch_size=batch_size)
+        except IntegrityError:
+            inserted = []
+            for enrollment in to_create:
+                try:
+                    with transaction.atomic(using=self.db):
+                        self.bulk_create([enrollment])
+                except IntegrityError:
+                    continue
+                inserted.append(enrollment)
+            return inserted
+
+    def bulk_admit(self, pairs, batch_size=500, dry_run=False):
+        """
+        Inscreve os pares `(class_id, student_id)` respeitando vagas e prazo, com as aulas
+        travadas. Com `dry_run` só classifica os pares (sem travas nem escritas).
+        """
+        if dry_run:
+            return self._plan_admissions(pairs, lock=False)[0]
+        with transaction.atomic():
+            results, to_create, admitted = self._plan_admissions(pairs, lock=True)
+            inserted = self._insert_admissions(to_create, batch_size)
+            if len(inserted) < len(to_create):
+                admitted = Counter(e.class_ref_id for e in inserted)
+                missing = {(e.class_ref_id, e.student_id) for e in to_create} - {
+                    (e.class_ref_id, e.student_id) for e in inserted
+                }
+                results.update(dict.fromkeys(missing, 'already_enrolled'))
+            for class_id, count in admitted.items():
+                Class.objects.filter(pk=class_id).update(
+                    participants_count=F('participants_count') + count, updated_at=timezone.now()
+                )
+            if admitted:
+                bump_version()
+                events.publish(events.COUNT, admitted, using=self.db)
+        return results
+
 class Enrollment(models.Model):
-    student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='enrollments')
-    class_ref = models.ForeignKey(Class, on_delete=models.CASCADE, related_name='enrollments')
+    student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='enrollments', db_index=False)
+    class_ref = models.ForeignKey(Class, on_delete=models.CASCADE, related_name='enrollments', db_index=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = EnrollmentManager()
 
     class Meta:
         unique_together = [('student','class_ref')]
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['student', '-created_at'], name='enrollment_student_recent_idx'),
+            models.Index(fields=['class_ref', '-created_at'], name='enrollment_class_recent_idx'),
+            models.Index(fields=['-created_at', '-id'], name='enrollment_recent_idx'),
+        ]
+
+    def delete(self, *args, **kwargs):
+        # Sem post_delete: exclusões em cascata (aula ou aluno) continuam sendo um DELETE só.
+        with transaction.atomic(using=self._state.db):
+            deleted = super().delete(*args, **kwargs)
+            release_seats({self.class_ref_id: 1}, using=self._state.db)
+        return deleted
+
+
+class ArchivedEnrollmentManager(models.Manager):
+    visible_to = EnrollmentManager.visible_to
+
+
+class ArchivedEnrollment(models.Model):
+    """
+    Inscrição de uma aula arquivada. Sem FK física para `ArchivedClass`: as inscrições
+    são movidas em lotes antes da aula, que só chega ao arquivo no último lote.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_enrollments', db_index=False)
+    class_ref = models.ForeignKey(
+        ArchivedClass, on_delete=models.DO_NOTHING, related_name='enrollments', db_index=False, db_constraint=False,
+    )
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    objects = ArchivedEnrollmentManager()
+
+    class Meta:
+        ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['student', 'class_ref'], name='archived_enr_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['student', '-created_at'], name='archived_enr_student_idx'),
+            models.Index(fields=['class_ref', '-created_at'], name='archived_enr_class_idx'),
+            models.Index(fields=['-created_at', '-id'], name='archived_enr_recent_idx'),
+        ]
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Enrollment
+from .models import ArchivedEnrollment, Enrollment
 
 class EnrollmentSerializer(serializers.ModelSerializer):
     class_id = serializers.IntegerField(source='class_ref.id', read_only=True)
@@ -19,6 +19,37 @@ class EnrollmentSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError({'detail': 'Autenticação necessária.'})
         if not class_ref:
             raise serializers.ValidationError({'detail': 'A aula é obrigatória.'})
-        if Enrollment.objects.filter(class_ref=class_ref, student=target_student).exists():
-            raise serializers.ValidationError({'detail': 'Você já está inscrito nesta aula.'})
+        return attrs
+
+    def create(self, validated_data):
+        return Enrollment.objects.admit(validated_data['student'], validated_data['class_ref'])
+
+class ArchivedEnrollmentSerializer(EnrollmentSerializer):
+    class Meta(EnrollmentSerializer.Meta):
+        model = ArchivedEnrollment
+        read_only_fields = EnrollmentSerializer.Meta.fields
+
+class BulkEnrollmentItemSerializer(serializers.Serializer):
+    class_ref = serializers.IntegerField(min_value=1)
+    student = serializers.IntegerField(min_value=1)
+
+class BulkEnrollmentSerializer(serializers.Serializer):
+    max_items = 1000
+
+    class_ref = serializers.IntegerField(min_value=1, required=False)
+    students = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False)
+    items = BulkEnrollmentItemSerializer(many=True, required=False)
+
+    def validate(self, attrs):
+        pairs = [(item['class_ref'], item['student']) for item in attrs.get('items', [])]
+        students = attrs.get('students') or []
+        if students:
+            if not attrs.get('class_ref'):
+                raise serializers.ValidationError({'class_ref': 'Informe a aula para a lista de alunos.'})
+            pairs += [(attrs['class_ref'], student_id) for student_id in students]
+        if not pairs:
+            raise serializers.ValidationError({'detail': 'Informe `class_ref` e `students` ou `items`.'})
+        if len(pairs) > self.max_items:
+            raise serializers.ValidationError({'detail': f'Máximo de {self.max_items} inscrições por requisição.'})
+        attrs['pairs'] = list(dict.fromkeys(pairs))
         return attrs
@@ -0,0 +1,30 @@
+from django.dispatch import receiver
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F
+from django.db.models.signals import post_save, pre_delete
+from django.utils import timezone
+from app.classes import events
+from app.classes.cache import bump_version
+from app.classes.models import Class
+from .models import Enrollment, release_seats
+
+User = get_user_model()
+
+@receiver(post_save, sender=Enrollment)
+def increment_participants_count(sender, instance, created, using, **kwargs):
+    if not created:
+        return
+    if not getattr(instance, '_participants_counted', False):
+        Class.objects.filter(pk=instance.class_ref_id).update(
+            participants_count=F('participants_count') + 1, updated_at=timezone.now()
+        )
+    bump_version()
+    events.publish(events.COUNT, [instance.class_ref_id], using=using)
+
+@receiver(pre_delete, sender=User)
+def release_student_seats(sender, instance, using, **kwargs):
+    # As inscrições do aluno saem por cascata (DELETE em lote, sem sinais por linha).
+    release_seats(dict(
+        Enrollment.objects.using(using).filter(student=instance).order_by()
+        .values('class_ref').annotate(total=Count('pk')).values_list('class_ref', 'total')
+    ), using=using)
@@ -1,18 +1,32 @@
+import csv
+import json
+import threading
 from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Sum
+from django.core.cache import cache
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
 from rest_framework import status
-from rest_framework.test import APITestCase
+from rest_framework.test import APIClient, APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
 
 from app.classes.models import Class
-from app.enrollments.models import Enrollment
+from app.enrollments.models import ClassFull, Enrollment
+from app.testing import AsyncReadViewsMixin
 
 
 class EnrollmentAPITests(APITestCase):
     def setUp(self):
+        cache.clear()
         self.User = get_user_model()
         Group.objects.get_or_create(name='admin')
         instructor_group, _ = Group.objects.get_or_create(name='instructor')
@@ -68,3 +82,328 @@ class EnrollmentAPITests(APITestCase):
         delete_resp = self.client.delete(url)
         self.assertEqual(delete_resp.status_code, status.HTTP_204_NO_CONTENT)
         self.assertFalse(Enrollment.objects.filter(class_ref=self.class_obj, student=self.other_student).exists())
+
+    def _participants_count(self):
+        self.class_obj.refresh_from_db(fields=['participants_count'])
+        return self.class_obj.participants_count
+
+    def test_participants_count_follows_enrollment_writes(self):
+        self.client.force_authenticate(self.student)
+        self.client.post(reverse('enrollments-list'), {'class_ref': self.class_obj.id}, format='json')
+        self.client.force_authenticate(self.instructor)
+        self.client.post(
+            reverse('enrollments-list'),
+            {'class_ref': self.class_obj.id, 'student': self.other_student.id},
+            format='json',
+        )
+        self.assertEqual(self._participants_count(), 2)
+
+        url = reverse(
+            'enrollments-delete-by-class-and-student',
+            kwargs={'class_id': self.class_obj.id, 'student_id': self.other_student.id},
+        )
+        self.client.delete(url)
+        self.assertEqual(self._participants_count(), 1)
+
+        self.student.delete()
+        self.assertEqual(self._participants_count(), 0)
+
+    def _enroll_many(self, class_obj, count):
+        for i in range(count):
+            student = self.User.objects.create_user(username=f'lote{class_obj.pk}_{i}', password='pass123')
+            Enrollment.objects.create(class_ref=class_obj, student=student)
+
+    def test_queryset_delete_releases_seats_once_per_class(self):
+        other = Class.objects.create(title='Outra', start_datetime=timezone.now() + timedelta(days=2))
+        self._enroll_many(self.class_obj, 3)
+        self._enroll_many(other, 2)
+        with CaptureQueriesContext(connection) as ctx:
+            Enrollment.objects.filter(student__username__startswith='lote').delete()
+        self.assertEqual(self._participants_count(), 0)
+        self.assertEqual(Class.objects.get(pk=other.pk).participants_count, 0)
+        updates = [q for q in ctx.captured_queries if q['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 2)
+
+    def test_deleting_a_class_cascades_in_constant_queries(self):
+        small = Class.objects.create(title='Pequena', start_datetime=timezone.now() + timedelta(days=2))
+        self._enroll_many(small, 1)
+        self._enroll_many(self.class_obj, 20)
+        with CaptureQueriesContext(connection) as ctx:
+            small.delete()
+        small_queries = len(ctx)
+        with CaptureQueriesContext(connection) as ctx:
+            self.class_obj.delete()
+        self.assertEqual(len(ctx), small_queries)
+        self.assertFalse(Enrollment.objects.exists())
+
+    def test_full_class_returns_conflict(self):
+        Class.objects.filter(pk=self.class_obj.pk).update(capacity=1)
+        self.client.force_authenticate(self.student)
+        first = self.client.post(reverse('enrollments-list'), {'class_ref': self.class_obj.id}, format='json')
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+
+        self.client.force_authenticate(self.other_student)
+        second = self.client.post(reverse('enrollments-list'), {'class_ref': self.class_obj.id}, format='json')
+        self.assertEqual(second.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(self._participants_count(), 1)
+
+    def test_saving_a_stale_class_does_not_reopen_seats(self):
+        Class.objects.filter(pk=self.class_obj.pk).update(capacity=1)
+        stale = Class.objects.get(pk=self.class_obj.pk)
+        Enrollment.objects.admit(self.student, stale)
+        stale.title = 'Renomeada'
+        stale.save()
+        with self.assertRaises(ClassFull):
+            Enrollment.objects.admit(self.other_student, stale)
+        self.assertEqual(self._participants_count(), 1)
+        self.assertEqual(Enrollment.objects.filter(class_ref=self.class_obj).count(), 1)
+
+    def _authenticate_fresh(self, user):
+        # Usuário recém-carregado e cache vazio: a contagem inclui a leitura dos papéis.
+        cache.clear()
+        self.client.force_authenticate(self.User.objects.get(pk=user.pk))
+
+    def _bulk_enroll(self, payload):
+        self._authenticate_fresh(self.instructor)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(reverse('enrollments-bulk'), payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, len(ctx.captured_queries)
+
+    def test_bulk_enroll_reports_per_item_status(self):
+        Enrollment.objects.create(class_ref=self.class_obj, student=self.student)
+        full_class = Class.objects.create(
+            title='Lotada',
+            start_datetime=timezone.now() + timedelta(days=2),
+            capacity=0,
+        )
+        response, _ = self._bulk_enroll({
+            'class_ref': self.class_obj.id,
+            'students': [self.student.id, self.other_student.id, self.instructor.id, 999999],
+            'items': [{'class_ref': full_class.id, 'student': self.other_student.id}],
+        })
+        statuses = {(row['class_ref'], row['student']): row['status'] for row in response.data['results']}
+        self.assertEqual(statuses, {
+            (full_class.id, self.other_student.id): 'class_full',
+            (self.class_obj.id, self.student.id): 'already_enrolled',
+            (self.class_obj.id, self.other_student.id): 'created',
+            (self.class_obj.id, self.instructor.id): 'not_allowed',
+            (self.class_obj.id, 999999): 'invalid_student',
+        })
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(self._participants_count(), 2)
+
+    def test_bulk_admit_counts_only_rows_actually_inserted(self):
+        plan = Enrollment.objects._plan_admissions
+
+        def racing_plan(pairs, lock):
+            planned = plan(pairs, lock)
+            # Gravada por fora entre a leitura e o INSERT.
+            Enrollment.objects.bulk_create([Enrollment(class_ref=self.class_obj, student=self.student)])
+            return planned
+
+        with mock.patch.object(Enrollment.objects, '_plan_admissions', side_effect=racing_plan):
+            results = Enrollment.objects.bulk_admit([
+                (self.class_obj.id, self.student.id), (self.class_obj.id, self.other_student.id),
+            ])
+        self.assertEqual(results, {
+            (self.class_obj.id, self.student.id): 'already_enrolled',
+            (self.class_obj.id, self.other_student.id): 'created',
+        })
+        self.assertEqual(Enrollment.objects.filter(class_ref=self.class_obj).count(), 2)
+        self.assertEqual(self._participants_count(), 1)
+
+    @override_settings(THROTTLE_RATES={'enrollments': '2/min'})
+    @mock.patch('app.throttling.FixedWindowThrottle.timer', return_value=1200.0)
+    def test_enrollment_writes_are_throttled_per_user(self, timer):
+        self.client.force_authenticate(self.student)
+        url = reverse('enrollments-list')
+        first = self.client.post(url, {'class_ref': self.class_obj.id}, format='json')
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.client.delete(reverse('enrollments-detail', args=[first.data['id']]))
+        with self.assertNumQueries(0):
+            response = self.client.post(url, {'class_ref': self.class_obj.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response['Retry-After'], '60')
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+        self.client.force_authenticate(self.other_student)
+        self.assertEqual(self.client.post(url, {'class_ref': self.class_obj.id}, format='json').status_code,
+                         status.HTTP_201_CREATED)
+
+    def test_bulk_enroll_query_count_is_constant(self):
+        small = [self.User.objects.create_user(username=f'lote{i}').id for i in range(3)]
+        large = [self.User.objects.create_user(username=f'coorte{i}').id for i in range(60)]
+        _, small_queries = self._bulk_enroll({'class_ref': self.class_obj.id, 'students': small})
+        response, large_queries = self._bulk_enroll({'class_ref': self.class_obj.id, 'students': large})
+        self.assertEqual(response.data['created'], 60)
+        self.assertEqual(small_queries, large_queries)
+        self.assertEqual(large_queries, 10)
+        self.assertEqual(self._participants_count(), 63)
+
+    def test_student_cannot_bulk_enroll(self):
+        self.client.force_authenticate(self.student)
+        payload = {'class_ref': self.class_obj.id, 'students': [self.other_student.id]}
+        response = self.client.post(reverse('enrollments-bulk'), payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_cursor_pagination_orders_by_newest_enrollment(self):
+        first = Enrollment.objects.create(class_ref=self.class_obj, student=self.student)
+        second = Enrollment.objects.create(class_ref=self.class_obj, student=self.other_student)
+        self.client.force_authenticate(self.instructor)
+        response = self.client.get(reverse('enrollments-list'), {'pagination': 'cursor', 'page_size': 1})
+        self.assertEqual([row['id'] for row in response.data['results']], [second.id])
+        response = self.client.get(response.data['next'])
+        self.assertEqual([row['id'] for row in response.data['results']], [first.id])
+        self.assertIsNone(response.data['next'])
+
+    def test_access_path_indexes_exist(self):
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, Enrollment._meta.db_table)
+        indexes = {tuple(c['columns']) for c in constraints.values() if c['index'] or c['unique']}
+        self.assertIn(('student_id', 'class_ref_id'), indexes)
+        self.assertIn(('student_id', 'created_at'), indexes)
+        self.assertIn(('class_ref_id', 'created_at'), indexes)
+        self.assertIn(('created_at', 'id'), indexes)
+
+    def test_enrollment_list_revalidates_with_etag(self):
+        enrollment = Enrollment.objects.create(class_ref=self.class_obj, student=self.student)
+        self.client.force_authenticate(self.student)
+        first = self.client.get(reverse('enrollments-list'))
+        again = self.client.get(reverse('enrollments-list'), HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(again.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        detail_url = reverse('enrollments-detail', args=[enrollment.id])
+        detail = self.client.get(detail_url)
+        self.assertEqual(self.client.get(detail_url, HTTP_IF_NONE_MATCH=detail['ETag']).status_code, status.HTTP_304_NOT_MODIFIED)
+
+        enrollment.delete()
+        after_delete = self.client.get(reverse('enrollments-list'), HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(after_delete.status_code, status.HTTP_200_OK)
+        self.assertEqual(after_delete.data['results'], [])
+
+    def _export(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content).decode('utf-8-sig')
+
+    def test_export_streams_csv_respecting_roles(self):
+        self.student.first_name = 'Ana'
+        self.student.save()
+        self.other_student.first_name = '=HYPERLINK("http://x")'
+        self.other_student.save()
+        Enrollment.objects.create(class_ref=self.class_obj, student=self.student)
+        Enrollment.objects.create(class_ref=self.class_obj, student=self.other_student)
+
+        self._authenticate_fresh(self.instructor)
+        with CaptureQueriesContext(connection) as ctx:
+            response, body = self._export(reverse('enrollments-export'))
+        self.assertEqual(len(ctx.captured_queries), 2)  # papéis do instrutor + exportação
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('inscricoes.csv', response['Content-Disposition'])
+        rows = list(csv.DictReader(body.splitlines()))
+        self.assertEqual(len(rows), 2)
+        mine = next(row for row in rows if row['student_username'] == 'student')
+        self.assertEqual(mine['class_title'], 'Aula teste')
+        self.assertEqual(mine['student_first_name'], 'Ana')
+        other = next(row for row in rows if row['student_username'] != 'student')
+        self.assertEqual(other['student_first_name'], '\'=HYPERLINK("http://x")')
+
+        self.client.force_authenticate(self.student)
+        _, body = self._export(reverse('enrollments-export'))
+        self.assertEqual([row['student_id'] for row in csv.DictReader(body.splitlines())], [str(self.student.id)])
+
+    def test_class_roster_exports_ndjson(self):
+        Enrollment.objects.create(class_ref=self.class_obj, student=self.student)
+        other_class = Class.objects.create(title='Outra', start_datetime=timezone.now())
+        Enrollment.objects.create(class_ref=other_class, student=self.other_student)
+
+        self.client.force_authenticate(self.instructor)
+        response, body = self._export(reverse('classes-roster', args=[self.class_obj.id]), format='ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        lines = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([line['student_username'] for line in lines], ['student'])
+        self.assertEqual(lines[0]['class_id'], self.class_obj.id)
+
+        missing = self.client.get(reverse('classes-roster', args=[other_class.id + 1]), {'format': 'ndjson'})
+        self.assertEqual(missing.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(missing['Content-Type'], 'application/json')
+        self.assertIn('detail', missing.json())
+
+    async def test_export_streams_asynchronously_over_asgi(self):
+        await Enrollment.objects.acreate(class_ref=self.class_obj, student=self.student)
+        token = RefreshToken.for_user(self.student).access_token
+        response = await self.async_client.get(
+            reverse('enrollments-export'), {'format': 'ndjson'}, headers={'Authorization': f'Bearer {token}'}
+        )
+        self.assertTrue(response.is_async)
+        body = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(json.loads(body)['class_title'], 'Aula teste')
+
+class ConcurrentAdmissionTests(TransactionTestCase):
+    capacity = 3
+    students = 10
+
+    def setUp(self):
+        User = get_user_model()
+        self.class_obj = Class.objects.create(
+            title='Aula concorrida',
+            start_datetime=timezone.now() + timedelta(days=1),
+            capacity=self.capacity,
+        )
+        self.users = [User.objects.create_user(username=f'aluno{i}', password='pass123') for i in range(self.students)]
+
+    def test_concurrent_enrollments_do_not_overbook(self):
+        barrier = threading.Barrier(self.students)
+        statuses = []
+
+        def enroll(user):
+            client = APIClient()
+            client.force_authenticate(user)
+            try:
+                barrier.wait()
+                response = client.post(reverse('enrollments-list'), {'class_ref': self.class_obj.id}, format='json')
+                statuses.append(response.status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=enroll, args=(u,)) for u in self.users]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(statuses.count(status.HTTP_201_CREATED), self.capacity)
+        self.assertEqual(statuses.count(status.HTTP_409_CONFLICT), self.students - self.capacity)
+        self.class_obj.refresh_from_db()
+        self.assertEqual(self.class_obj.participants_count, self.capacity)
+        self.assertEqual(Enrollment.objects.filter(class_ref=self.class_obj).count(), self.capacity)
+
+
+class AsyncEnrollmentAPITests(AsyncReadViewsMixin, EnrollmentAPITests):
+    """Os mesmos cenários com as leituras pelas views assíncronas."""
+
+
+class GenerateLoadDataTests(TransactionTestCase):
+    def _generate(self, prefix):
+        call_command(
+            'generate_load_data',
+            students=30, instructors=2, classes=8, enrollments=100,
+            seed=7, batch_size=16, prefix=prefix, stdout=StringIO(),
+        )
+        return list(
+            Class.objects.filter(title__startswith=f'[{prefix}] ').order_by('pk').values_list('participants_count', flat=True)
+        )
+
+    def test_generates_requested_volume_deterministically(self):
+        User = get_user_model()
+        counts = self._generate('a')
+        self.assertEqual(User.objects.filter(username__startswith='a_aluno').count(), 30)
+        self.assertEqual(User.objects.filter(username__startswith='a_instrutor', groups__name='instructor').count(), 2)
+        self.assertEqual(Enrollment.objects.count(), 100)
+        self.assertEqual(Class.objects.aggregate(total=Sum('participants_count'))['total'], 100)
+        self.assertTrue(User.objects.get(username='a_aluno0').check_password('Senha@123'))
+        self.assertTrue(User.objects.get(username='a_aluno0').profile)
+
+        self.assertEqual(self._generate('b'), counts)
@@ -1,19 +1,34 @@
+from asgiref.sync import sync_to_async
 from rest_framework import viewsets, permissions, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from django.contrib.auth import get_user_model
 from django.db import IntegrityError
-from .models import Enrollment
-from .serializers import EnrollmentSerializer
-from app.users.permissions import is_admin, is_instructor
+from .filters import EnrollmentHistoryFilter
+from .models import ArchivedEnrollment, Enrollment, ClassClosed, ClassFull
+from .serializers import ArchivedEnrollmentSerializer, EnrollmentSerializer, BulkEnrollmentSerializer
+from app.asyncviews import AsyncReadMixin
+from app.history import apply_filterset, history_page, include_archived
+from app.exports import CSVRenderer, NDJSONRenderer, stream_export
+from app.conditional import aconditional_response, aqueryset_fingerprint, conditional_response, make_etag, queryset_fingerprint
+from app.pagination import OptionalCursorPagination
+from app.throttling import WriteThrottle
+from app.users.permissions import is_admin, is_instructor, get_roles
 from drf_spectacular.utils import extend_schema, extend_schema_view, OpenApiParameter
 
 User = get_user_model()
 
+class EnrollmentPagination(OptionalCursorPagination):
+    cursor_ordering = ('-created_at', '-id')
+
 @extend_schema_view(
     list=extend_schema(
         summary='Listar inscrições',
-        description='Retorna inscrições com paginação. Admin/instrutor vê todas; aluno vê apenas as suas.',
+        description=(
+            'Retorna inscrições com paginação. Admin/instrutor vê todas; aluno vê apenas as suas. '
+            'Use `?pagination=cursor` para paginação por cursor. `include_archived=true` inclui as inscrições '
+            'de aulas arquivadas (`archived: true`), das mais recentes às mais antigas.'
+        ),
         tags=['enrollments']
     ),
     retrieve=extend_schema(
@@ -26,7 +41,8 @@ User = get_user_model()
         description=(
             'Cria uma inscrição do aluno em uma aula. '
             'Admin/Instrutor pode informar `student` (ID) para inscrever terceiros; '
-            'aluno comum cria para si. Evita duplicidade e bloqueia inscrição de contas privilegiadas.'
+            'aluno comum cria para si. Evita duplicidade e bloqueia inscrição de contas privilegiadas. '
+            'Quando a aula atinge `capacity`, responde **409** (aula lotada).'
         ),
         tags=['enrollments']
     ),
@@ -46,28 +62,100 @@ User = get_user_model()
         tags=['enrollments']
     ),
 )
-class EnrollmentViewSet(viewsets.ModelViewSet):
+class EnrollmentViewSet(AsyncReadMixin, viewsets.ModelViewSet):
     queryset = Enrollment.objects.select_related('class_ref', 'student').all()
     serializer_class = EnrollmentSerializer
     permission_classes = [permissions.IsAuthenticated]
+    throttle_classes = [WriteThrottle]
+    throttle_scope = 'enrollments'
+    pagination_class = EnrollmentPagination
     filterset_fields = ['class_ref', 'student']
+    async_handlers = {'list': 'alist', 'retrieve': 'aretrieve'}
 
     def get_queryset(self):
-        u = self.request.user
-        if is_admin(u) or is_instructor(u):
-            return self.queryset
-        return self.queryset.filter(student=u)
+        return Enrollment.objects.visible_to(self.request.user).select_related('class_ref', 'student')
+
+    def _serialize(self, objects, archived):
+        serializer_class = ArchivedEnrollmentSerializer if archived else EnrollmentSerializer
+        return serializer_class(objects, many=True, context=self.get_serializer_context()).data
+
+    def history_list(self, request):
+        live = apply_filterset(EnrollmentHistoryFilter, request, self.get_queryset())
+        archived = apply_filterset(
+            EnrollmentHistoryFilter, request,
+            ArchivedEnrollment.objects.visible_to(request.user).select_related('class_ref', 'student'),
+        )
+        stamps = [queryset_fingerprint(qs, 'updated_at', 'class_ref__updated_at') for qs in (live, archived)]
+        last_modified = max((stamp for stamp, _ in stamps if stamp), default=None)
+        return conditional_response(
+            request,
+            lambda: history_page(self, live, archived, ('-created_at', '-id'), self._serialize),
+            make_etag('enrollments-history', request.user.pk, request.get_full_path(), last_modified, *(n for _, n in stamps)),
+            last_modified,
+        )
+
+    # Carimbos e ETags compartilhados por `list`/`retrieve` e `alist`/`aretrieve`: os dois
+    # caminhos só diferem em como executam as consultas.
+    def _list_validators(self, request, last_modified, total):
+        return make_etag('enrollments', request.user.pk, request.get_full_path(), last_modified, total), last_modified
+
+    def _stamps(self, pk):
+        if not str(pk).isdigit():
+            return None
+        return self.get_queryset().filter(pk=pk).values_list('updated_at', 'class_ref__updated_at')
+
+    def _detail_validators(self, request, pk, stamps):
+        last_modified = max(stamps) if stamps else None
+        return make_etag('enrollment', request.user.pk, pk, last_modified), last_modified
+
+    def list(self, request, *args, **kwargs):
+        if include_archived(request):
+            return self.history_list(request)
+        queryset = self.filter_queryset(self.get_queryset())
+        last_modified, total = queryset_fingerprint(queryset, 'updated_at', 'class_ref__updated_at')
+        return conditional_response(
+            request,
+            lambda: self.list_response(queryset),
+            *self._list_validators(request, last_modified, total),
+        )
+
+    async def alist(self, request, *args, **kwargs):
+        if include_archived(request):
+            return await sync_to_async(self.history_list)(request)
+        queryset = await self.afilter_queryset(self.get_queryset())
+        last_modified, total = await aqueryset_fingerprint(queryset, 'updated_at', 'class_ref__updated_at')
+        return await aconditional_response(
+            request,
+            lambda: self.alist_response(queryset),
+            *self._list_validators(request, last_modified, total),
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        stamps = self._stamps(kwargs['pk'])
+        return conditional_response(
+            request,
+            lambda: super(EnrollmentViewSet, self).retrieve(request, *args, **kwargs),
+            *self._detail_validators(request, kwargs['pk'], stamps.first() if stamps is not None else None),
+        )
+
+    async def aretrieve(self, request, *args, **kwargs):
+        stamps = self._stamps(kwargs['pk'])
+        return await aconditional_response(
+            request,
+            self.aretrieve_response,
+            *self._detail_validators(request, kwargs['pk'], await stamps.afirst() if stamps is not None else None),
+        )
 
     def create(self, request, *args, **kwargs):
         payload = request.data.copy()
         student_id = payload.pop('student', payload.pop('student_id', None))
         target_student = request.user
-        if (is_admin(request.user) or is_instructor(request.user)) and student_id:
+        if student_id and (is_admin(request.user) or is_instructor(request.user)):
             try:
                 s = User.objects.get(pk=int(student_id))
             except (User.DoesNotExist, ValueError):
                 return Response({'detail': 'Aluno inválido.'}, status=status.HTTP_400_BAD_REQUEST)
-            if s.is_superuser or s.groups.filter(name__in=['admin', 'instructor']).exists():
+            if s.is_superuser or get_roles(s):
                 return Response({'detail': 'Não é possível inscrever este usuário.'}, status=status.HTTP_400_BAD_REQUEST)
             target_student = s
         serializer = self.get_serializer(data=payload, context={'request': request, 'target_student': target_student})
@@ -76,12 +164,85 @@ class EnrollmentViewSet(viewsets.ModelViewSet):
             self.perform_create(serializer, target_student)
         except IntegrityError:
             return Response({'detail': 'Você já está inscrito nesta aula.'}, status=status.HTTP_400_BAD_REQUEST)
+        except ClassFull:
+            return Response({'detail': 'A aula está lotada.'}, status=status.HTTP_409_CONFLICT)
+        except ClassClosed:
+            return Response({'detail': 'A aula já foi encerrada e não aceita inscrições.'}, status=status.HTTP_409_CONFLICT)
         headers = self.get_success_headers(serializer.data)
         return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
 
     def perform_create(self, serializer, target_student):
         serializer.save(student=target_student)
 
+    @extend_schema(
+        summary='Inscrição em lote',
+        description=(
+            'Inscreve vários alunos de uma vez. Aceita `class_ref` + `students` (lista de IDs) '
+            'e/ou `items` (lista de pares `class_ref`/`student`). Retorna o resultado por item: '
+            '`created`, `already_enrolled`, `class_full`, `class_closed` (aula anterior ao corte de arquivamento), '
+            '`invalid_class`, `invalid_student` ou `not_allowed`. '
+            'Requer permissão de **admin** ou **instrutor**.'
+        ),
+        tags=['enrollments'],
+        request=BulkEnrollmentSerializer,
+        responses={200: dict, 400: dict, 403: dict}
+    )
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk(self, request):
+        if not (is_admin(request.user) or is_instructor(request.user)):
+            return Response({'detail': 'Permissão negada.'}, status=status.HTTP_403_FORBIDDEN)
+        ser = BulkEnrollmentSerializer(data=request.data)
+        ser.is_valid(raise_exception=True)
+        pairs = ser.validated_data['pairs']
+
+        students = {
+            pk: is_superuser or bool(role)
+            for pk, is_superuser, role in (
+                User.objects
+                .filter(pk__in={student_id for _, student_id in pairs})
+                .values_list('pk', 'is_superuser', 'profile__role')
+            )
+        }
+        results = {}
+        admissible = []
+        for pair in pairs:
+            if pair[1] not in students:
+                results[pair] = 'invalid_student'
+            elif students[pair[1]]:
+                results[pair] = 'not_allowed'
+            else:
+                admissible.append(pair)
+        if admissible:
+            results.update(Enrollment.objects.bulk_admit(admissible))
+
+        items = [
+            {'class_ref': class_id, 'student': student_id, 'status': results[(class_id, student_id)]}
+            for class_id, student_id in pairs
+        ]
+        created = sum(1 for item in items if item['status'] == 'created')
+        return Response({'created': created, 'failed': len(items) - created, 'results': items}, status=status.HTTP_200_OK)
+
+    @extend_schema(
+        summary='Exportar inscrições',
+        description=(
+            'Transmite o relatório de inscrições em CSV (`?format=csv`, padrão) ou NDJSON (`?format=ndjson`), '
+            'com título e início da aula, dados do aluno e datas, sem paginação e com memória constante. '
+            'Aceita os mesmos filtros da listagem (`class_ref`, `student`). Admin/instrutor exporta todas; aluno apenas as suas.'
+        ),
+        tags=['enrollments'],
+        responses={(200, 'text/csv'): str, (200, 'application/x-ndjson'): str},
+    )
+    @action(detail=False, methods=['get'], url_path='export', renderer_classes=[CSVRenderer, NDJSONRenderer],
+            pagination_class=None)
+    def export(self, request):
+        queryset = self.filter_queryset(Enrollment.objects.visible_to(request.user)).order_by('-created_at', '-id')
+        return stream_export(
+            request,
+            Enrollment.objects.export_rows(queryset),
+            [column for column, _ in Enrollment.objects.EXPORT_COLUMNS],
+            'inscricoes',
+        )
+
     @extend_schema(
         summary='Cancelar inscrição do aluno logado por aula',
         description='Exclui a inscrição do **usuário autenticado** na aula indicada por `class_id`.',
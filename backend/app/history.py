@@ -0,0 +1,46 @@
+from django.db.models import BooleanField, Value
+from django_filters.utils import translate_validation
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+PARAM = 'include_archived'
+
+
+def include_archived(request):
+    return request.query_params.get(PARAM, '').lower() in ('true', '1')
+
+
+def apply_filterset(filterset_class, request, queryset):
+    filterset = filterset_class(request.query_params, queryset=queryset, request=request)
+    if not filterset.is_valid():
+        raise translate_validation(filterset.errors)
+    return filterset.qs
+
+
+def history_page(view, live, archived, ordering, serialize):
+    """
+    Pagina a união das tabelas vivas e de arquivo em `ordering`: a página é escolhida só
+    sobre o id e os campos de ordenação (índices das duas tabelas) e depois as linhas da
+    página são carregadas de cada tabela pelo id. `serialize(objetos, arquivados)` devolve
+    os dicts de cada tabela; cada linha ganha `archived`. Só paginação por número.
+    """
+    request = view.request
+    if view.paginator is not None and view.paginator.use_cursor(request):
+        raise ValidationError({'detail': f'Paginação por cursor indisponível com {PARAM}.'})
+    fields = ['id'] + [field.lstrip('-') for field in ordering if field.lstrip('-') != 'id']
+    keys = (
+        live.order_by().values(*fields).annotate(archived=Value(False, output_field=BooleanField()))
+        .union(archived.order_by().values(*fields).annotate(archived=Value(True, output_field=BooleanField())), all=True)
+        .order_by(*ordering)
+    )
+    page = view.paginate_queryset(keys)
+    rows = list(keys) if page is None else page
+    loaded = {}
+    for flag, queryset in ((False, live), (True, archived)):
+        ids = [row['id'] for row in rows if bool(row['archived']) is flag]
+        if ids:
+            objects = list(queryset.filter(pk__in=ids))
+            for obj, data in zip(objects, serialize(objects, flag)):
+                loaded[flag, obj.pk] = {**data, 'archived': flag}
+    data = [loaded[bool(row['archived']), row['id']] for row in rows]
+    return Response(data) if page is None else view.get_paginated_response(data)
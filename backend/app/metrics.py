@@ -0,0 +1,221 @@
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema
+from rest_framework.views import APIView
+from app.users.permissions import IsAdmin
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+UNMATCHED = '<unmatched>'
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class _Histogram:
+    __slots__ = ('buckets', 'counts', 'sum')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bound, count in zip((*self.buckets, '+Inf'), self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        yield f'{name}_sum{{{labels}}} {self.sum}'
+        yield f'{name}_count{{{labels}}} {cumulative}'
+
+
+class _Endpoint:
+    __slots__ = ('statuses', 'duration', 'queries', 'db_seconds', 'size')
+
+    def __init__(self):
+        self.statuses = {}
+        self.duration = _Histogram(DURATION_BUCKETS)
+        self.queries = _Histogram(QUERY_BUCKETS)
+        self.db_seconds = 0.0
+        self.size = _Histogram(SIZE_BUCKETS)
+
+
+class MetricsRegistry:
+    """
+    Agregados em memória por rota (`url_name`) e método: contagem por status e
+    histogramas de tempo total, consultas SQL e tamanho da resposta, mais o tempo total
+    no banco. Cada processo tem o seu; `render` gera o formato texto do Prometheus.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def record(self, route, method, status, seconds, queries, db_seconds, size):
+        with self._lock:
+            endpoint = self._endpoints.get((route, method))
+            if endpoint is None:
+                endpoint = self._endpoints[(route, method)] = _Endpoint()
+            endpoint.statuses[status] = endpoint.statuses.get(status, 0) + 1
+            endpoint.duration.observe(seconds)
+            endpoint.queries.observe(queries)
+            endpoint.db_seconds += db_seconds
+            if size is not None:
+                endpoint.size.observe(size)
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+    def render(self):
+        with self._lock:
+            endpoints = sorted(self._endpoints.items())
+            lines = [
+                '# HELP app_http_requests_total Requisições atendidas, por rota, método e status.',
+                '# TYPE app_http_requests_total counter',
+            ]
+            for (route, method), endpoint in endpoints:
+                for code, count in sorted(endpoint.statuses.items()):
+                    lines.append(f'app_http_requests_total{{route="{route}",method="{method}",status="{code}"}} {count}')
+            for name, kind, help_text, attr in (
+                ('app_http_request_duration_seconds', 'histogram', 'Tempo total da requisição.', 'duration'),
+                ('app_http_request_db_queries', 'histogram', 'Consultas SQL por requisição.', 'queries'),
+                ('app_http_request_db_seconds_total', 'counter', 'Tempo total gasto no banco.', 'db_seconds'),
+                ('app_http_response_size_bytes', 'histogram', 'Tamanho do corpo das respostas não transmitidas.', 'size'),
+            ):
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+                for (route, method), endpoint in endpoints:
+                    labels = f'route="{route}",method="{method}"'
+                    value = getattr(endpoint, attr)
+                    if kind == 'counter':
+                        lines.append(f'{name}{{{labels}}} {value:.6f}')
+                    elif value.sum or any(value.counts):
+                        lines.extend(value.lines(name, labels))
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+class _RequestMetrics:
+    __slots__ = ('queries', 'db_seconds', 'statements')
+
+    def __init__(self, capture_sql):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.statements = [] if capture_sql else None
+
+
+def _execute_wrapper(execute, sql, params, many, context):
+    current = _current.get()
+    if current is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - start
+        current.queries += 1
+        current.db_seconds += elapsed
+        if current.statements is not None:
+            current.statements.append((elapsed, sql))
+
+
+def _install(connection, **kwargs):
+    # No início da lista: `connection.execute_wrapper()` remove sempre o último item.
+    if _execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _execute_wrapper)
+
+
+class MetricsMiddleware:
+    """
+    Mede cada requisição (tempo total, consultas e tempo no banco, status e tamanho do
+    corpo) e registra em `registry` pela rota resolvida. As consultas são contadas por um
+    `execute_wrapper` que consulta um `ContextVar`, então valem também para views
+    assíncronas. Com `METRICS_SLOW_REQUEST_MS` as requisições mais lentas que o limite
+    são logadas com as consultas mais demoradas. Desligado com `METRICS_ENABLED = False`.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICS_ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.slow_ms = getattr(settings, 'METRICS_SLOW_REQUEST_MS', 0)
+        connection_created.connect(_install, dispatch_uid='app.metrics')
+        for connection in connections.all(initialized_only=True):
+            _install(connection)
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self._acall(request)
+        current = _RequestMetrics(self.slow_ms > 0)
+        token = _current.set(current)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self._record(request, response, current, time.perf_counter() - start)
+        return response
+
+    async def _acall(self, request):
+        current = _RequestMetrics(self.slow_ms > 0)
+        token = _current.set(current)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self._record(request, response, current, time.perf_counter() - start)
+        return response
+
+    def _record(self, request, response, current, seconds):
+        match = getattr(request, 'resolver_match', None)
+        route = (match.url_name or match.view_name) if match else UNMATCHED
+        size = None if response.streaming else len(response.content)
+        registry.record(route, request.method, response.status_code, seconds, current.queries, current.db_seconds, size)
+        if self.slow_ms and seconds * 1000 >= self.slow_ms:
+            slowest = sorted(current.statements, key=lambda item: item[0], reverse=True)[:5]
+            logger.warning(
+                'Requisição lenta: %s %s (%s) %.1f ms, %d consultas em %.1f ms.\n%s',
+                request.method, request.path, route, seconds * 1000, current.queries, current.db_seconds * 1000,
+                '\n'.join(f'  {elapsed * 1000:.1f} ms: {sql}' for elapsed, sql in slowest),
+            )
+
+
+@extend_schema(
+    tags=['metrics'],
+    summary='Métricas (Prometheus)',
+    description=(
+        'Requisições, tempo, consultas SQL, tempo no banco e tamanho das respostas por rota e método, '
+        'no formato texto do Prometheus. Os valores são do processo que atendeu. Requer admin.'
+    ),
+    responses={(200, 'text/plain'): OpenApiTypes.STR},
+)
+class MetricsView(APIView):
+    permission_classes = [IsAdmin]
+
+    def get(self, request):
+        return HttpResponse(registry.render(), content_type=PROMETHEUS_CONTENT_TYPE)
@@ -0,0 +1,86 @@
+from asgiref.sync import sync_to_async
+from django.core.paginator import InvalidPage
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class OptionalCursorPagination(PageNumberPagination):
+    """
+    Paginação por número de página (com `count`) por padrão; com `?pagination=cursor`
+    (ou ao seguir um link com `?cursor=`) usa paginação por cursor sobre `cursor_ordering`,
+    sem OFFSET nem COUNT(*), com custo constante independente da profundidade.
+    """
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    cursor_ordering = None
+    mode_query_param = 'pagination'
+
+    def __init__(self):
+        self.cursor = None
+
+    def use_cursor(self, request):
+        params = request.query_params
+        return params.get(self.mode_query_param) == 'cursor' or CursorPagination.cursor_query_param in params
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.use_cursor(request):
+            return super().paginate_queryset(queryset, request, view)
+        self.cursor = CursorPagination()
+        self.cursor.ordering = self.cursor_ordering
+        self.cursor.page_size = self.page_size
+        self.cursor.page_size_query_param = self.page_size_query_param
+        self.cursor.max_page_size = self.max_page_size
+        page = self.cursor.paginate_queryset(queryset, request, view)
+        self.display_page_controls = self.cursor.display_page_controls
+        return page
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """`paginate_queryset` com COUNT e página lidos pelo ORM assíncrono (o cursor segue síncrono)."""
+        if self.use_cursor(request):
+            return await sync_to_async(self.paginate_queryset)(queryset, request, view)
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        paginator = self.django_paginator_class(queryset, page_size)
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            number = paginator.validate_number(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(page_number=page_number, message=str(exc)))
+        bottom = (number - 1) * page_size
+        top = bottom + page_size
+        if top + paginator.orphans >= paginator.count:
+            top = paginator.count
+        self.page = paginator._get_page([obj async for obj in queryset[bottom:top]], number, paginator)
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+        return list(self.page)
+
+    def get_paginated_response(self, data):
+        if self.cursor:
+            return self.cursor.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def get_html_context(self):
+        if self.cursor:
+            return self.cursor.get_html_context()
+        return super().get_html_context()
+
+    def to_html(self):
+        if self.cursor:
+            return self.cursor.to_html()
+        return super().to_html()
+
+    def get_schema_operation_parameters(self, view):
+        cursor_params = CursorPagination().get_schema_operation_parameters(view)
+        return super().get_schema_operation_parameters(view) + [
+            p for p in cursor_params if p['name'] == CursorPagination.cursor_query_param
+        ] + [{
+            'name': self.mode_query_param,
+            'required': False,
+            'in': 'query',
+            'description': 'Use `cursor` para paginação por cursor (sem `count`).',
+            'schema': {'type': 'string', 'enum': ['page', 'cursor']},
+        }]
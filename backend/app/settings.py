@@ -28,6 +28,7 @@ INSTALLED_APPS = [
     'app.enrollments',
 ]
 MIDDLEWARE = [
+    'app.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -55,6 +56,14 @@ TEMPLATES = [
     },
 ]
 WSGI_APPLICATION = 'app.wsgi.application'
+# request: uma conexão por requisição; persistent: reaproveitada por DB_CONN_MAX_AGE
+# segundos (WSGI, padrão do app/wsgi.py); pool: fechada a cada requisição mas devolvida
+# ao pool do gerenciador ODBC (ASGI/threads, padrão do app/asgi.py).
+DB_CONNECTION_MODE = os.getenv('DB_CONNECTION_MODE') or 'persistent'
+DB_CONNECTION = {
+    'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', '60')) if DB_CONNECTION_MODE == 'persistent' else 0,
+    'CONN_HEALTH_CHECKS': os.getenv('DB_CONN_HEALTH_CHECKS', '1') == '1',
+}
 DATABASES = {
     'default': {
         'ENGINE': 'mssql',
@@ -65,16 +74,43 @@ DATABASES = {
         'PORT': os.getenv('DB_PORT', '1433'),
         'OPTIONS': {
             'driver': 'ODBC Driver 18 for SQL Server',
-            'extra_params': 'Encrypt=yes;TrustServerCertificate=yes;'
+            'extra_params': 'Encrypt=yes;TrustServerCertificate=yes;',
+            'return_rows_bulk_insert': True,
         },
+        **DB_CONNECTION,
     }
 }
+if os.getenv('DB_ENGINE') == 'sqlite':
+    DATABASES['default'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.getenv('DB_NAME', str(BASE_DIR / 'db.sqlite3')),
+        **DB_CONNECTION,
+    }
+else:
+    try:
+        import pyodbc
+    except ImportError:
+        pass
+    else:
+        # Vale para o processo todo e só antes da primeira conexão.
+        pyodbc.pooling = DB_CONNECTION_MODE == 'pool'
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
     {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator'},
     {'NAME': 'django.contrib.auth.password_validation.CommonPasswordValidator'},
     {'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator'},
 ]
+PASSWORD_HASHERS = [
+    'app.users.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+# Custo do PBKDF2 (vazio = padrão do Django, 720 mil no 5.0). Cada login e cada senha
+# gravada pagam esse custo em CPU; menos iterações aliviam os workers, mas tornam um hash
+# vazado mais barato de quebrar. Só sobe: hashes já gravados com custo maior são mantidos.
+PASSWORD_PBKDF2_ITERATIONS = int(os.getenv('PASSWORD_PBKDF2_ITERATIONS', '0')) or None
 LANGUAGE_CODE = 'pt-br'
 TIME_ZONE = 'America/Sao_Paulo'
 USE_I18N = True
@@ -85,7 +121,7 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'app.users.authentication.JWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -132,6 +168,7 @@ Esta API permite:
         {'name': 'users', 'description': 'Operações relacionadas a usuários e perfis.'},
         {'name': 'classes', 'description': 'CRUD de aulas (criar, listar, detalhar, atualizar e excluir).'},
         {'name': 'enrollments', 'description': 'Gerenciamento de inscrições dos alunos nas aulas.'},
+        {'name': 'metrics', 'description': 'Métricas de desempenho por endpoint.'},
         {'name': 'auth', 'description': 'Autenticação com JWT (login e refresh).'},
     ],
 
@@ -148,6 +185,47 @@ SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=30),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
 }
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'gerenciamento-aulas'),
+    }
+}
+CLASS_CACHE_ALIAS = 'default'
+CLASS_CACHE_TIMEOUT = int(os.getenv('CLASS_CACHE_TIMEOUT', '300'))
+ROLES_CACHE_TIMEOUT = int(os.getenv('ROLES_CACHE_TIMEOUT', '60'))
+LOGIN_EMAIL_CACHE_TIMEOUT = int(os.getenv('LOGIN_EMAIL_CACHE_TIMEOUT', '300'))
+USER_SEARCH_LIMIT = int(os.getenv('USER_SEARCH_LIMIT', '50'))
+# Linhas com senha aceitas por importação via API (cada uma custa um hash PBKDF2); o comando não limita.
+USER_IMPORT_MAX_PASSWORDS = int(os.getenv('USER_IMPORT_MAX_PASSWORDS', '200'))
+# Views de leitura assíncronas: `app/asgi.py` liga, `app/wsgi.py` e o restante (testes, manage.py) ficam no caminho síncrono.
+ASYNC_READ_VIEWS = os.getenv('ASYNC_READ_VIEWS', '0') == '1'
+CLASS_EVENTS_BROKER = os.getenv('CLASS_EVENTS_BROKER', 'app.classes.events.InProcessBroker')
+CLASS_EVENTS_HEARTBEAT = int(os.getenv('CLASS_EVENTS_HEARTBEAT', '15'))
+CLASS_EVENTS_QUEUE_SIZE = int(os.getenv('CLASS_EVENTS_QUEUE_SIZE', '100'))
+CLASS_CALENDAR_PAST_DAYS = int(os.getenv('CLASS_CALENDAR_PAST_DAYS', '30'))
+CLASS_CALENDAR_DURATION_MINUTES = int(os.getenv('CLASS_CALENDAR_DURATION_MINUTES', '60'))
+CLASS_ARCHIVE_AFTER_DAYS = int(os.getenv('CLASS_ARCHIVE_AFTER_DAYS', '365'))
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', '1') == '1'
+METRICS_SLOW_REQUEST_MS = int(os.getenv('METRICS_SLOW_REQUEST_MS', '0'))
+THROTTLE_CACHE_ALIAS = os.getenv('THROTTLE_CACHE_ALIAS', 'default')
+THROTTLE_RATES = {
+    scope: os.getenv(f"THROTTLE_RATE_{scope.upper().replace('-', '_')}", rate) or None
+    for scope, rate in {
+        # Janela fixa: na virada cabem duas rajadas seguidas (30, 10 e 10 no pior caso).
+        'login': '60/min:15',
+        'login-account': '5/min:5',
+        'enrollments': '30/min:5',
+    }.items()
+}
+TASK_QUEUE_BACKEND = os.getenv('TASK_QUEUE_BACKEND', 'app.tasks.ThreadQueue')
+TASK_QUEUE_WORKERS = int(os.getenv('TASK_QUEUE_WORKERS', '1'))
+AVATAR_SIZES = tuple(int(size) for size in os.getenv('AVATAR_SIZES', '64,128,256').split(','))
+AVATAR_DEFAULT_SIZE = int(os.getenv('AVATAR_DEFAULT_SIZE', '128'))
+AVATAR_QUALITY = int(os.getenv('AVATAR_QUALITY', '85'))
+AVATAR_MAX_UPLOAD_BYTES = int(os.getenv('AVATAR_MAX_UPLOAD_BYTES', str(10 * 1024 * 1024)))
+AVATAR_MAX_PIXELS = int(os.getenv('AVATAR_MAX_PIXELS', '40000000'))
+AVATAR_CACHE_MAX_AGE = int(os.getenv('AVATAR_CACHE_MAX_AGE', str(365 * 24 * 3600)))
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOWED_ORIGINS = [
     'http://localhost:8080',
@@ -170,4 +248,7 @@ if 'test' in sys.argv:
     DATABASES['default'] = {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'test.sqlite3',
+        'OPTIONS': {'timeout': 30},
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
+    TASK_QUEUE_BACKEND = 'app.tasks.ImmediateQueue'
@@ -0,0 +1,69 @@
+import logging
+import queue
+import threading
+from functools import lru_cache
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class ImmediateQueue:
+    """Executa a tarefa na hora, na thread de quem enfileirou (testes e scripts)."""
+
+    def enqueue(self, fn, *args, **kwargs):
+        fn(*args, **kwargs)
+
+    def join(self):
+        pass
+
+
+class ThreadQueue:
+    """
+    Fila local do processo: `TASK_QUEUE_WORKERS` threads daemon executam as tarefas em
+    ordem de chegada, fora da thread da requisição. Tarefas pendentes se perdem se o
+    processo terminar, então só devem ir para cá trabalhos que podem ser refeitos.
+    """
+
+    def __init__(self, workers=None):
+        self._queue = queue.Queue()
+        self._workers = workers or getattr(settings, 'TASK_QUEUE_WORKERS', 1)
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def enqueue(self, fn, *args, **kwargs):
+        self._start()
+        self._queue.put((fn, args, kwargs))
+
+    def join(self):
+        self._queue.join()
+
+    def _start(self):
+        with self._lock:
+            while len(self._threads) < self._workers:
+                thread = threading.Thread(target=self._run, name=f'task-queue-{len(self._threads)}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _run(self):
+        while True:
+            fn, args, kwargs = self._queue.get()
+            close_old_connections()
+            try:
+                fn(*args, **kwargs)
+            except Exception:
+                logger.exception('Falha na tarefa %s.', getattr(fn, '__name__', fn))
+            finally:
+                close_old_connections()
+                self._queue.task_done()
+
+
+@lru_cache(maxsize=None)
+def get_task_queue():
+    return import_string(getattr(settings, 'TASK_QUEUE_BACKEND', 'app.tasks.ThreadQueue'))()
+
+
+def enqueue(fn, *args, **kwargs):
+    """Enfileira `fn(*args, **kwargs)` depois do commit da transação atual."""
+    transaction.on_commit(lambda: get_task_queue().enqueue(fn, *args, **kwargs))
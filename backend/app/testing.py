@@ -0,0 +1,34 @@
+"""Apoio aos testes; não é importado pelo código da aplicação."""
+import importlib
+import sys
+from django.conf import settings
+from django.test import override_settings
+from django.urls import clear_url_caches
+
+
+def reload_urlconf():
+    # `as_view` escolhe o caminho ao montar as rotas: recarrega os módulos de URL do
+    # projeto (os incluídos antes da raiz) para valer o `ASYNC_READ_VIEWS` atual.
+    clear_url_caches()
+    root = settings.ROOT_URLCONF
+    included = sorted(name for name in sys.modules if name.startswith('app.') and name.endswith('.urls') and name != root)
+    for name in included + [root]:
+        if name in sys.modules:
+            importlib.reload(sys.modules[name])
+
+
+class AsyncReadViewsMixin:
+    """Roda os testes da classe com `ASYNC_READ_VIEWS = True` e as rotas remontadas."""
+
+    @classmethod
+    def setUpClass(cls):
+        context = override_settings(ASYNC_READ_VIEWS=True)
+        context.enable()
+        reload_urlconf()
+        cls.addClassCleanup(cls._restore_urlconf, context)
+        super().setUpClass()
+
+    @staticmethod
+    def _restore_urlconf(context):
+        context.disable()
+        reload_urlconf()
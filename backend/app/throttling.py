@@ -0,0 +1,138 @@
+import hashlib
+import logging
+import math
+import time
+from collections.abc import Mapping
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from rest_framework.throttling import BaseThrottle
+from app.users.models import normalize_email
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+_local = LocMemCache('throttle-fallback', {'OPTIONS': {'MAX_ENTRIES': 100000}})
+_fallback_logged = False
+
+
+def parse_rate(rate):
+    """
+    `'10/min'` -> até 10 requisições por minuto; `'10/min:30'` -> mesma taxa média, com
+    rajada de 30 (janela de 3 minutos). Devolve `(capacidade, requisições por segundo)`
+    ou `None` (sem limite).
+    """
+    if not rate:
+        return None
+    rate, _, burst = rate.partition(':')
+    count, period = rate.split('/')
+    per_second = int(count) / PERIODS[period.strip()[0]]
+    return int(burst or count), per_second
+
+
+def _cache():
+    return caches[getattr(settings, 'THROTTLE_CACHE_ALIAS', 'default')]
+
+
+def _fallback(exc):
+    global _fallback_logged
+    if not _fallback_logged:
+        logger.warning('Cache de throttling indisponível; usando memória local do processo.', exc_info=exc)
+        _fallback_logged = True
+    return _local
+
+
+def _hit(cache, key, timeout):
+    """Soma 1 ao contador `key` sem corrida entre workers: `add` cria, `incr` é atômico."""
+    cache.add(key, 0, timeout)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Expirou entre o `add` e o `incr`: começa de novo.
+        cache.add(key, 1, timeout)
+        return 1
+
+
+class FixedWindowThrottle(BaseThrottle):
+    """
+    Janela fixa por escopo e cliente: até `capacidade` requisições a cada
+    `capacidade / taxa` segundos, contadas com `add` + `incr` no cache
+    `THROTTLE_CACHE_ALIAS` (atômicos em Redis/Memcached e na memória local; nenhuma
+    consulta ao banco). Na virada da janela um cliente pode somar até duas rajadas
+    seguidas, por isso a rajada configurada deve ser metade do pico tolerado.
+    Se o cache falhar, os contadores passam para a memória local do processo. O
+    escopo vem de `throttle_scope` da view (ou de `scope`) e a taxa de
+    `THROTTLE_RATES[escopo]`; sem taxa a view não é limitada. `methods` restringe os
+    métodos contados.
+    """
+    scope = None
+    methods = None
+    timer = time.time
+
+    def __init__(self):
+        self._wait = None
+
+    def applies(self, request):
+        return self.methods is None or request.method in self.methods
+
+    def get_scope(self, view):
+        return getattr(view, 'throttle_scope', None) or self.scope
+
+    def get_cache_key(self, request, view):
+        user = request.user
+        if user and user.is_authenticated:
+            return f'user:{user.pk}'
+        return f'ip:{self.get_ident(request)}'
+
+    def allow_request(self, request, view):
+        if not self.applies(request):
+            return True
+        scope = self.get_scope(view)
+        rate = parse_rate(getattr(settings, 'THROTTLE_RATES', {}).get(scope))
+        ident = self.get_cache_key(request, view) if rate else None
+        if ident is None:
+            return True
+        capacity, per_second = rate
+        window = capacity / per_second
+        now = self.timer()
+        slot = int(now // window)
+        key = f'throttle:{scope}:{ident}:{slot}'
+        timeout = math.ceil(window) + 1
+        try:
+            count = _hit(_cache(), key, timeout)
+        except Exception as exc:
+            count = _hit(_fallback(exc), key, timeout)
+        if count > capacity:
+            self._wait = (slot + 1) * window - now
+            return False
+        return True
+
+    def wait(self):
+        return self._wait
+
+
+class WriteThrottle(FixedWindowThrottle):
+    """Conta só escritas (POST, PUT, PATCH, DELETE) do usuário ou IP."""
+    methods = frozenset({'POST', 'PUT', 'PATCH', 'DELETE'})
+
+
+class LoginIPThrottle(FixedWindowThrottle):
+    scope = 'login'
+
+
+class LoginAccountThrottle(FixedWindowThrottle):
+    """
+    Limita tentativas por conta e IP, para que um IP estranho não esgote as tentativas do
+    dono da conta. A conta é o valor informado normalizado (sem consultar o banco: a
+    checagem roda mesmo quando o throttle por IP já recusou), então e-mail e username
+    têm contadores separados.
+    """
+    scope = 'login-account'
+
+    def get_cache_key(self, request, view):
+        data = request.data if isinstance(request.data, Mapping) else {}
+        account = normalize_email(str(data.get('username') or ''))
+        if not account:
+            return None
+        return hashlib.sha1(f'{account}\n{self.get_ident(request)}'.encode()).hexdigest()
@@ -1,8 +1,9 @@
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView, SpectacularRedocView
-from app.users.views import StudentListView, InstructorListView
+from app.users.views import StudentListView, StudentImportView, InstructorListView, avatar_file
 from django.conf import settings
+from app.metrics import MetricsView
 from django.conf.urls.static import static
 
 urlpatterns = [
@@ -14,10 +15,14 @@ urlpatterns = [
 
     path('api/auth/', include('app.users.urls')),
     path('api/users/', StudentListView.as_view(), name='users-list'),
+    path('api/users/import/', StudentImportView.as_view(), name='users-import'),
     path('api/instructors/', InstructorListView.as_view(), name='instructors-list'),
 
     path('api/classes/', include('app.classes.urls')),
     path('api/enrollments/', include('app.enrollments.urls')),
+    path('api/metrics/', MetricsView.as_view(), name='metrics'),
+
+    re_path(r'^media/avatars/(?P<digest>[0-9a-f]{64})/(?P<size>[0-9]+)\.webp$', avatar_file, name='avatar-file'),
 ]
 
 urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
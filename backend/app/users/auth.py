@@ -1,17 +1,40 @@
+import hashlib
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from .models import UserProfile, normalize_email
 
-class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
-    def validate(self, attrs):
-        username = attrs.get("username") or attrs.get("email") or ""
-        password = attrs.get("password") or ""
-        User = get_user_model()
+def _login_email_key(email):
+    return f'login-email:{hashlib.sha1(email.encode()).hexdigest()}'
+
+def invalidate_login_emails(*emails):
+    keys = [_login_email_key(email) for email in set(emails) if email]
+    if keys:
+        cache.delete_many(keys)
 
-        if "@" in username:
-            try:
-                u = User.objects.get(email__iexact=username)
-                attrs["username"] = getattr(u, User.USERNAME_FIELD)
-            except User.DoesNotExist:
-                pass
+def resolve_login(value):
+    """
+    Username a partir de um e-mail (índice `UserProfile.email_normalized`, resultado em
+    cache por `LOGIN_EMAIL_CACHE_TIMEOUT`). E-mails ambíguos ou desconhecidos e usernames
+    comuns voltam como vieram.
+    """
+    email = normalize_email(value)
+    if '@' not in email:
+        return value
+    timeout = getattr(settings, 'LOGIN_EMAIL_CACHE_TIMEOUT', 300)
+    key = _login_email_key(email)
+    username = cache.get(key) if timeout else None
+    if username is None:
+        field = f'user__{get_user_model().USERNAME_FIELD}'
+        matches = list(UserProfile.objects.filter(email_normalized=email).values_list(field, flat=True)[:2])
+        username = matches[0] if len(matches) == 1 else ''
+        if timeout:
+            cache.set(key, username, timeout)
+    return username or value
 
+class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
+    def validate(self, attrs):
+        username = attrs.get(self.username_field) or attrs.get("email") or ""
+        attrs[self.username_field] = resolve_login(username)
         return super().validate(attrs)
@@ -1,5 +1,16 @@
+from drf_spectacular.utils import extend_schema
 from rest_framework_simplejwt.views import TokenObtainPairView
+from app.throttling import LoginAccountThrottle, LoginIPThrottle
 from .auth import MyTokenObtainPairSerializer
 
+@extend_schema(
+    summary='Login (JWT)',
+    description=(
+        'Autentica com `username` (ou e-mail) e `password` e retorna um par de tokens **access**/**refresh**. '
+        'Tentativas são limitadas por IP e por conta (`THROTTLE_RATES`); acima do limite responde 429 com `Retry-After`.'
+    ),
+    tags=['auth'],
+)
 class MyTokenObtainPairView(TokenObtainPairView):
     serializer_class = MyTokenObtainPairSerializer
+    throttle_classes = [LoginIPThrottle, LoginAccountThrottle]
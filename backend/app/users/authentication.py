@@ -0,0 +1,60 @@
+from django.utils.translation import gettext_lazy as _
+from drf_spectacular.contrib.rest_framework_simplejwt import SimpleJWTScheme
+from rest_framework_simplejwt.authentication import JWTAuthentication as BaseJWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+
+class JWTAuthentication(BaseJWTAuthentication):
+    """
+    `JWTAuthentication` do simplejwt que carrega o perfil junto com o usuário (os papéis
+    de `UserProfile.role` saem da mesma consulta) e tem uma variante assíncrona usada
+    pelas views de leitura sob ASGI.
+    """
+
+    def _user_lookup(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+        return self.user_model.objects.select_related('profile'), {api_settings.USER_ID_FIELD: user_id}
+
+    def _check_user(self, user, validated_token):
+        if not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        if api_settings.CHECK_REVOKE_TOKEN and (
+            validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password)
+        ):
+            raise AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
+        return user
+
+    def get_user(self, validated_token):
+        queryset, lookup = self._user_lookup(validated_token)
+        try:
+            user = queryset.get(**lookup)
+        except self.user_model.DoesNotExist:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+        return self._check_user(user, validated_token)
+
+    async def aauthenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        queryset, lookup = self._user_lookup(validated_token)
+        try:
+            user = await queryset.aget(**lookup)
+        except self.user_model.DoesNotExist:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+        return self._check_user(user, validated_token)
+
+
+class JWTScheme(SimpleJWTScheme):
+    target_class = 'app.users.authentication.JWTAuthentication'
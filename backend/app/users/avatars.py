@@ -0,0 +1,111 @@
+import hashlib
+import io
+import logging
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.urls import reverse
+from PIL import Image, ImageOps, UnidentifiedImageError
+from .models import UserProfile
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('JPEG', 'PNG', 'WEBP', 'GIF')
+IMAGE_ERRORS = (UnidentifiedImageError, OSError, ValueError, Image.DecompressionBombError)
+
+
+class AvatarError(ValueError):
+    pass
+
+
+def variant_name(digest, size):
+    return f'avatars/{digest[:2]}/{digest}/{size}.webp'
+
+
+def original_name(digest, fmt):
+    return f'avatars/{digest[:2]}/{digest}/original.{fmt.lower()}'
+
+
+def staged_original(digest):
+    """Nome do original ainda não processado de `digest`, se existir."""
+    return next((name for name in (original_name(digest, fmt) for fmt in FORMATS) if default_storage.exists(name)), None)
+
+
+def is_ready(digest):
+    return default_storage.exists(variant_name(digest, max(settings.AVATAR_SIZES)))
+
+
+def stage_avatar(upload):
+    """
+    Valida o cabeçalho da imagem enviada, calcula o SHA-256 do conteúdo e grava o original
+    para processamento. Devolve `(digest, pending)`: com as miniaturas de `digest` já
+    geradas (mesma imagem enviada antes, por qualquer usuário) nada é gravado.
+    """
+    if upload.size > settings.AVATAR_MAX_UPLOAD_BYTES:
+        raise AvatarError(f'Imagem maior que {settings.AVATAR_MAX_UPLOAD_BYTES // (1024 * 1024)} MB.')
+    try:
+        upload.seek(0)
+        with Image.open(upload) as img:
+            fmt, (width, height) = img.format, img.size
+    except IMAGE_ERRORS:
+        raise AvatarError('Imagem inválida.')
+    if fmt not in FORMATS:
+        raise AvatarError('Formato de imagem não suportado (use JPEG, PNG, WebP ou GIF).')
+    if width * height > settings.AVATAR_MAX_PIXELS:
+        raise AvatarError('Imagem com resolução muito alta.')
+    sha = hashlib.sha256()
+    for chunk in upload.chunks():
+        sha.update(chunk)
+    digest = sha.hexdigest()
+    if is_ready(digest):
+        return digest, False
+    name = original_name(digest, fmt)
+    if not default_storage.exists(name):
+        upload.seek(0)
+        default_storage.save(name, upload)
+    return digest, True
+
+
+def process_avatar(digest):
+    """
+    Gera as miniaturas quadradas (`AVATAR_SIZES`, WebP) de `digest` a partir do original
+    gravado por `stage_avatar` e apaga o original. A maior é gravada por último, então
+    `is_ready` só fica verdadeiro com todas prontas. Imagem corrompida: o perfil que a
+    usava volta a ficar sem avatar.
+    """
+    name = staged_original(digest)
+    if name is None:
+        return
+    try:
+        if not is_ready(digest):
+            sizes = sorted(settings.AVATAR_SIZES)
+            with default_storage.open(name, 'rb') as fh, Image.open(fh) as img:
+                img.draft('RGB', (sizes[-1], sizes[-1]))
+                img = ImageOps.exif_transpose(img)
+                alpha = img.mode in ('RGBA', 'LA') or 'transparency' in img.info
+                img = img.convert('RGBA' if alpha else 'RGB')
+                for size in sizes:
+                    buf = io.BytesIO()
+                    ImageOps.fit(img, (size, size), Image.Resampling.LANCZOS).save(
+                        buf, 'WEBP', quality=settings.AVATAR_QUALITY, method=4,
+                    )
+                    target = variant_name(digest, size)
+                    if not default_storage.exists(target):
+                        default_storage.save(target, ContentFile(buf.getvalue()))
+    except IMAGE_ERRORS:
+        logger.warning('Avatar inválido descartado.', exc_info=True, extra={'digest': digest})
+        UserProfile.objects.filter(avatar_hash=digest).update(avatar_hash='')
+    finally:
+        default_storage.delete(name)
+
+
+def avatar_url(profile, request=None, size=None):
+    if profile is None:
+        return None
+    if profile.avatar_hash:
+        url = reverse('avatar-file', args=[profile.avatar_hash, size or settings.AVATAR_DEFAULT_SIZE])
+    elif profile.avatar:
+        url = profile.avatar.url
+    else:
+        return None
+    return request.build_absolute_uri(url) if request else url
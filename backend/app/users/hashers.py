@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    """
+    PBKDF2-SHA256 com o custo de `PASSWORD_PBKDF2_ITERATIONS` (padrão do Django quando
+    vazio). Como o algoritmo não muda, os hashes existentes continuam válidos e os de
+    custo menor são regravados com o custo atual no próximo login bem-sucedido
+    (`must_update`). Hashes mais caros que a configuração nunca são rebaixados.
+    """
+
+    @property
+    def iterations(self):
+        return getattr(settings, 'PASSWORD_PBKDF2_ITERATIONS', None) or super().iterations
+
+    def must_update(self, encoded):
+        return self.decode(encoded)['iterations'] < self.iterations
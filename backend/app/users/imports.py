@@ -0,0 +1,200 @@
+import csv
+from itertools import islice
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.password_validation import validate_password
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+from django.db.models.functions import Lower
+from app.enrollments.models import Enrollment
+from .auth import invalidate_login_emails
+from .models import UserProfile, normalize_email
+from .search import sync_tokens
+
+User = get_user_model()
+
+COLUMNS = ('username', 'email', 'first_name', 'last_name', 'password', 'classes')
+ENROLLMENT_ERRORS = {
+    'class_full': 'Aula {} lotada.',
+    'class_closed': 'Aula {} encerrada.',
+    'invalid_class': 'Aula {} não existe.',
+}
+
+
+class CSVImportError(ValueError):
+    pass
+
+
+class StudentImport:
+    """
+    Importa alunos (e suas inscrições, coluna `classes` com IDs separados por `;`) de um
+    CSV lido em lotes: uma consulta por lote para usuários/e-mails existentes, usuários e
+    perfis criados com `bulk_create` (sem o `post_save` por linha) e inscrições por
+    `Enrollment.objects.bulk_admit`. Cada lote roda numa transação; com `dry_run` ela é
+    desfeita ao final e as inscrições são só classificadas (vagas e duplicadas por
+    leitura, sem travar aulas nem invalidar caches), então nada é gravado; por isso o
+    dry-run não calcula hashes. Cada senha da coluna `password` custa um hash caro:
+    `max_passwords` limita quantas linhas com senha uma importação aceita (as demais
+    viram erro), o que mantém uma requisição da API dentro de segundos.
+    """
+
+    def __init__(self, batch_size=500, dry_run=False, default_password=None, max_passwords=None):
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.max_passwords = max_passwords
+        self.passwords = 0
+        self.default_hash = self._hash(default_password)
+        self.seen_usernames = set()
+        self.seen_emails = set()
+        self.report = {
+            'dry_run': dry_run,
+            'rows': 0,
+            'created_users': 0,
+            'existing_users': 0,
+            'created_enrollments': 0,
+            'errors': [],
+        }
+
+    def _hash(self, password):
+        # `make_password(None)` gera uma senha inutilizável sem rodar o hasher.
+        return make_password(None if self.dry_run else password)
+
+    def run(self, fh):
+        reader = csv.DictReader(fh)
+        try:
+            header = [name.strip() for name in reader.fieldnames or []]
+        except (UnicodeDecodeError, csv.Error):
+            raise CSVImportError('Arquivo CSV inválido (use UTF-8).')
+        if 'username' not in header:
+            raise CSVImportError('O CSV precisa da coluna "username".')
+        unknown = sorted(set(header) - set(COLUMNS))
+        if unknown:
+            raise CSVImportError(f'Colunas desconhecidas: {", ".join(unknown)}.')
+        reader.fieldnames = header
+        rows = ((reader.line_num, row) for row in reader)
+        while True:
+            try:
+                batch = list(islice(rows, self.batch_size))
+            except (UnicodeDecodeError, csv.Error):
+                raise CSVImportError(f'Arquivo CSV inválido após a linha {reader.line_num}.')
+            if not batch:
+                return self.report
+            self._import_batch(batch)
+
+    def _parse(self, line, row):
+        errors = []
+        username = (row.get('username') or '').strip()
+        email = (row.get('email') or '').strip()
+        password = row.get('password') or ''
+        class_ids = []
+        if not username:
+            errors.append('username é obrigatório.')
+        else:
+            try:
+                UnicodeUsernameValidator()(username)
+            except ValidationError:
+                errors.append('username inválido.')
+            if username in self.seen_usernames:
+                errors.append('username repetido no arquivo.')
+            self.seen_usernames.add(username)
+        if email:
+            try:
+                validate_email(email)
+            except ValidationError:
+                errors.append('email inválido.')
+            if email.lower() in self.seen_emails:
+                errors.append('email repetido no arquivo.')
+            self.seen_emails.add(email.lower())
+        if password:
+            if self.max_passwords is not None and self.passwords >= self.max_passwords:
+                errors.append(f'Limite de {self.max_passwords} senhas por importação; use o comando import_students.')
+            self.passwords += 1
+            try:
+                validate_password(password, User(username=username, email=email))
+            except ValidationError as exc:
+                errors.extend(exc.messages)
+        for value in (row.get('classes') or '').replace(',', ';').split(';'):
+            if value.strip():
+                try:
+                    class_ids.append(int(value))
+                except ValueError:
+                    errors.append(f'Aula "{value.strip()}" inválida.')
+        return {
+            'line': line,
+            'username': username,
+            'email': email,
+            'first_name': (row.get('first_name') or '').strip()[:150],
+            'last_name': (row.get('last_name') or '').strip()[:150],
+            'password': password,
+            'class_ids': sorted(set(class_ids)),
+            'errors': errors,
+        }
+
+    def _import_batch(self, batch):
+        rows = [self._parse(line, row) for line, row in batch]
+        self.report['rows'] += len(rows)
+        usernames = [r['username'] for r in rows if r['username']]
+        existing = {
+            u['username']: u for u in
+            User.objects.filter(username__in=usernames)
+            .values('id', 'username', 'is_superuser', 'profile__role')
+        }
+        emails = {r['email'].lower() for r in rows if r['email']}
+        taken_emails = dict(
+            User.objects.annotate(email_lower=Lower('email'))
+            .filter(email_lower__in=emails)
+            .values_list('email_lower', 'username')
+        ) if emails else {}
+
+        new_users = []
+        for r in rows:
+            user = existing.get(r['username'])
+            owner = taken_emails.get(r['email'].lower()) if r['email'] else None
+            if owner and owner != r['username']:
+                r['errors'].append('email já usado por outro usuário.')
+            if user and (user['is_superuser'] or user['profile__role']):
+                r['errors'].append('Não é possível inscrever este usuário.')
+            if r['errors'] or user:
+                r['user_id'] = user['id'] if user and not r['errors'] else None
+                continue
+            r['user'] = User(
+                username=r['username'],
+                email=r['email'],
+                first_name=r['first_name'],
+                last_name=r['last_name'],
+                password=self._hash(r['password']) if r['password'] else self.default_hash,
+            )
+            new_users.append(r['user'])
+
+        with transaction.atomic():
+            User.objects.bulk_create(new_users, batch_size=self.batch_size)
+            UserProfile.objects.bulk_create(
+                [UserProfile(user_id=u.pk, email_normalized=normalize_email(u.email)) for u in new_users],
+                batch_size=self.batch_size,
+            )
+            sync_tokens(new_users, created=True)
+            for r in rows:
+                if 'user' in r:
+                    r['user_id'] = r['user'].pk
+            pairs = [(class_id, r['user_id']) for r in rows if r.get('user_id') for class_id in r['class_ids']]
+            results = Enrollment.objects.bulk_admit(
+                pairs, batch_size=self.batch_size, dry_run=self.dry_run,
+            ) if pairs else {}
+            if self.dry_run:
+                transaction.set_rollback(True)
+            else:
+                transaction.on_commit(lambda: invalidate_login_emails(*(normalize_email(u.email) for u in new_users)))
+
+        for r in rows:
+            if r.get('user_id'):
+                self.report['created_users' if 'user' in r else 'existing_users'] += 1
+            for class_id in r['class_ids'] if r.get('user_id') else ():
+                outcome = results.get((class_id, r['user_id']))
+                if outcome == 'created':
+                    self.report['created_enrollments'] += 1
+                elif outcome in ENROLLMENT_ERRORS:
+                    r['errors'].append(ENROLLMENT_ERRORS[outcome].format(class_id))
+            if r['errors']:
+                self.report['errors'].append({'line': r['line'], 'username': r['username'], 'errors': r['errors']})
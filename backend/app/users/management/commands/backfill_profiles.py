@@ -0,0 +1,51 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from app.users.auth import invalidate_login_emails
+from app.users.models import UserProfile, normalize_email
+from app.users.permissions import sync_roles
+from app.users.search import sync_tokens
+
+User = get_user_model()
+USER_FIELDS = ('username', 'email', 'first_name', 'last_name')
+
+
+class Command(BaseCommand):
+    help = 'Cria perfis ausentes e recalcula os campos derivados do usuário (e-mail normalizado, papel, tokens de busca) em lotes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Quantidade de usuários por lote.')
+
+    def handle(self, *args, batch_size, **options):
+        missing = list(
+            User.objects.filter(~Exists(UserProfile.objects.filter(user=OuterRef('pk')))).values_list('pk', flat=True)
+        )
+        for start in range(0, len(missing), batch_size):
+            UserProfile.objects.bulk_create([UserProfile(user_id=pk) for pk in missing[start:start + batch_size]])
+
+        last_id = updated = roles = 0
+        while True:
+            profiles = list(
+                UserProfile.objects.filter(user_id__gt=last_id).select_related('user')
+                .only('id', 'user_id', 'email_normalized', *(f'user__{f}' for f in USER_FIELDS))
+                .order_by('user_id')[:batch_size]
+            )
+            if not profiles:
+                break
+            last_id = profiles[-1].user_id
+            stale = [p for p in profiles if p.email_normalized != normalize_email(p.user.email)]
+            emails = [p.email_normalized for p in stale]
+            for p in stale:
+                p.email_normalized = normalize_email(p.user.email)
+                emails.append(p.email_normalized)
+            with transaction.atomic():
+                UserProfile.objects.bulk_update(stale, ['email_normalized'], batch_size=batch_size)
+                sync_tokens([p.user for p in profiles])
+                roles += sync_roles([p.user_id for p in profiles], batch_size=batch_size)
+            invalidate_login_emails(*emails)
+            updated += len(stale)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(missing)} perfis criados, {updated} e-mails e {roles} papéis atualizados.'
+        ))
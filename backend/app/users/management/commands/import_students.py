@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+from app.users.imports import CSVImportError, StudentImport
+
+
+class Command(BaseCommand):
+    help = (
+        'Importa alunos e inscrições de um CSV (colunas: username, email, first_name, last_name, '
+        'password, classes). Use --dry-run para apenas validar.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Arquivo CSV (UTF-8).')
+        parser.add_argument('--batch-size', type=int, default=500, help='Quantidade de linhas por lote.')
+        parser.add_argument('--dry-run', action='store_true', help='Valida tudo sem gravar nada.')
+        parser.add_argument('--password', default=None,
+                            help='Senha dos alunos sem a coluna password (padrão: senha inutilizável).')
+
+    def handle(self, *args, path, batch_size, dry_run, password, **options):
+        if batch_size < 1:
+            raise CommandError('--batch-size deve ser positivo.')
+        importer = StudentImport(batch_size=batch_size, dry_run=dry_run, default_password=password)
+        try:
+            with open(path, encoding='utf-8-sig', newline='') as fh:
+                report = importer.run(fh)
+        except OSError as exc:
+            raise CommandError(f'Não foi possível ler {path}: {exc.strerror}.')
+        except CSVImportError as exc:
+            raise CommandError(str(exc))
+
+        for error in report['errors']:
+            self.stderr.write(f"linha {error['line']} ({error['username'] or '-'}): {' '.join(error['errors'])}")
+        prefix = '[dry-run] ' if dry_run else ''
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}{report['rows']} linhas: {report['created_users']} alunos criados, "
+            f"{report['existing_users']} existentes, {report['created_enrollments']} inscrições, "
+            f"{len(report['errors'])} linhas com erro."
+        ))
@@ -7,6 +7,23 @@ def avatar_upload_to(instance, filename):
     ext = (ext or ".png").lower()
     return f"avatars/{instance.user_id}{ext}"
 
+def normalize_email(value):
+    return (value or '').strip().lower()
+
 class UserProfile(models.Model):
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='profile')
     avatar = models.ImageField(upload_to='avatars/', blank=True, null=True)
+    avatar_hash = models.CharField(max_length=64, blank=True, default='')
+    email_normalized = models.CharField(max_length=254, blank=True, default='', db_index=True)
+    role = models.CharField(max_length=32, blank=True, default='', db_index=True)
+    calendar_nonce = models.CharField(max_length=32, blank=True, default='')
+
+class UserSearchToken(models.Model):
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='search_tokens', db_index=False)
+    token = models.CharField(max_length=64)
+
+    class Meta:
+        unique_together = [('user', 'token')]
+        indexes = [
+            models.Index(fields=['token', 'user'], name='user_search_token_idx'),
+        ]
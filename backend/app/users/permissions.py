@@ -1,10 +1,108 @@
+from collections import defaultdict
+from itertools import combinations
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from rest_framework.permissions import BasePermission, SAFE_METHODS
+from .models import UserProfile
+
+ROLE_GROUPS = ('admin', 'instructor')
+
+def role_value(names):
+    """Valor de `UserProfile.role` para os grupos `names`: papéis em ordem, separados por vírgula ('' = aluno)."""
+    return ','.join(sorted(set(names) & set(ROLE_GROUPS)))
+
+def role_values(name):
+    """Todos os valores de `UserProfile.role` que incluem o papel `name` (para filtros `role__in`)."""
+    return [
+        role_value(combo)
+        for size in range(1, len(ROLE_GROUPS) + 1)
+        for combo in combinations(ROLE_GROUPS, size)
+        if name in combo
+    ]
+
+def _parse_role(value):
+    return frozenset(value.split(',')) if value else frozenset()
+
+def _roles_cache_key(user_id):
+    return f'user-roles:{user_id}'
+
+def invalidate_roles(user_id):
+    cache.delete(_roles_cache_key(user_id))
+
+def sync_roles(user_ids, batch_size=1000):
+    """Recalcula `UserProfile.role` a partir dos grupos dos usuários `user_ids`; devolve quantos mudaram."""
+    user_ids = sorted(set(user_ids))
+    changed = 0
+    for start in range(0, len(user_ids), batch_size):
+        batch = user_ids[start:start + batch_size]
+        names = defaultdict(set)
+        for user_id, name in (
+            get_user_model().groups.through.objects
+            .filter(user_id__in=batch, group__name__in=ROLE_GROUPS)
+            .values_list('user_id', 'group__name')
+        ):
+            names[user_id].add(name)
+        by_role = defaultdict(list)
+        for user_id in batch:
+            by_role[role_value(names[user_id])].append(user_id)
+        for role, ids in by_role.items():
+            changed += UserProfile.objects.filter(user_id__in=ids).exclude(role=role).update(role=role)
+        cache.delete_many([_roles_cache_key(user_id) for user_id in batch])
+    return changed
+
+def _loaded_role(user):
+    related = get_user_model().profile.related
+    if not related.is_cached(user):
+        return None
+    profile = related.get_cached_value(user)
+    return profile.role if profile else ''
+
+def get_roles(user):
+    if not (user and user.is_authenticated):
+        return frozenset()
+    roles = getattr(user, '_cached_roles', None)
+    if roles is not None:
+        return roles
+    role = _loaded_role(user)
+    if role is not None:
+        roles = _parse_role(role)
+    else:
+        timeout = getattr(settings, 'ROLES_CACHE_TIMEOUT', 60)
+        key = _roles_cache_key(user.pk)
+        roles = cache.get(key) if timeout else None
+        if roles is None:
+            roles = _parse_role(UserProfile.objects.filter(user_id=user.pk).values_list('role', flat=True).first())
+            if timeout:
+                cache.set(key, roles, timeout)
+    user._cached_roles = roles
+    return roles
+
+async def aget_roles(user):
+    if not (user and user.is_authenticated):
+        return frozenset()
+    roles = getattr(user, '_cached_roles', None)
+    if roles is not None:
+        return roles
+    role = _loaded_role(user)
+    if role is not None:
+        roles = _parse_role(role)
+    else:
+        timeout = getattr(settings, 'ROLES_CACHE_TIMEOUT', 60)
+        key = _roles_cache_key(user.pk)
+        roles = await cache.aget(key) if timeout else None
+        if roles is None:
+            roles = _parse_role(await UserProfile.objects.filter(user_id=user.pk).values_list('role', flat=True).afirst())
+            if timeout:
+                await cache.aset(key, roles, timeout)
+    user._cached_roles = roles
+    return roles
 
 def is_admin(user):
-    return bool(user and user.is_authenticated and (user.is_superuser or user.groups.filter(name='admin').exists()))
+    return bool(user and user.is_authenticated and (user.is_superuser or 'admin' in get_roles(user)))
 
 def is_instructor(user):
-    return bool(user and user.is_authenticated and user.groups.filter(name='instructor').exists())
+    return bool(user and user.is_authenticated and 'instructor' in get_roles(user))
 
 class IsAdmin(BasePermission):
     def has_permission(self, request, view):
@@ -0,0 +1,98 @@
+import re
+import unicodedata
+from functools import reduce
+from operator import or_
+from django.conf import settings
+from django.db.models import Exists, OuterRef, Q, Subquery
+from .models import UserSearchToken, normalize_email
+
+TOKEN_MAX_LENGTH = UserSearchToken._meta.get_field('token').max_length
+MAX_TERMS = 4
+SELECTIVITY_SAMPLE = 5000
+_WORD = re.compile(r'[0-9a-z]+')
+
+
+def normalize_words(value):
+    folded = unicodedata.normalize('NFKD', value or '').encode('ascii', 'ignore').decode().lower()
+    return [word[:TOKEN_MAX_LENGTH] for word in _WORD.findall(folded)]
+
+
+def user_tokens(user):
+    tokens = set()
+    for value in (user.username, (user.email or '').partition('@')[0]):
+        words = normalize_words(value)
+        tokens.update(words)
+        if len(words) > 1:
+            tokens.add(''.join(words)[:TOKEN_MAX_LENGTH])
+    for value in (user.first_name, user.last_name):
+        tokens.update(normalize_words(value))
+    return tokens
+
+
+def sync_tokens(users, created=False):
+    """Grava os tokens de busca de `users`, removendo os que não valem mais (só insere se `created`)."""
+    wanted = {(user.pk, token) for user in users for token in user_tokens(user)}
+    current = set() if created else set(
+        UserSearchToken.objects.filter(user_id__in=[user.pk for user in users]).values_list('user_id', 'token')
+    )
+    stale = current - wanted
+    if stale:
+        UserSearchToken.objects.filter(reduce(or_, (Q(user_id=pk, token=token) for pk, token in stale))).delete()
+    UserSearchToken.objects.bulk_create(
+        [UserSearchToken(user_id=pk, token=token) for pk, token in wanted - current],
+        batch_size=1000,
+    )
+
+
+def _successor(term):
+    chars = list(term)
+    while chars:
+        last = chars.pop()
+        if last == '9':
+            return ''.join(chars) + 'a'
+        if last != 'z':
+            return ''.join(chars) + chr(ord(last) + 1)
+    return None
+
+
+def _prefix(term, field='token'):
+    """Prefixo como faixa `>= term` e `< sucessor`: busca no índice em qualquer banco/colação."""
+    upper = _successor(term)
+    return Q(**{f'{field}__gte': term}) & (Q(**{f'{field}__lt': upper}) if upper else Q())
+
+
+def search_users(queryset, q, limit=None):
+    """
+    Usuários de `queryset` em que cada palavra de `q` (sem acento, minúscula) é prefixo de
+    algum token (username, nome, sobrenome ou parte local do e-mail). Percorre o índice
+    `(token, user)` pela palavra mais seletiva já na ordem do ranking (token exato primeiro,
+    depois os mais próximos) e para ao juntar `limit` usuários (`USER_SEARCH_LIMIT`). Um
+    e-mail completo (`nome@dominio`) é procurado exatamente em `UserProfile.email_normalized`.
+    """
+    limit = limit or getattr(settings, 'USER_SEARCH_LIMIT', 50)
+    local, at, domain = q.strip().partition('@')
+    if at and domain:
+        return queryset.filter(profile__email_normalized=normalize_email(q)).order_by('pk')
+    terms = list(dict.fromkeys(normalize_words(local if at else q)))[:MAX_TERMS]
+    if not terms:
+        return queryset.none()
+    terms.sort(key=len, reverse=True)
+    if len(terms) > 1:
+        terms.sort(key=lambda term: UserSearchToken.objects.filter(_prefix(term))[:SELECTIVITY_SAMPLE].count())
+    pivot = UserSearchToken.objects.filter(_prefix(terms[0]))
+    tokens = pivot.filter(Exists(queryset.filter(pk=OuterRef('user_id'))))
+    for term in terms[1:]:
+        tokens = tokens.filter(Exists(UserSearchToken.objects.filter(_prefix(term), user_id=OuterRef('user_id'))))
+    tokens = tokens.order_by('token', 'user_id').values_list('user_id', flat=True)
+
+    found, offset = {}, 0
+    while len(found) < limit:
+        page = list(tokens[offset:offset + limit * 2])
+        found.update(dict.fromkeys(page))
+        if len(page) < limit * 2:
+            break
+        offset += len(page)
+    if not found:
+        return queryset.none()
+    rank = pivot.filter(user_id=OuterRef('pk')).order_by('token').values('token')[:1]
+    return queryset.filter(pk__in=list(found)[:limit]).annotate(search_rank=Subquery(rank)).order_by('search_rank', 'pk')
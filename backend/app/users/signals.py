@@ -1,9 +1,63 @@
 from django.dispatch import receiver
-from django.db.models.signals import post_save
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
 from django.conf import settings
-from .models import UserProfile
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from .auth import invalidate_login_emails
+from .models import UserProfile, normalize_email
+from .permissions import ROLE_GROUPS, invalidate_roles, sync_roles
+from .search import sync_tokens
+
+DERIVED_FIELDS = {'email', 'username', 'first_name', 'last_name'}
 
 @receiver(post_save, sender=settings.AUTH_USER_MODEL)
-def create_user_profile(sender, instance, created, **kwargs):
+def create_user_profile(sender, instance, created, update_fields=None, **kwargs):
+    email = normalize_email(instance.email)
     if created:
-        UserProfile.objects.get_or_create(user=instance)
+        invalidate_roles(instance.pk)
+        UserProfile.objects.get_or_create(user=instance, defaults={'email_normalized': email})
+        invalidate_login_emails(email)
+        sync_tokens([instance], created=True)
+        return
+    if update_fields is not None and not DERIVED_FIELDS & set(update_fields):
+        return
+    old = UserProfile.objects.filter(user=instance).values_list('email_normalized', flat=True).first()
+    if old != email:
+        UserProfile.objects.update_or_create(user=instance, defaults={'email_normalized': email})
+    invalidate_login_emails(old, email)
+    sync_tokens([instance])
+
+@receiver(m2m_changed, sender=get_user_model().groups.through)
+def reset_user_roles(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and reverse:
+        instance._cleared_user_ids = list(instance.user_set.values_list('pk', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        user_ids = pk_set if action != 'post_clear' else instance.__dict__.pop('_cleared_user_ids', [])
+    else:
+        instance.__dict__.pop('_cached_roles', None)
+        instance._state.fields_cache.pop('profile', None)
+        user_ids = [instance.pk]
+    sync_roles(user_ids)
+
+@receiver(pre_delete, sender=Group)
+def remember_group_members(sender, instance, **kwargs):
+    if instance.name in ROLE_GROUPS:
+        instance._member_ids = list(instance.user_set.values_list('pk', flat=True))
+
+@receiver(post_delete, sender=Group)
+def reset_deleted_group_roles(sender, instance, **kwargs):
+    sync_roles(getattr(instance, '_member_ids', ()))
+
+@receiver(pre_save, sender=Group)
+def remember_group_name(sender, instance, **kwargs):
+    if instance.pk:
+        instance._old_name = Group.objects.filter(pk=instance.pk).values_list('name', flat=True).first()
+
+@receiver(post_save, sender=Group)
+def reset_renamed_group_roles(sender, instance, created, **kwargs):
+    old_name = instance.__dict__.pop('_old_name', None)
+    if not created and old_name != instance.name and {old_name, instance.name} & set(ROLE_GROUPS):
+        sync_roles(instance.user_set.values_list('pk', flat=True))
@@ -0,0 +1,484 @@
+import io
+import os
+import shutil
+import tempfile
+from unittest import mock
+from asgiref.sync import iscoroutinefunction
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.contrib.auth.models import Group
+from django.core.management import call_command
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import resolve, reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+from PIL import Image
+
+from app.classes.models import Class
+from app.enrollments.models import Enrollment
+from app.users.auth import resolve_login
+from app.users.avatars import variant_name
+from app.users.models import UserProfile, UserSearchToken
+from app.users.search import search_users
+from app.users.permissions import get_roles, is_admin, is_instructor
+from app.testing import AsyncReadViewsMixin
+
+
+class RoleCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.User = get_user_model()
+        self.admin_group, _ = Group.objects.get_or_create(name='admin')
+        self.instructor_group, _ = Group.objects.get_or_create(name='instructor')
+        self.user = self.User.objects.create_user(username='instr', password='pass123')
+        self.user.groups.add(self.instructor_group)
+
+    def _fresh_user(self):
+        return self.User.objects.get(pk=self.user.pk)
+
+    def test_roles_resolved_once_per_user_object(self):
+        user = self._fresh_user()
+        with self.assertNumQueries(1):
+            self.assertTrue(is_instructor(user))
+            self.assertFalse(is_admin(user))
+            self.assertTrue(is_instructor(user))
+
+    def test_roles_shared_across_requests_until_timeout(self):
+        get_roles(self._fresh_user())
+        user = self._fresh_user()
+        with self.assertNumQueries(0):
+            self.assertEqual(get_roles(user), frozenset({'instructor'}))
+
+    def test_group_changes_invalidate_cached_roles(self):
+        get_roles(self._fresh_user())
+        self.user.groups.add(self.admin_group)
+        self.assertTrue(is_admin(self._fresh_user()))
+
+        self.admin_group.user_set.remove(self.user)
+        self.assertFalse(is_admin(self._fresh_user()))
+
+    @override_settings(ROLES_CACHE_TIMEOUT=0)
+    def test_cache_can_be_disabled(self):
+        get_roles(self._fresh_user())
+        user = self._fresh_user()
+        with self.assertNumQueries(1):
+            get_roles(user)
+
+    def _role(self, user=None):
+        return UserProfile.objects.get(user=user or self.user).role
+
+    def test_role_column_follows_group_membership(self):
+        self.assertEqual(self._role(), 'instructor')
+        self.admin_group.user_set.add(self.user)
+        self.assertEqual(self._role(), 'admin,instructor')
+        self.user.groups.remove(self.instructor_group)
+        self.assertEqual(self._role(), 'admin')
+        self.admin_group.user_set.clear()
+        self.assertEqual(self._role(), '')
+        self.user.groups.set([self.instructor_group])
+        self.instructor_group.name = 'professor'
+        self.instructor_group.save()
+        self.assertEqual(self._role(), '')
+        self.instructor_group.name = 'instructor'
+        self.instructor_group.save()
+        self.assertEqual(self._role(), 'instructor')
+        self.instructor_group.delete()
+        self.assertEqual(self._role(), '')
+
+    def test_jwt_request_reads_roles_from_loaded_profile(self):
+        token = RefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        with self.assertNumQueries(1) as ctx:
+            response = self.client.post(reverse('users-import'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertIn('users_userprofile', ctx.captured_queries[0]['sql'])
+        self.assertNotIn('auth_group', ctx.captured_queries[0]['sql'])
+
+    def test_backfill_recomputes_stale_roles(self):
+        UserProfile.objects.filter(user=self.user).update(role='')
+        out = io.StringIO()
+        call_command('backfill_profiles', stdout=out)
+        self.assertEqual(self._role(), 'instructor')
+        self.assertIn('1 papéis', out.getvalue())
+
+
+@override_settings(PASSWORD_PBKDF2_ITERATIONS=1000)
+class LoginTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(username='aluno', email='Aluno@Ex.com', password='pass123')
+
+    def _login(self, username, password='pass123'):
+        return self.client.post(reverse('login'), {'username': username, 'password': password}, format='json')
+
+    def test_login_by_username_or_case_insensitive_email(self):
+        self.assertEqual(self._login('aluno').status_code, status.HTTP_200_OK)
+        response = self._login(' aluno@ex.COM')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('access', response.data)
+        self.assertEqual(self._login('aluno@ex.com', 'errada').status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_email_resolution_is_indexed_cached_and_invalidated(self):
+        with self.assertNumQueries(1) as ctx:
+            self.assertEqual(resolve_login('aluno@ex.com'), 'aluno')
+        self.assertIn('"email_normalized" =', ctx.captured_queries[0]['sql'])
+        with self.assertNumQueries(0):
+            self.assertEqual(resolve_login('ALUNO@ex.com'), 'aluno')
+
+        self.user.email = 'novo@ex.com'
+        self.user.save()
+        self.assertEqual(resolve_login('aluno@ex.com'), 'aluno@ex.com')
+        self.assertEqual(resolve_login('novo@ex.com'), 'aluno')
+
+        get_user_model().objects.create_user(username='outro', email='NOVO@ex.com')
+        self.assertEqual(resolve_login('novo@ex.com'), 'novo@ex.com')
+
+    def test_login_upgrades_hash_to_configured_cost(self):
+        with override_settings(PASSWORD_PBKDF2_ITERATIONS=500):
+            self.user.set_password('pass123')
+            self.user.save()
+        self.assertEqual(identify_hasher(self.user.password).decode(self.user.password)['iterations'], 500)
+        self.assertEqual(self._login('aluno').status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertEqual(identify_hasher(self.user.password).decode(self.user.password)['iterations'], 1000)
+
+    def test_login_never_downgrades_hash_cost(self):
+        with override_settings(PASSWORD_PBKDF2_ITERATIONS=2000):
+            self.user.set_password('pass123')
+            self.user.save()
+        self.assertEqual(self._login('aluno').status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertEqual(identify_hasher(self.user.password).decode(self.user.password)['iterations'], 2000)
+
+    @override_settings(THROTTLE_RATES={'login': '100/min', 'login-account': '2/min'})
+    @mock.patch('app.throttling.FixedWindowThrottle.timer', return_value=1200.0)
+    def test_login_attempts_are_throttled_per_account_and_ip(self, timer):
+        self.assertEqual(self._login('aluno@ex.com', 'errada').status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self._login(' ALUNO@ex.com', 'errada').status_code, status.HTTP_401_UNAUTHORIZED)
+        with self.assertNumQueries(0):
+            response = self._login('Aluno@Ex.com')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response['Retry-After'], '60')
+        self.assertEqual(self._login('aluno').status_code, status.HTTP_200_OK)
+        self.assertEqual(self._login('outro', 'errada').status_code, status.HTTP_401_UNAUTHORIZED)
+        other_ip = self.client.post(reverse('login'), {'username': 'aluno', 'password': 'pass123'},
+                                    format='json', REMOTE_ADDR='10.0.0.2')
+        self.assertEqual(other_ip.status_code, status.HTTP_200_OK)
+        timer.return_value = 1260.0
+        self.assertEqual(self._login('aluno@ex.com').status_code, status.HTTP_200_OK)
+
+    def test_login_rejects_non_object_body(self):
+        response = self.client.post(reverse('login'), ['aluno'], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(THROTTLE_RATES={'login': '1/min:2'}, THROTTLE_CACHE_ALIAS='indisponivel')
+    @mock.patch('app.throttling.FixedWindowThrottle.timer', return_value=1200.0)
+    def test_login_ip_throttle_falls_back_to_local_memory(self, timer):
+        self.assertEqual(self._login('aluno').status_code, status.HTTP_200_OK)
+        self.assertEqual(self._login('aluno').status_code, status.HTTP_200_OK)
+        response = self._login('aluno')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response['Retry-After'], '120')
+
+    def test_backfill_profiles(self):
+        UserProfile.objects.filter(user=self.user).update(email_normalized='')
+        get_user_model().objects.bulk_create([get_user_model()(username='semperfil', email='SP@ex.com')])
+        call_command('backfill_profiles', batch_size=1, stdout=io.StringIO())
+        self.assertEqual(
+            dict(UserProfile.objects.values_list('user__username', 'email_normalized')),
+            {'aluno': 'aluno@ex.com', 'semperfil': 'sp@ex.com'},
+        )
+
+
+class UserSearchTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.joao = User.objects.create_user(username='joao.silva', first_name='João', last_name='Silva', email='js@ex.com')
+        self.joana = User.objects.create_user(username='joana', first_name='Joana', last_name='Souza')
+        self.jo = User.objects.create_user(username='jo', first_name='Jo', last_name='Ramos')
+        self.inativo = User.objects.create_user(username='joel', is_active=False)
+        self.instrutor = User.objects.create_user(username='josue', first_name='Josué')
+        self.instrutor.groups.add(Group.objects.create(name='instructor'))
+        self.client.force_authenticate(self.instrutor)
+
+    def _names(self, route, q):
+        response = self.client.get(reverse(route), {'q': q})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [u['username'] for u in response.data['results']]
+
+    def test_prefix_accent_and_case_insensitive_ranked(self):
+        self.assertEqual(self._names('users-list', 'JO'), ['jo', 'joana', 'joao.silva'])
+        self.assertEqual(self._names('users-list', 'joão'), ['joao.silva'])
+        self.assertEqual(self._names('users-list', 'silva jo'), ['joao.silva'])
+        self.assertEqual(self._names('users-list', 'joaosil'), ['joao.silva'])
+        self.assertEqual(self._names('users-list', 'js'), ['joao.silva'])
+        self.assertEqual(self._names('users-list', 'ex'), [])
+        self.assertEqual(self._names('instructors-list', 'jos'), ['josue'])
+        self.assertEqual(self._names('users-search', 'jo'), ['jo', 'joana', 'joao.silva', 'joel', 'josue'])
+
+    def test_full_email_is_resolved_through_the_normalized_column(self):
+        self.assertEqual(self._names('users-list', ' JS@ex.com'), ['joao.silva'])
+        self.assertEqual(self._names('users-list', 'js@'), ['joao.silva'])
+        self.assertEqual(self._names('users-list', 'js@outro.com'), [])
+        with self.assertNumQueries(1) as ctx:
+            list(search_users(get_user_model().objects.all(), 'js@ex.com'))
+        self.assertIn('"email_normalized" =', ctx.captured_queries[0]['sql'])
+
+    def test_tokens_follow_profile_changes_and_results_are_capped(self):
+        self.joana.last_name = 'Pereira'
+        self.joana.save()
+        self.assertEqual(self._names('users-list', 'souza'), [])
+        self.assertEqual(self._names('users-list', 'pere'), ['joana'])
+        self.assertEqual(set(UserSearchToken.objects.filter(user=self.joana).values_list('token', flat=True)),
+                         {'joana', 'pereira'})
+        qs = get_user_model().objects.all()
+        self.assertEqual([u.username for u in search_users(qs, 'jo', limit=2)], ['jo', 'joana'])
+
+    def test_search_queries_do_not_scan_names(self):
+        with self.assertNumQueries(4) as ctx:  # papéis do instrutor + busca
+            self._names('users-list', 'jo')
+        self.assertNotIn('LIKE', ' '.join(q['sql'] for q in ctx.captured_queries))
+
+
+class MeViewTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(username='aluno', password='pass123')
+        self.client.force_authenticate(self.user)
+
+    def test_me_answers_304_until_profile_changes(self):
+        first = self.client.get(reverse('me'))
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        again = self.client.get(reverse('me'), HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(again.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.client.patch(reverse('me'), {'first_name': 'Maria'}, format='json')
+        changed = self.client.get(reverse('me'), HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(changed.status_code, status.HTTP_200_OK)
+        self.assertEqual(changed.data['first_name'], 'Maria')
+
+    def test_me_etag_changes_with_any_group(self):
+        first = self.client.get(reverse('me'))
+        self.user.groups.add(Group.objects.create(name='monitores'))
+        changed = self.client.get(reverse('me'), HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(changed.status_code, status.HTTP_200_OK)
+        self.assertEqual(changed.data['groups'], ['monitores'])
+
+
+class AsyncMeViewTests(AsyncReadViewsMixin, MeViewTests):
+    """Os mesmos cenários com as leituras pelas views assíncronas."""
+
+
+class AvatarUploadTests(APITestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        self.settings_override = override_settings(MEDIA_ROOT=media)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        self.media = media
+        self.user = get_user_model().objects.create_user(username='aluno', password='pass123')
+        self.client.force_authenticate(self.user)
+
+    def _image(self, size=(1200, 800), fmt='JPEG', name='foto.jpg'):
+        buf = io.BytesIO()
+        Image.new('RGB', size, (200, 30, 30)).save(buf, fmt)
+        return SimpleUploadedFile(name, buf.getvalue(), content_type='image/jpeg')
+
+    def _upload(self, upload, run_tasks=True):
+        with self.captureOnCommitCallbacks(execute=run_tasks):
+            return self.client.post(reverse('me-avatar'), {'avatar': upload}, format='multipart')
+
+    def _files(self):
+        return sorted(os.path.relpath(os.path.join(root, f), self.media) for root, _, files in os.walk(self.media) for f in files)
+
+    def test_upload_is_downscaled_into_cached_variants(self):
+        response = self._upload(self._image())
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertTrue(response.data['pending'])
+        digest = UserProfile.objects.get(user=self.user).avatar_hash
+        self.assertEqual(self._files(), [variant_name(digest, size) for size in (128, 256, 64)])
+        with default_storage.open(variant_name(digest, 64)) as fh, Image.open(fh) as img:
+            self.assertEqual((img.format, img.size), ('WEBP', (64, 64)))
+
+        served = self.client.get(response.data['avatar_url'])
+        self.assertEqual(served.status_code, status.HTTP_200_OK)
+        self.assertEqual(served['Content-Type'], 'image/webp')
+        self.assertIn('immutable', served['Cache-Control'])
+        me = self.client.get(reverse('me')).data
+        self.assertEqual(me['avatar_url'], response.data['avatar_url'])
+        self.assertEqual(sorted(me['avatar_urls']), ['128', '256', '64'])
+
+    def test_duplicate_upload_reuses_variants(self):
+        self._upload(self._image())
+        files = self._files()
+        other = get_user_model().objects.create_user(username='outro')
+        self.client.force_authenticate(other)
+        response = self._upload(self._image())
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.data['pending'])
+        self.assertEqual(self._files(), files)
+
+    def test_pending_avatar_serves_original_without_cache(self):
+        response = self._upload(self._image(), run_tasks=False)
+        served = self.client.get(response.data['avatar_url'])
+        self.assertEqual(served.status_code, status.HTTP_200_OK)
+        self.assertEqual(served['Cache-Control'], 'no-cache')
+        self.assertEqual(self.client.get(response.data['avatar_url'].replace('/128.', '/99.')).status_code, 404)
+
+    def test_invalid_images_are_rejected(self):
+        response = self._upload(SimpleUploadedFile('a.png', b'nao e imagem', content_type='image/png'))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        with override_settings(AVATAR_MAX_PIXELS=1000):
+            self.assertEqual(self._upload(self._image()).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self._files(), [])
+
+    def test_corrupt_image_is_discarded_by_the_task(self):
+        data = self._image(fmt='PNG').read()
+        response = self._upload(SimpleUploadedFile('a.png', data[:len(data) // 2], content_type='image/png'))
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(UserProfile.objects.get(user=self.user).avatar_hash, '')
+        self.assertEqual(self._files(), [])
+
+
+class AsyncReadPathTests(AsyncReadViewsMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(username='aluno', first_name='Ana')
+        self.class_obj = Class.objects.create(title='Aula', description='', start_datetime=timezone.now())
+        self.enrollment = Enrollment.objects.create(class_ref=self.class_obj, student=self.user)
+        self.auth = {'Authorization': f'Bearer {RefreshToken.for_user(self.user).access_token}'}
+
+    def test_hot_read_routes_resolve_to_async_views(self):
+        for name, args in (('classes-list', []), ('classes-detail', [1]), ('enrollments-list', []),
+                           ('enrollments-detail', [1]), ('me', [])):
+            self.assertTrue(iscoroutinefunction(resolve(reverse(name, args=args)).func), name)
+
+    async def test_reads_over_asgi_with_jwt(self):
+        me = await self.async_client.get(reverse('me'), headers=self.auth)
+        self.assertEqual(me.status_code, status.HTTP_200_OK)
+        self.assertEqual(me.data['first_name'], 'Ana')
+        self.assertEqual(me.data['groups'], [])
+
+        classes = await self.async_client.get(reverse('classes-list'), headers=self.auth)
+        self.assertEqual(classes.data['count'], 1)
+        self.assertTrue(classes.data['results'][0]['enrolled'])
+
+        detail = await self.async_client.get(reverse('enrollments-detail', args=[self.enrollment.id]), headers=self.auth)
+        self.assertEqual(detail.data['class_title'], 'Aula')
+
+        missing = await self.async_client.get(reverse('classes-detail', args=[self.class_obj.id + 1]), headers=self.auth)
+        self.assertEqual(missing.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_invalid_token_is_rejected_over_asgi(self):
+        response = await self.async_client.get(reverse('enrollments-list'), headers={'Authorization': 'Bearer invalido'})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIn('WWW-Authenticate', response)
+
+
+class StudentImportTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.admin = User.objects.create_user(username='admin', password='pass123', is_superuser=True)
+        self.instructor = User.objects.create_user(username='instrutor', email='inst@ex.com')
+        self.instructor.groups.add(Group.objects.create(name='instructor'))
+        self.existing = User.objects.create_user(username='antigo')
+        self.full = Class.objects.create(title='Cheia', description='', start_datetime=timezone.now(), capacity=1)
+        self.open = Class.objects.create(title='Livre', description='', start_datetime=timezone.now())
+        self.client.force_authenticate(self.admin)
+
+    def _upload(self, rows, **data):
+        content = 'username,email,first_name,classes\n' + ''.join(f'{row}\n' for row in rows)
+        upload = SimpleUploadedFile('alunos.csv', content.encode('utf-8-sig'), content_type='text/csv')
+        return self.client.post(reverse('users-import'), {'file': upload, **data}, format='multipart')
+
+    def _rows(self):
+        return [
+            f'ana,ana@ex.com,Ana,{self.open.id};{self.full.id}',
+            f'bia,bia@ex.com,Bia,{self.full.id}',
+            f'antigo,,,{self.open.id}',
+            'ana,outra@ex.com,,',
+            'carla,INST@ex.com,,',
+            f'instrutor,,,{self.open.id}',
+            'davi,,,x',
+            'nome inválido!,,,',
+        ]
+
+    def test_import_creates_students_profiles_and_enrollments(self):
+        response = self._upload(self._rows())
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            {k: response.data[k] for k in ('rows', 'created_users', 'existing_users', 'created_enrollments')},
+            {'rows': 8, 'created_users': 2, 'existing_users': 1, 'created_enrollments': 3},
+        )
+        self.assertEqual({e['line']: e['username'] for e in response.data['errors']}, {
+            3: 'bia', 5: 'ana', 6: 'carla', 7: 'instrutor', 8: 'davi', 9: 'nome inválido!',
+        })
+        ana = get_user_model().objects.get(username='ana')
+        self.assertEqual((ana.email, ana.first_name, ana.has_usable_password()), ('ana@ex.com', 'Ana', False))
+        self.assertTrue(UserProfile.objects.filter(user=ana).exists())
+        self.assertFalse(get_user_model().objects.filter(username__in=['carla', 'davi']).exists())
+        self.assertIn('lotada', response.data['errors'][0]['errors'][0])
+        self.assertEqual(set(Enrollment.objects.values_list('student__username', 'class_ref_id')),
+                         {('ana', self.open.id), ('ana', self.full.id), ('antigo', self.open.id)})
+        self.full.refresh_from_db()
+        self.assertEqual(self.full.participants_count, 1)
+
+    def test_dry_run_reports_without_writing(self):
+        users = get_user_model().objects.count()
+        with (
+            mock.patch('app.enrollments.models.bump_version') as bump,
+            mock.patch.object(Enrollment.objects, 'bulk_create') as bulk_create,
+        ):
+            response = self._upload(self._rows(), dry_run=True)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['dry_run'])
+        self.assertEqual((response.data['created_users'], response.data['created_enrollments']), (2, 3))
+        self.assertEqual(len(response.data['errors']), 6)
+        self.assertIn('lotada', response.data['errors'][0]['errors'][0])
+        bump.assert_not_called()
+        bulk_create.assert_not_called()
+        self.assertEqual(get_user_model().objects.count(), users)
+        self.assertFalse(Enrollment.objects.exists())
+        self.assertFalse(UserProfile.objects.filter(user__username='ana').exists())
+
+    def _upload_with_passwords(self, count, **data):
+        content = 'username,password\n' + ''.join(f'aluno{i},Senha-forte-{i}\n' for i in range(count))
+        upload = SimpleUploadedFile('alunos.csv', content.encode(), content_type='text/csv')
+        return self.client.post(reverse('users-import'), {'file': upload, **data}, format='multipart')
+
+    def test_dry_run_does_not_hash_passwords(self):
+        with mock.patch('app.users.imports.make_password', wraps=make_password) as hasher:
+            response = self._upload_with_passwords(3, dry_run=True)
+        self.assertEqual(response.data['created_users'], 3)
+        self.assertEqual({c.args for c in hasher.call_args_list}, {(None,)})
+
+    @override_settings(USER_IMPORT_MAX_PASSWORDS=2)
+    def test_passwords_per_api_import_are_capped(self):
+        response = self._upload_with_passwords(3)
+        self.assertEqual(response.data['created_users'], 2)
+        self.assertEqual([e['username'] for e in response.data['errors']], ['aluno2'])
+        self.assertIn('Limite de 2 senhas', response.data['errors'][0]['errors'][0])
+        self.assertTrue(get_user_model().objects.get(username='aluno0').check_password('Senha-forte-0'))
+
+    def test_batches_use_constant_queries(self):
+        rows = [f'aluno{i},aluno{i}@ex.com,,{self.open.id}' for i in range(40)]
+        with self.assertNumQueries(15):
+            response = self._upload(rows)
+        self.assertEqual(response.data['created_enrollments'], 40)
+
+    def test_rejects_bad_header_and_non_admins(self):
+        upload = SimpleUploadedFile('x.csv', b'nome,email\nana,a@ex.com\n', content_type='text/csv')
+        response = self.client.post(reverse('users-import'), {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('username', response.data['detail'])
+
+        self.client.force_authenticate(self.instructor)
+        self.assertEqual(self._upload(['ana,,,']).status_code, status.HTTP_403_FORBIDDEN)
@@ -1,16 +1,23 @@
-from django.contrib.auth import authenticate, get_user_model
+from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
-from django.db.models import Q
+from django.conf import settings
 from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.http import FileResponse, Http404
 from rest_framework import status, serializers, generics, permissions
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken
-from app.users.permissions import is_admin, is_instructor
+from app.asyncviews import AsyncReadMixin
+from app.conditional import aconditional_response, conditional_response, make_etag
+from app.users.permissions import IsAdmin, is_admin, is_instructor, role_values
+from app.tasks import enqueue
+from .avatars import AvatarError, avatar_url, process_avatar, stage_avatar, staged_original, variant_name
+from .imports import CSVImportError, StudentImport
 from .models import UserProfile
-from django.core.files.storage import default_storage
-import os
+from .search import search_users
+import io
 import logging
 
 from drf_spectacular.utils import (
@@ -22,32 +29,29 @@ logger = logging.getLogger(__name__)
 User = get_user_model()
 
                                          
-class LoginSerializer(serializers.Serializer):
-    username = serializers.CharField()
-    password = serializers.CharField()
-
-class TokenPairSerializer(serializers.Serializer):
-    access = serializers.CharField()
-    refresh = serializers.CharField()
-
 class MeSerializer(serializers.ModelSerializer):
     groups = serializers.SerializerMethodField()
     avatar_url = serializers.SerializerMethodField()
+    avatar_urls = serializers.SerializerMethodField()
 
     class Meta:
         model = User
-        fields = ['id', 'username', 'email', 'first_name', 'last_name', 'is_superuser', 'groups', 'avatar_url']
+        fields = ['id', 'username', 'email', 'first_name', 'last_name', 'is_superuser', 'groups', 'avatar_url', 'avatar_urls']
 
     def get_groups(self, obj):
+        groups = self.context.get('groups')
+        if groups is not None:
+            return groups
         return list(obj.groups.values_list('name', flat=True))
 
     def get_avatar_url(self, obj):
+        return avatar_url(getattr(obj, 'profile', None), self.context.get('request'))
+
+    def get_avatar_urls(self, obj):
         prof = getattr(obj, 'profile', None)
-        if prof and prof.avatar:
-            request = self.context.get('request')
-            url = prof.avatar.url
-            return request.build_absolute_uri(url) if request else url
-        return None
+        if not (prof and prof.avatar_hash):
+            return {}
+        return {str(size): avatar_url(prof, self.context.get('request'), size) for size in sorted(settings.AVATAR_SIZES)}
 
 class MeUpdateSerializer(serializers.ModelSerializer):
     class Meta:
@@ -72,36 +76,30 @@ class ChangePasswordSerializer(serializers.Serializer):
         validate_password(value)
         return value
 
+class StudentImportSerializer(serializers.Serializer):
+    file = serializers.FileField(help_text='CSV UTF-8 com as colunas username, email, first_name, last_name, password e classes (IDs separados por ";").')
+    dry_run = serializers.BooleanField(required=False, default=False, help_text='Apenas valida, sem gravar.')
+
+class StudentImportErrorSerializer(serializers.Serializer):
+    line = serializers.IntegerField()
+    username = serializers.CharField()
+    errors = serializers.ListField(child=serializers.CharField())
+
+class StudentImportReportSerializer(serializers.Serializer):
+    dry_run = serializers.BooleanField()
+    rows = serializers.IntegerField()
+    created_users = serializers.IntegerField()
+    existing_users = serializers.IntegerField()
+    created_enrollments = serializers.IntegerField()
+    errors = StudentImportErrorSerializer(many=True)
+
 class AvatarUploadSerializer(serializers.Serializer):
     avatar = serializers.ImageField(required=False, help_text='Arquivo de imagem (campo aceito: "avatar" ou "file").')
 
                
 
-@extend_schema(
-    summary='Login (JWT)',
-    description='Autentica com `username` e `password` e retorna um par de tokens **access**/**refresh**.',
-    tags=['auth'],
-    request=LoginSerializer,
-    responses={200: TokenPairSerializer, 400: dict, 500: dict}
-)
-class LoginView(APIView):
-    authentication_classes = []
-    permission_classes = []
-
-    def post(self, request):
-        try:
-            username = str(request.data.get('username') or '').strip()
-            password = str(request.data.get('password') or '').strip()
-            if not username or not password:
-                return Response({'detail': 'Usuário ou senha inválidos.'}, status=status.HTTP_400_BAD_REQUEST)
-            user = authenticate(request, username=username, password=password)
-            if not user:
-                return Response({'detail': 'Usuário ou senha inválidos.'}, status=status.HTTP_400_BAD_REQUEST)
-            refresh = RefreshToken.for_user(user)
-            return Response({'access': str(refresh.access_token), 'refresh': str(refresh)}, status=status.HTTP_200_OK)
-        except Exception:
-            logger.exception("Erro no login")
-            return Response({'detail': 'Erro interno no login.'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+def _avatar_key(profile):
+    return profile and (profile.avatar_hash or profile.avatar.name)
 
 @extend_schema(
     tags=['users'],
@@ -109,11 +107,49 @@ class LoginView(APIView):
     description='Retorna os dados do usuário autenticado.',
     responses={200: MeSerializer}
 )
-class MeView(APIView):
+class MeView(AsyncReadMixin, APIView):
     permission_classes = [permissions.IsAuthenticated]
+    async_handlers = {'get': 'aget'}
+
+    def _etag(self, request, groups, avatar):
+        u = request.user
+        return make_etag(
+            'me', u.pk, u.username, u.email, u.first_name, u.last_name, u.is_superuser,
+            sorted(groups), avatar or '', request.get_host(),
+        )
+
+    def _payload(self, request, groups):
+        # Corpo de `get` e `aget`: os grupos do ETag são os mesmos do corpo (`get_groups`).
+        return Response(MeSerializer(request.user, context={'request': request, 'groups': groups}).data)
 
     def get(self, request):
-        return Response(MeSerializer(request.user, context={'request': request}).data)
+        u = request.user
+        profile = getattr(u, 'profile', None)
+        groups = list(u.groups.values_list('name', flat=True))
+        return conditional_response(
+            request,
+            lambda: self._payload(request, groups),
+            self._etag(request, groups, _avatar_key(profile)),
+        )
+
+    async def aget(self, request):
+        u = request.user
+        if User.profile.related.is_cached(u):
+            profile = User.profile.related.get_cached_value(u)
+        else:
+            profile = await UserProfile.objects.filter(user=u).afirst()
+            User.profile.related.set_cached_value(u, profile)
+
+        groups = [name async for name in u.groups.values_list('name', flat=True)]
+
+        async def build():
+            return self._payload(request, groups)
+
+        return await aconditional_response(
+            request,
+            build,
+            self._etag(request, groups, _avatar_key(profile)),
+        )
 
     @extend_schema(
         tags=['users'],
@@ -144,7 +180,10 @@ class MeView(APIView):
 @extend_schema(
     tags=['users'],
     summary='Buscar usuários (mini)',
-    description='Busca usuários por texto (`q`) em username, email, first_name e last_name. Requer autenticação.',
+    description=(
+        'Busca usuários por prefixo de palavra (`q`, sem diferenciar acentos e maiúsculas) em username, '
+        'nome, sobrenome e e-mail, ordenados por relevância e limitados a `USER_SEARCH_LIMIT`. Requer autenticação.'
+    ),
     parameters=[
         OpenApiParameter(name='q', description='Texto de busca', required=False, type=str),
     ],
@@ -155,21 +194,14 @@ class UsersSearchView(generics.ListAPIView):
     serializer_class = UserMiniSerializer
 
     def get_queryset(self):
-        q = self.request.query_params.get('q', '')
-        qs = User.objects.all().order_by('username')
-        if q:
-            qs = qs.filter(
-                Q(username__icontains=q) |
-                Q(email__icontains=q) |
-                Q(first_name__icontains=q) |
-                Q(last_name__icontains=q)
-            )
-        return qs
+        q = self.request.query_params.get('q', '').strip()
+        qs = User.objects.all()
+        return search_users(qs, q) if q else qs.order_by('username')
 
 @extend_schema(
     tags=['users'],
     summary='Listar alunos (mini)',
-    description='Lista alunos ativos (não admin/instrutor). Requer permissão de admin ou instrutor.',
+    description='Lista alunos ativos (não admin/instrutor); com `q`, busca indexada por prefixo como em `/api/auth/users/`. Requer permissão de admin ou instrutor.',
     parameters=[
         OpenApiParameter(name='q', description='Filtro por nome/username', required=False, type=str),
     ],
@@ -183,22 +215,42 @@ class StudentListView(generics.ListAPIView):
         u = self.request.user
         if not (is_admin(u) or is_instructor(u)):
             return User.objects.none()
-        qs = (User.objects
-              .filter(is_active=True, is_superuser=False)
-              .exclude(groups__name__in=['admin', 'instructor']))
+        qs = User.objects.filter(is_active=True, is_superuser=False, profile__role='')
         q = self.request.query_params.get('q', '').strip()
-        if q:
-            qs = qs.filter(
-                Q(username__icontains=q) |
-                Q(first_name__icontains=q) |
-                Q(last_name__icontains=q)
-            )
-        return qs.order_by('username')
+        return search_users(qs, q) if q else qs.order_by('username')
+
+@extend_schema(
+    tags=['users'],
+    summary='Importar alunos (CSV)',
+    description=(
+        'Cria alunos e suas inscrições a partir de um CSV enviado em multipart/form-data. '
+        'Usuários já existentes (alunos) são apenas inscritos. Linhas inválidas são '
+        'ignoradas e listadas em `errors`; com `dry_run` nada é gravado. No máximo '
+        '`USER_IMPORT_MAX_PASSWORDS` linhas com senha por arquivo (o comando `import_students` '
+        'não tem limite). Apenas admin.'
+    ),
+    request={'multipart/form-data': StudentImportSerializer},
+    responses={200: StudentImportReportSerializer, 400: dict}
+)
+class StudentImportView(APIView):
+    permission_classes = [IsAdmin]
+    parser_classes = [MultiPartParser, FormParser]
+
+    def post(self, request):
+        s = StudentImportSerializer(data=request.data)
+        s.is_valid(raise_exception=True)
+        upload = s.validated_data['file']
+        importer = StudentImport(dry_run=s.validated_data['dry_run'], max_passwords=settings.USER_IMPORT_MAX_PASSWORDS)
+        try:
+            report = importer.run(io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline=''))
+        except CSVImportError as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(report, status=status.HTTP_200_OK)
 
 @extend_schema(
     tags=['users'],
     summary='Listar instrutores (mini)',
-    description='Lista usuários do grupo **instructor**. Requer permissão de admin ou instrutor.',
+    description='Lista usuários do grupo **instructor**; com `q`, busca indexada por prefixo como em `/api/auth/users/`. Requer permissão de admin ou instrutor.',
     parameters=[
         OpenApiParameter(name='q', description='Filtro por nome/username/email', required=False, type=str),
     ],
@@ -213,15 +265,8 @@ class InstructorListView(generics.ListAPIView):
         if not (is_admin(u) or is_instructor(u)):
             return User.objects.none()
         q = self.request.query_params.get('q', '').strip()
-        qs = User.objects.filter(is_active=True, groups__name='instructor').order_by('username')
-        if q:
-            qs = qs.filter(
-                Q(username__icontains=q) |
-                Q(first_name__icontains=q) |
-                Q(last_name__icontains=q) |
-                Q(email__icontains=q)
-            )
-        return qs
+        qs = User.objects.filter(is_active=True, profile__role__in=role_values('instructor'))
+        return search_users(qs, q) if q else qs.order_by('username')
 
 @extend_schema(
     tags=['users'],
@@ -248,15 +293,21 @@ class ChangePasswordView(APIView):
             return Response({'detail': ' '.join(e.messages)}, status=status.HTTP_400_BAD_REQUEST)
 
         request.user.set_password(new_pw)
-        request.user.save()
+        request.user.save(update_fields=['password'])
         return Response({'detail': 'Senha alterada com sucesso.'}, status=status.HTTP_200_OK)
 
 @extend_schema(
     tags=['users'],
     summary='Upload de avatar',
-    description='Envia uma imagem de avatar para o usuário autenticado. Aceita o campo **avatar** (preferencial) ou **file** em multipart/form-data.',
+    description=(
+        'Envia uma imagem de avatar (JPEG, PNG, WebP ou GIF) para o usuário autenticado. Aceita o campo '
+        '**avatar** (preferencial) ou **file** em multipart/form-data. A imagem é guardada pelo hash do '
+        'conteúdo e reduzida em segundo plano para os tamanhos de `AVATAR_SIZES`: responde 202 com '
+        '`pending` enquanto as miniaturas são geradas (a URL já serve o original) e 200 se a mesma '
+        'imagem já tinha sido processada.'
+    ),
     request=AvatarUploadSerializer,
-    responses={200: dict, 400: dict}
+    responses={200: dict, 202: dict, 400: dict}
 )
 
 class AvatarUploadView(APIView):
@@ -267,41 +318,43 @@ class AvatarUploadView(APIView):
         f = request.FILES.get('file') or request.FILES.get('avatar')
         if not f:
             return Response({'detail': 'Arquivo não enviado.'}, status=status.HTTP_400_BAD_REQUEST)
-
-        prof, _ = UserProfile.objects.get_or_create(user=request.user)
-
-        old_path = prof.avatar.path if prof.avatar and hasattr(prof.avatar, 'path') else None
-        prof.avatar = f
-        prof.save()
-
-        stored_name = getattr(prof.avatar, 'name', None)
-        stored_path = getattr(prof.avatar, 'path', None)
-
-        if not stored_name or not default_storage.exists(stored_name):
-            logger.error("Avatar não encontrado no storage após salvar.",
-                         extra={'stored_name': stored_name, 'stored_path': stored_path, 'media_root': str(settings.MEDIA_ROOT)})
-            return Response(
-                {'detail': 'Falha ao salvar o avatar.', 'path': stored_path, 'media_root': str(settings.MEDIA_ROOT)},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
-
-        legacy_rel = f"avatars/{request.user.id}.png"
         try:
-            prof.avatar.open('rb')
-            data = prof.avatar.read()
-            prof.avatar.close()
-
-            if default_storage.exists(legacy_rel):
-                default_storage.delete(legacy_rel)
-            default_storage.save(legacy_rel, ContentFile(data))
-        except Exception as e:
-            logger.warning("Não foi possível gerar a cópia legada do avatar.", exc_info=e, extra={'legacy_rel': legacy_rel})
-
-        if old_path and os.path.exists(old_path) and old_path != stored_path:
-            try:
-                default_storage.delete(old_path)
-            except Exception:
-                pass
-
-        url = request.build_absolute_uri(prof.avatar.url)
-        return Response({'avatar_url': url}, status=status.HTTP_200_OK)
+            digest, pending = stage_avatar(f)
+        except AvatarError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        prof = getattr(request.user, 'profile', None) or UserProfile.objects.get_or_create(user=request.user)[0]
+        legacy = prof.avatar.name if prof.avatar else None
+        prof.avatar = None
+        prof.avatar_hash = digest
+        prof.save(update_fields=['avatar', 'avatar_hash'])
+        if pending:
+            enqueue(process_avatar, digest)
+        if legacy:
+            transaction.on_commit(lambda: default_storage.delete(legacy))
+
+        return Response(
+            {'avatar_url': avatar_url(prof, request), 'pending': pending},
+            status=status.HTTP_202_ACCEPTED if pending else status.HTTP_200_OK,
+        )
+
+
+def avatar_file(request, digest, size):
+    """
+    Serve a miniatura `size` do avatar `digest`. O nome muda com o conteúdo, então a
+    resposta pode ficar em cache indefinidamente; enquanto o processamento não termina
+    serve o original, sem cache.
+    """
+    if int(size) not in settings.AVATAR_SIZES:
+        raise Http404
+    name = variant_name(digest, size)
+    if default_storage.exists(name):
+        response = FileResponse(default_storage.open(name, 'rb'), content_type='image/webp')
+        response['Cache-Control'] = f'public, max-age={settings.AVATAR_CACHE_MAX_AGE}, immutable'
+        return response
+    name = staged_original(digest)
+    if name is None:
+        raise Http404
+    response = FileResponse(default_storage.open(name, 'rb'))
+    response['Cache-Control'] = 'no-cache'
+    return response
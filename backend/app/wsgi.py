@@ -1,4 +1,6 @@
 import os
 from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+os.environ.setdefault('ASYNC_READ_VIEWS', '0')
+os.environ.setdefault('DB_CONNECTION_MODE', 'persistent')
 application = get_wsgi_application()
@@ -0,0 +1,180 @@
+"""
+Teste de carga das leituras quentes: implantação WSGI x ASGI no mesmo hardware.
+
+Sobe o mesmo projeto duas vezes sobre a mesma base SQLite gerada por
+`generate_load_data`: `gunicorn` com workers síncronos (`app/wsgi.py`, views
+síncronas) e `gunicorn -k uvicorn.workers.UvicornWorker` (`app/asgi.py`, views de
+leitura assíncronas), com a mesma quantidade de workers. Dispara requisições
+concorrentes autenticadas por JWT contra a lista/detalhe de aulas, as inscrições do
+aluno e `/api/auth/me/`, e compara vazão e latência. `--db-latency-ms` acrescenta
+um atraso por consulta para simular a rede até o SQL Server.
+
+Uso:
+    python -m benchmarks.asgi_vs_wsgi --concurrency 64 --requests 4000 --db-latency-ms 5
+"""
+import argparse
+import http.client
+import os
+import random
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import BACKEND_DIR, default_db, seed, setup_django
+
+DATASET = {'students': 2000, 'classes': 500, 'enrollments': 20000}
+SERVERS = {
+    'wsgi': ['gunicorn', 'benchmarks.serve:application'],
+    'asgi': ['gunicorn', 'benchmarks.serve:application', '-k', 'uvicorn.workers.UvicornWorker'],
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--servers', nargs='+', choices=list(SERVERS), default=list(SERVERS))
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--wsgi-threads', type=int, default=1,
+                        help='Threads por worker WSGI (1 = worker síncrono padrão do gunicorn).')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--db-latency-ms', type=float, default=0)
+    parser.add_argument('--users', type=int, default=50, help='Alunos distintos (tokens) usados na carga.')
+    parser.add_argument('--db', help='Arquivo SQLite (padrão: /tmp, por volume).')
+    return parser.parse_args()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def build_targets(users, rng):
+    from django.contrib.auth import get_user_model
+    from rest_framework_simplejwt.tokens import RefreshToken
+    from app.classes.models import Class
+    from app.enrollments.models import Enrollment
+
+    students = get_user_model().objects.filter(username__startswith='bench_aluno').order_by('pk')[:users]
+    class_ids = list(Class.objects.order_by('pk').values_list('pk', flat=True)[:100])
+    targets = []
+    for student in students:
+        auth = {'Authorization': f'Bearer {RefreshToken.for_user(student).access_token}'}
+        enrollment = Enrollment.objects.filter(student=student).values_list('pk', flat=True).first()
+        paths = ['/api/classes/', f'/api/classes/{rng.choice(class_ids)}/', '/api/enrollments/', '/api/auth/me/']
+        if enrollment:
+            paths.append(f'/api/enrollments/{enrollment}/')
+        targets.extend((path, auth) for path in paths)
+    return targets
+
+
+def start_server(kind, port, args, db):
+    env = dict(
+        os.environ,
+        DB_ENGINE='sqlite',
+        DB_NAME=db,
+        DEBUG='0',
+        BENCH_SERVER=kind,
+        BENCH_DB_LATENCY_MS=str(args.db_latency_ms),
+        ASYNC_READ_VIEWS='1' if kind == 'asgi' else '0',
+    )
+    cmd = SERVERS[kind] + ['--bind', f'127.0.0.1:{port}', '--workers', str(args.workers), '--log-level', 'warning']
+    if kind == 'wsgi' and args.wsgi_threads > 1:
+        cmd += ['--threads', str(args.wsgi_threads)]
+    return subprocess.Popen(cmd, cwd=BACKEND_DIR, env=env, start_new_session=True)
+
+
+def wait_ready(port, target, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'servidor encerrou com código {process.returncode}')
+        try:
+            status, _ = request(port, *target)
+            if status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.25)
+    raise RuntimeError('servidor não respondeu a tempo')
+
+
+def request(port, path, headers, conn=None):
+    conn = conn or http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    conn.request('GET', path, headers=headers)
+    response = conn.getresponse()
+    response.read()
+    return response.status, conn
+
+
+def run_load(port, targets, total, concurrency, rng):
+    local = threading.local()
+    plan = [rng.choice(targets) for _ in range(total)]
+
+    def call(target):
+        start = time.perf_counter()
+        try:
+            status, local.conn = request(port, *target, conn=getattr(local, 'conn', None))
+        except (OSError, http.client.HTTPException):
+            local.conn = None
+            status = 0
+        return status, (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(call, plan))
+    elapsed = time.perf_counter() - start
+    timings = sorted(ms for _, ms in results)
+    return {
+        'rps': round(len(results) / elapsed, 1),
+        'errors': sum(1 for status, _ in results if status != 200),
+        'p50_ms': round(statistics.median(timings), 1),
+        'p95_ms': round(statistics.quantiles(timings, n=20)[-1], 1),
+        'p99_ms': round(statistics.quantiles(timings, n=100)[-1], 1),
+    }
+
+
+def stop(process):
+    if process.poll() is None:
+        os.killpg(process.pid, signal.SIGTERM)
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            os.killpg(process.pid, signal.SIGKILL)
+
+
+def main():
+    args = parse_args()
+    db = args.db or default_db(DATASET['students'], DATASET['classes'], DATASET['enrollments'])
+    setup_django(db)
+    seed(**DATASET)
+    rng = random.Random(42)
+    targets = build_targets(args.users, rng)
+
+    print(f'{args.requests} requisições, concorrência {args.concurrency}, {args.workers} workers, '
+          f'latência simulada {args.db_latency_ms} ms/consulta')
+    print(f"{'servidor':<8} {'req/s':>8} {'erros':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    results = {}
+    for kind in args.servers:
+        port = free_port()
+        process = start_server(kind, port, args, db)
+        try:
+            wait_ready(port, targets[0], process)
+            run_load(port, targets, min(200, args.requests), args.concurrency, rng)
+            results[kind] = result = run_load(port, targets, args.requests, args.concurrency, rng)
+        finally:
+            stop(process)
+        print(f"{kind:<8} {result['rps']:>8} {result['errors']:>6} {result['p50_ms']:>8} "
+              f"{result['p95_ms']:>8} {result['p99_ms']:>8}")
+    if len(results) == 2 and results['wsgi']['rps']:
+        print(f"\nASGI/WSGI: {results['asgi']['rps'] / results['wsgi']['rps']:.2f}x a vazão")
+    return 1 if any(r['errors'] for r in results.values()) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,36 @@
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def default_db(students, classes, enrollments):
+    return f'/tmp/gerenciamento-aulas-{students}-{classes}-{enrollments}.sqlite3'
+
+
+def setup_django(db):
+    os.environ['DB_ENGINE'] = 'sqlite'
+    os.environ['DB_NAME'] = db
+    os.environ.setdefault('DEBUG', '0')
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+    if BACKEND_DIR not in sys.path:
+        sys.path.insert(0, BACKEND_DIR)
+    import django
+    django.setup()
+
+
+def seed(students, classes, enrollments, instructors=50, prefix='bench'):
+    from django.core.management import call_command
+    from app.enrollments.models import Enrollment
+
+    call_command('migrate', run_syncdb=True, verbosity=0)
+    if Enrollment.objects.exists():
+        return
+    call_command(
+        'generate_load_data',
+        students=students,
+        instructors=instructors,
+        classes=classes,
+        enrollments=enrollments,
+        prefix=prefix,
+    )
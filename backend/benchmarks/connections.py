@@ -0,0 +1,107 @@
+"""
+Latência por requisição com e sem reaproveitamento da conexão ao banco.
+
+Atende requisições sequenciais autenticadas por JWT (`/api/auth/me/` e detalhe de
+aula) pelo `WSGIHandler`, que, como o gunicorn, fecha as conexões vencidas no início e
+no fim de cada requisição. Compara `CONN_MAX_AGE = 0` (uma conexão por requisição) com
+conexões persistentes, com e sem `CONN_HEALTH_CHECKS`, e conta as conexões abertas.
+Sobre SQLite abrir conexão é barato; `--connect-ms` soma um atraso a cada conexão nova
+para simular o handshake TLS e o login no SQL Server (`Encrypt=yes`). Com `--mssql`
+usa o banco configurado no ambiente (`.env`), que já deve ter os dados de
+`generate_load_data`; rode com `DB_CONNECTION_MODE=pool` para medir o pool do ODBC.
+
+Uso:
+    python -m benchmarks.connections --requests 500 --connect-ms 20
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+from benchmarks.common import BACKEND_DIR, default_db, seed, setup_django
+
+DATASET = {'students': 2000, 'classes': 500, 'enrollments': 20000}
+SCENARIOS = (
+    ('uma conexão por requisição', 0, False),
+    ('persistente', 60, False),
+    ('persistente + health check', 60, True),
+)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=500, help='Requisições medidas por cenário.')
+    parser.add_argument('--connect-ms', type=float, default=0, help='Atraso simulado por conexão nova.')
+    parser.add_argument('--mssql', action='store_true', help='Usa o banco do ambiente em vez de SQLite.')
+    parser.add_argument('--db', help='Arquivo SQLite (padrão: /tmp, por volume).')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    os.environ.setdefault('ASYNC_READ_VIEWS', '0')
+    if args.mssql:
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+        sys.path.insert(0, BACKEND_DIR)
+        import django
+        django.setup()
+    else:
+        setup_django(args.db or default_db(DATASET['students'], DATASET['classes'], DATASET['enrollments']))
+        seed(**DATASET)
+
+    from django.conf import settings
+    from django.contrib.auth import get_user_model
+    from django.core.handlers.wsgi import WSGIHandler
+    from django.db import connection
+    from django.db.backends.signals import connection_created
+    from django.test import RequestFactory
+    from django.urls import reverse
+    from rest_framework_simplejwt.tokens import RefreshToken
+    from app.classes.models import Class
+
+    opened = 0
+
+    def on_connect(**kwargs):
+        nonlocal opened
+        opened += 1
+        time.sleep(args.connect_ms / 1000)
+
+    connection_created.connect(on_connect)
+    settings.ALLOWED_HOSTS = ['*']
+    student = get_user_model().objects.filter(is_superuser=False, profile__role='').order_by('pk').first()
+    token = str(RefreshToken.for_user(student).access_token)
+    paths = [reverse('me'), reverse('classes-detail', args=[Class.objects.order_by('pk').values_list('pk', flat=True).first()])]
+    handler = WSGIHandler()
+    factory = RequestFactory()
+    failures = 0
+
+    def call(path):
+        nonlocal failures
+        statuses = []
+        response = handler(factory.get(path, HTTP_AUTHORIZATION=f'Bearer {token}').environ,
+                           lambda status, headers: statuses.append(status))
+        b''.join(response)
+        response.close()
+        failures += not statuses[0].startswith('200')
+
+    print(f"engine {connection.vendor}, modo {settings.DB_CONNECTION_MODE}, conexão simulada +{args.connect_ms} ms")
+    print(f"{'cenário':<30} {'p50 ms':>8} {'p95 ms':>8} {'conexões':>9}")
+    for label, max_age, health_checks in SCENARIOS:
+        connection.close()
+        connection.settings_dict['CONN_MAX_AGE'] = max_age
+        connection.settings_dict['CONN_HEALTH_CHECKS'] = health_checks
+        call(paths[0])
+        opened = 0
+        timings = []
+        for i in range(args.requests):
+            start = time.perf_counter()
+            call(paths[i % len(paths)])
+            timings.append((time.perf_counter() - start) * 1000)
+        print(f'{label:<30} {statistics.median(timings):>8.2f} '
+              f'{statistics.quantiles(timings, n=20)[-1]:>8.2f} {opened:>9}')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
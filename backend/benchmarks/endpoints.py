@@ -0,0 +1,318 @@
+"""
+Benchmarks por endpoint com orçamento de consultas, latência e memória.
+
+Percorre todas as rotas de `app/urls.py` com o cliente de testes do DRF (autenticado
+por JWT, como o frontend) sobre uma base SQLite gerada por `generate_load_data`.
+Para cada cenário mede a quantidade de consultas SQL, a latência p50/p95 e o pico
+de memória alocada, e compara com `benchmarks/baseline.json`. Escritas rodam dentro
+de uma transação desfeita ao final, então a base não muda entre repetições.
+Termina com código 1 quando o orçamento de consultas ou de memória é excedido ou alguma
+rota não é coberta. A latência depende da carga da máquina: acima da tolerância ela é
+apenas relatada, a menos que `--strict-latency` seja passado.
+
+Uso:
+    python -m benchmarks.endpoints                    # compara com a baseline
+    python -m benchmarks.endpoints --update-baseline  # regrava cenários novos ou com outra contagem de consultas
+    python -m benchmarks.endpoints --reset-baseline   # regrava a baseline inteira
+"""
+import argparse
+import gc
+import io
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.common import default_db, seed, setup_django
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+DEFAULT_DATASET = {'students': 2000, 'classes': 500, 'enrollments': 20000}
+IGNORED_ROUTES = {'api-root', 'classes-events'}  # stream SSE sem fim, exige ASGI
+PASSWORD = 'Senha@123'
+HARNESS_STATEMENTS = {'BEGIN', 'ROLLBACK'}
+LATENCY_SLACK_MS = 2.0
+MEMORY_SLACK_KIB = 64
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--update-baseline', action='store_true',
+                        help='Regrava só cenários novos ou cuja contagem de consultas mudou.')
+    parser.add_argument('--reset-baseline', action='store_true',
+                        help='Regrava todos os cenários (ex.: depois de mudar o volume de dados).')
+    parser.add_argument('--repeat', type=int, default=30)
+    parser.add_argument('--latency-tolerance', type=float, default=0.5,
+                        help='Folga relativa sobre o p95 da baseline (0.5 = +50%%).')
+    parser.add_argument('--strict-latency', action='store_true',
+                        help='Falha também quando o p95 passa da tolerância.')
+    parser.add_argument('--memory-tolerance', type=float, default=0.25)
+    parser.add_argument('--db', help='Arquivo SQLite (padrão: /tmp, por volume).')
+    for key in DEFAULT_DATASET:
+        parser.add_argument(f'--{key}', type=int)
+    return parser.parse_args()
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return {'dataset': DEFAULT_DATASET, 'endpoints': {}}
+    with open(path) as fh:
+        return json.load(fh)
+
+
+def merge_baseline(results, previous):
+    """
+    Cenários com a mesma contagem de consultas mantêm latência e memória já revisadas,
+    para que a baseline só mude onde o orçamento mudou (e não pelo ruído de cada execução).
+    """
+    return {
+        label: previous[label] if previous.get(label, {}).get('queries') == current['queries'] else current
+        for label, current in results.items()
+    }
+
+
+def png_upload(color=(30, 120, 200)):
+    from django.core.files.uploadedfile import SimpleUploadedFile
+    from PIL import Image
+    buf = io.BytesIO()
+    Image.new('RGB', (64, 64), color).save(buf, 'PNG')
+    return {'file': SimpleUploadedFile('avatar.png', buf.getvalue(), content_type='image/png')}
+
+
+def students_csv(class_id, rows=500):
+    from django.core.files.uploadedfile import SimpleUploadedFile
+    lines = ['username,email,first_name,classes'] + [
+        f'bench_import{i},bench_import{i}@ex.com,Aluno {i},{class_id}' for i in range(rows)
+    ]
+    content = '\n'.join(lines).encode()
+    return lambda: {'file': SimpleUploadedFile('alunos.csv', content, content_type='text/csv'), 'dry_run': True}
+
+
+def build_cases():
+    from django.contrib.auth import get_user_model
+    from django.urls import reverse
+    from django.utils import timezone
+    from rest_framework_simplejwt.tokens import RefreshToken
+    from app.classes.calendar import feed_token
+    from app.classes.models import Class
+    from app.enrollments.models import Enrollment
+    from app.users.avatars import process_avatar, stage_avatar
+
+    User = get_user_model()
+    admin, created = User.objects.get_or_create(
+        username='bench_admin', defaults={'is_superuser': True, 'is_staff': True}
+    )
+    if created:
+        admin.set_password(PASSWORD)
+        admin.save()
+    student = User.objects.get(username='bench_aluno0')
+    instructor = User.objects.get(username='bench_instrutor0')
+    enrollment = Enrollment.objects.filter(student=student).order_by('pk').first()
+    other = Enrollment.objects.exclude(student=student).order_by('pk').first()
+    klass = enrollment.class_ref
+    free_class = Class.objects.exclude(enrollments__student=student).order_by('pk').first()
+    cohort = list(
+        User.objects.filter(username__startswith='bench_aluno')
+        .exclude(enrollments__class_ref=free_class)
+        .order_by('pk').values_list('pk', flat=True)[:50]
+    )
+    avatar, _ = stage_avatar(png_upload((200, 120, 30))['file'])
+    process_avatar(avatar)
+    tokens = {
+        role: str(RefreshToken.for_user(user).access_token)
+        for role, user in (('student', student), ('instructor', instructor), ('admin', admin))
+    }
+    year, week, _ = timezone.localtime(klass.start_datetime).isocalendar()
+    new_class = {
+        'title': 'Benchmark',
+        'description': 'Aula criada pelo benchmark',
+        'start_datetime': (timezone.now() + timezone.timedelta(days=3)).isoformat(),
+    }
+
+    def case(route, role, method='get', args=(), query='', data=None, label=None, repeat=None, fmt='json'):
+        return {
+            'label': label or (f'{route} {method.upper()}' if method != 'get' else route),
+            'route': route,
+            'role': role,
+            'method': method,
+            'url': reverse(route, args=args) + query,
+            'data': data,
+            'format': fmt,
+            'repeat': repeat,
+        }
+
+    return tokens, [
+        case('schema', None, repeat=3),
+        case('docs', None),
+        case('redoc', None),
+        case('login', None, 'post', data={'username': student.username, 'password': PASSWORD}, repeat=5),
+        case('login', None, 'post', data={'username': student.email.upper(), 'password': PASSWORD}, repeat=5,
+             label='login POST e-mail'),
+        case('token_refresh', None, 'post', data={'refresh': str(RefreshToken.for_user(student))}),
+        case('me', 'student'),
+        case('me', 'student', 'patch', data={'first_name': 'Bench'}),
+        case('me-avatar', 'student', 'post', data=png_upload, fmt='multipart', repeat=10),
+        case('avatar-file', None, args=[avatar, 128]),
+        case('change-password', 'student', 'post',
+             data={'old_password': PASSWORD, 'new_password': 'Outra@Senha123'}, repeat=5),
+        case('users-search', 'student', query='?q=aluno1'),
+        case('users-list', 'instructor', query='?q=aluno1'),
+        case('users-import', 'admin', 'post', data=students_csv(free_class.pk), fmt='multipart',
+             label='users-import POST dry_run 500 linhas', repeat=5),
+        case('instructors-list', 'admin', query='?q=instrutor'),
+        case('classes-list', 'student'),
+        case('classes-list', 'student', query='?pagination=cursor&page_size=100',
+             label='classes-list cursor page_size=100'),
+        case('classes-list', 'student', query=f'?week={year}-W{week:02d}', label='classes-list ?week'),
+        case('classes-list', 'student', query='?upcoming=true', label='classes-list ?upcoming'),
+        case('classes-list', 'student', query='?include_archived=true', label='classes-list ?include_archived'),
+        case('classes-list', 'instructor', 'post', data=new_class),
+        case('classes-detail', 'student', args=[klass.pk]),
+        case('classes-detail', 'admin', 'patch', args=[klass.pk], data={'title': 'Renomeada'}),
+        case('classes-detail', 'admin', 'delete', args=[klass.pk]),
+        case('classes-calendar-link', 'student'),
+        case('classes-calendar', None, query=f'?token={feed_token(student)}'),
+        case('classes-cache-stats', 'admin'),
+        case('metrics', 'admin'),
+        case('classes-roster', 'instructor', args=[klass.pk]),
+        case('classes-bulk', 'admin', 'post',
+             data={'classes': [dict(new_class, title=f'Lote {i}') for i in range(50)]}),
+        case('enrollments-list', 'student'),
+        case('enrollments-list', 'instructor', query=f'?class_ref={klass.pk}', label='enrollments-list ?class_ref'),
+        case('enrollments-list', 'student', query='?include_archived=true', label='enrollments-list ?include_archived'),
+        case('enrollments-list', 'student', 'post', data={'class_ref': free_class.pk}),
+        case('enrollments-detail', 'student', args=[enrollment.pk]),
+        case('enrollments-detail', 'student', 'delete', args=[enrollment.pk]),
+        case('enrollments-export', 'admin', query='?format=ndjson', repeat=5),
+        case('enrollments-bulk', 'instructor', 'post', data={'class_ref': free_class.pk, 'students': cohort}),
+        case('enrollments-delete-by-class', 'student', 'delete', args=[klass.pk]),
+        case('enrollments-delete-by-class-and-student', 'instructor', 'delete',
+             args=[other.class_ref_id, other.student_id]),
+    ]
+
+
+def uncovered_routes(cases):
+    from django.urls import get_resolver
+    names = {key for key in get_resolver().reverse_dict.keys() if isinstance(key, str)}
+    return sorted(names - IGNORED_ROUTES - {c['route'] for c in cases})
+
+
+def measure(client, case, repeat):
+    from django.db import connection, transaction
+    from django.test.utils import CaptureQueriesContext
+
+    def call():
+        data = case['data']() if callable(case['data']) else case['data']
+        with transaction.atomic():
+            response = getattr(client, case['method'])(case['url'], data, format=case['format'])
+            for _ in response.streaming_content if response.streaming else ():
+                pass
+            if response.status_code >= 400:
+                raise RuntimeError(f"{case['label']}: HTTP {response.status_code} {getattr(response, 'data', '')}")
+            transaction.set_rollback(True)
+        return response
+
+    call()
+    connection.queries_log.clear()
+    with CaptureQueriesContext(connection) as ctx:
+        call()
+    queries = sum(1 for q in ctx.captured_queries if q['sql'] not in HARNESS_STATEMENTS)
+    gc.collect()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        call()
+        timings.append((time.perf_counter() - start) * 1000)
+    tracemalloc.start()
+    call()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        'queries': queries,
+        'p50_ms': round(statistics.median(timings), 2),
+        'p95_ms': round(statistics.quantiles(timings, n=20)[-1] if len(timings) > 1 else timings[0], 2),
+        'peak_kib': round(peak / 1024, 1),
+    }
+
+
+def compare(results, baseline, latency_tolerance, memory_tolerance):
+    """Devolve `(falhas, avisos)`: consultas e memória são orçamento; latência, só aviso."""
+    failures, warnings = [], []
+    for label, current in results.items():
+        budget = baseline.get(label)
+        if budget is None:
+            failures.append(f'{label}: sem orçamento na baseline')
+            continue
+        if current['queries'] > budget['queries']:
+            failures.append(f"{label}: {current['queries']} consultas (orçamento {budget['queries']})")
+        latency_limit = budget['p95_ms'] * (1 + latency_tolerance) + LATENCY_SLACK_MS
+        if current['p95_ms'] > latency_limit:
+            warnings.append(f"{label}: p95 {current['p95_ms']} ms (limite {latency_limit:.2f} ms)")
+        memory_limit = budget['peak_kib'] * (1 + memory_tolerance) + MEMORY_SLACK_KIB
+        if current['peak_kib'] > memory_limit:
+            failures.append(f"{label}: pico {current['peak_kib']} KiB (limite {memory_limit:.1f} KiB)")
+    return failures, warnings
+
+
+def main():
+    args = parse_args()
+    baseline = load_baseline(args.baseline)
+    dataset = {key: getattr(args, key) or baseline['dataset'].get(key, value) for key, value in DEFAULT_DATASET.items()}
+    setup_django(args.db or default_db(dataset['students'], dataset['classes'], dataset['enrollments']))
+    seed(**dataset)
+
+    from django.conf import settings
+    from django.test.utils import setup_test_environment
+    from rest_framework.test import APIClient
+    setup_test_environment()
+    logging.disable(logging.CRITICAL)
+    settings.MEDIA_ROOT = tempfile.mkdtemp(prefix='bench-media-')
+    settings.THROTTLE_RATES = {scope: '1000000/s' for scope in settings.THROTTLE_RATES}
+
+    tokens, cases = build_cases()
+    results = {}
+    print(f"{'endpoint':<48} {'queries':>7} {'p50 ms':>9} {'p95 ms':>9} {'pico KiB':>9}")
+    for case in cases:
+        client = APIClient()
+        if case['role']:
+            client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens[case['role']]}")
+        result = measure(client, case, case['repeat'] or args.repeat)
+        results[case['label']] = result
+        print(f"{case['label']:<48} {result['queries']:>7} {result['p50_ms']:>9} {result['p95_ms']:>9} {result['peak_kib']:>9}")
+
+    missing = uncovered_routes(cases)
+    rewrite = args.update_baseline or args.reset_baseline
+    if rewrite:
+        endpoints = results
+        if not args.reset_baseline and dataset == baseline['dataset']:
+            endpoints = merge_baseline(results, baseline['endpoints'])
+        with open(args.baseline, 'w') as fh:
+            json.dump({'dataset': dataset, 'endpoints': endpoints}, fh, indent=2, ensure_ascii=False)
+            fh.write('\n')
+        print(f'\nBaseline gravada em {args.baseline}.')
+    failures = [f'rota sem cenário: {name}' for name in missing]
+    if not rewrite:
+        budget_failures, latency_warnings = compare(
+            results, baseline['endpoints'], args.latency_tolerance, args.memory_tolerance
+        )
+        failures += budget_failures
+        if args.strict_latency:
+            failures += latency_warnings
+        elif latency_warnings:
+            print('\nLatência acima da tolerância (não falha; use --strict-latency):')
+            for warning in latency_warnings:
+                print(f'  - {warning}')
+    if failures:
+        print('\nOrçamentos excedidos:')
+        for failure in failures:
+            print(f'  - {failure}')
+        sys.exit(1)
+    print('\nTodos os endpoints dentro do orçamento.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+Vazão do login (`POST /api/auth/login/`) por custo de hash e forma de identificação.
+
+Para cada custo em `--iterations` regrava a senha de um aluno da base gerada com esse
+custo e mede logins sequenciais por username e por e-mail (um núcleo: o login é
+limitado pela CPU do PBKDF2). Mede também a resolução do e-mail isolada: a busca antiga
+`email__iexact` em `auth_user` contra o índice `UserProfile.email_normalized`, com e
+sem o cache.
+
+Uso:
+    python -m benchmarks.login --iterations 720000 260000 100000 --requests 20
+"""
+import argparse
+import statistics
+import sys
+import time
+
+from benchmarks.common import default_db, seed, setup_django
+
+DATASET = {'students': 20000, 'classes': 200, 'enrollments': 20000}
+PASSWORD = 'Senha@123'
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--iterations', type=int, nargs='+', default=[720000, 260000, 100000])
+    parser.add_argument('--requests', type=int, default=20, help='Logins medidos por custo e forma.')
+    parser.add_argument('--lookups', type=int, default=200, help='Resoluções de e-mail medidas.')
+    parser.add_argument('--db', help='Arquivo SQLite (padrão: /tmp, por volume).')
+    return parser.parse_args()
+
+
+def timed(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    args = parse_args()
+    setup_django(args.db or default_db(DATASET['students'], DATASET['classes'], DATASET['enrollments']))
+    seed(**DATASET)
+
+    from django.conf import settings
+    from django.contrib.auth import get_user_model
+    from django.core.cache import cache
+    from django.test.utils import override_settings
+    from django.urls import reverse
+    from rest_framework.test import APIClient
+    from app.users.auth import resolve_login
+
+    settings.THROTTLE_RATES = {scope: '1000000/s' for scope in settings.THROTTLE_RATES}
+    User = get_user_model()
+    user = User.objects.get(username=f"bench_aluno{DATASET['students'] - 1}")
+    client = APIClient()
+    url = reverse('login')
+    failures = 0
+
+    print(f"{'iterações':>10} {'forma':<9} {'p50 ms':>8} {'logins/s/núcleo':>16}")
+    for iterations in args.iterations:
+        with override_settings(PASSWORD_PBKDF2_ITERATIONS=iterations):
+            user.set_password(PASSWORD)
+            user.save(update_fields=['password'])
+            for label, identifier in (('username', user.username), ('e-mail', user.email.upper())):
+                def login():
+                    nonlocal failures
+                    response = client.post(url, {'username': identifier, 'password': PASSWORD}, format='json')
+                    failures += response.status_code != 200
+
+                ms = timed(login, args.requests)
+                print(f'{iterations:>10} {label:<9} {ms:>8.2f} {1000 / ms:>16.1f}')
+
+    email = user.email.upper()
+    legacy = timed(lambda: User.objects.get(email__iexact=email), args.lookups)
+
+    def cold():
+        cache.clear()
+        resolve_login(email)
+
+    indexed = timed(cold, args.lookups)
+    cached = timed(lambda: resolve_login(email), args.lookups)
+    print(f'\nresolução de e-mail ({User.objects.count()} usuários), p50 ms:')
+    print(f'  email__iexact: {legacy:.3f}   email_normalized: {indexed:.3f}   cache: {cached:.3f}')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,88 @@
+"""
+Planos de consulta das listagens antes/depois dos índices de acesso.
+
+Cria (ou reutiliza) uma base SQLite com o volume pedido, remove os índices
+declarados em `Class.Meta.indexes` e `Enrollment.Meta.indexes`, mede as consultas
+das listagens, recria os índices e mede novamente.
+
+Uso:
+    python -m benchmarks.query_plans --enrollments 1000000 --db /tmp/bench.sqlite3
+"""
+import argparse
+import statistics
+import time
+
+from benchmarks.common import default_db, seed, setup_django
+
+CLASSES_PER_STUDENT = 50
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--enrollments', type=int, default=1_000_000)
+    parser.add_argument('--classes', type=int, default=5_000)
+    parser.add_argument('--db', help='Arquivo SQLite (padrão: /tmp, por volume).')
+    parser.add_argument('--repeat', type=int, default=20)
+    return parser.parse_args()
+
+
+def cases():
+    from django.db.models import Exists, OuterRef
+    from app.classes.views import ClassViewSet
+    from app.enrollments.models import Enrollment
+    from app.enrollments.views import EnrollmentViewSet
+
+    student = Enrollment.objects.order_by('student_id').values_list('student_id', flat=True).first()
+    class_id = Enrollment.objects.order_by('class_ref_id').values_list('class_ref_id', flat=True).first()
+    return {
+        'classes-list (aluno)': lambda: ClassViewSet.queryset.annotate(enrolled=Exists(
+            Enrollment.objects.filter(class_ref=OuterRef('pk'), student_id=student)
+        ))[:20],
+        'enrollments-list (aluno)': lambda: EnrollmentViewSet.queryset.filter(student_id=student)[:20],
+        'enrollments-list ?class_ref': lambda: EnrollmentViewSet.queryset.filter(class_ref_id=class_id)[:20],
+        'enrollments-list (admin)': lambda: EnrollmentViewSet.queryset.order_by('-created_at', '-id')[:20],
+    }
+
+
+def measure(label, repeat):
+    from django.db import connection
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    print(f'\n=== {label}')
+    for name, build in cases().items():
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            list(build())
+            timings.append((time.perf_counter() - start) * 1000)
+        print(f'\n{name}: mediana {statistics.median(timings):.2f} ms')
+        for line in build().explain().splitlines():
+            print(f'    {line}')
+
+
+def toggle_indexes(add):
+    from django.db import connection
+    from app.classes.models import Class
+    from app.enrollments.models import Enrollment
+    with connection.schema_editor() as editor:
+        for model in (Class, Enrollment):
+            for index in model._meta.indexes:
+                (editor.add_index if add else editor.remove_index)(model, index)
+
+
+def main():
+    args = parse_args()
+    students = max(args.enrollments // CLASSES_PER_STUDENT, 1)
+    setup_django(args.db or default_db(students, args.classes, args.enrollments))
+    seed(students, args.classes, args.enrollments)
+
+    toggle_indexes(add=False)
+    try:
+        measure('sem índices de acesso', args.repeat)
+    finally:
+        toggle_indexes(add=True)
+    measure('com índices de acesso', args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,32 @@
+"""
+Pontos de entrada WSGI/ASGI usados por `benchmarks.asgi_vs_wsgi`.
+
+Iguais a `app/wsgi.py` e `app/asgi.py`, com um atraso opcional por consulta
+(`BENCH_DB_LATENCY_MS`) para simular a ida e volta de rede até o SQL Server
+quando o servidor roda sobre SQLite local.
+"""
+import os
+import time
+
+from django.db.backends.signals import connection_created
+
+LATENCY = float(os.getenv('BENCH_DB_LATENCY_MS', '0')) / 1000
+
+
+def _delay(execute, sql, params, many, context):
+    time.sleep(LATENCY)
+    return execute(sql, params, many, context)
+
+
+def _install_delay(sender, connection, **kwargs):
+    if _delay not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_delay)
+
+
+if LATENCY:
+    connection_created.connect(_install_delay)
+
+if os.getenv('BENCH_SERVER') == 'asgi':
+    from app.asgi import application
+else:
+    from app.wsgi import application
@@ -0,0 +1,70 @@
+"""
+Latência da busca de usuários (typeahead) numa base com 100k alunos.
+
+Compara, para cada texto de `--queries`, o filtro antigo (quatro `icontains` em OR,
+varredura da tabela) com `search_users` sobre o índice de tokens, no mesmo queryset
+da listagem de alunos (`StudentListView`), já avaliando a página devolvida.
+
+Uso:
+    python -m benchmarks.user_search --queries a al aluno9 aluno12345 "aluno 77" zzz
+"""
+import argparse
+import statistics
+import sys
+import time
+
+from benchmarks.common import default_db, seed, setup_django
+
+DATASET = {'students': 100_000, 'classes': 100, 'enrollments': 100_000}
+QUERIES = ['a', 'al', 'alu', 'aluno9', 'aluno12345', 'aluno 77', 'bench', 'zzz']
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--queries', nargs='+', default=QUERIES)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--db', help='Arquivo SQLite (padrão: /tmp, por volume).')
+    return parser.parse_args()
+
+
+def timed(fn, repeat):
+    fn()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    args = parse_args()
+    setup_django(args.db or default_db(DATASET['students'], DATASET['classes'], DATASET['enrollments']))
+    seed(**DATASET)
+
+    from django.conf import settings
+    from django.contrib.auth import get_user_model
+    from django.db.models import Q
+    from app.users.search import search_users
+
+    students = get_user_model().objects.filter(is_active=True, is_superuser=False, profile__role='')
+    limit = settings.USER_SEARCH_LIMIT
+
+    def legacy(q):
+        return list(students.filter(
+            Q(username__icontains=q) | Q(first_name__icontains=q) | Q(last_name__icontains=q)
+        ).order_by('username')[:limit])
+
+    def indexed(q):
+        return list(search_users(students, q))
+
+    print(f'{students.count()} alunos, até {limit} resultados')
+    print(f"{'q':<14} {'icontains ms':>13} {'índice ms':>10} {'resultados':>11}")
+    for q in args.queries:
+        print(f'{q!r:<14} {timed(lambda: legacy(q), args.repeat):>13.2f} '
+              f'{timed(lambda: indexed(q), args.repeat):>10.2f} {len(indexed(q)):>11}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -7,8 +7,10 @@ export type ClassItem = {
   start_datetime: string;
   instructor?: number | null;
   instructor_username?: string | null;
+  capacity?: number | null;
   participants_count?: number;
   enrolled?: boolean;
+  archived?: boolean;
 };
 
 type Paginated<T> = {
@@ -28,11 +30,26 @@ const extractResults = <T>(data: T[] | Paginated<T>): T[] => {
   return [];
 };
 
-export const getClasses = async (): Promise<ClassItem[]> => {
-  const { data } = await apiClient.get<ClassItem[] | Paginated<ClassItem>>('/api/classes/');
+export type ClassQuery = {
+  start_after?: string;
+  start_before?: string;
+  week?: string;
+  upcoming?: boolean;
+  include_archived?: boolean;
+  instructor?: number;
+  page_size?: number;
+};
+
+export const getClasses = async (params?: ClassQuery): Promise<ClassItem[]> => {
+  const { data } = await apiClient.get<ClassItem[] | Paginated<ClassItem>>('/api/classes/', { params });
   return extractResults(data);
 };
 
+export const getCalendarLink = async (): Promise<string> => {
+  const { data } = await apiClient.get<{ url: string }>('/api/classes/calendar-link/');
+  return data.url;
+};
+
 export const getClass = async (id: number): Promise<ClassItem> => {
   const { data } = await apiClient.get<ClassItem>(`/api/classes/${id}/`);
   return data;
@@ -43,6 +60,20 @@ export const createClass = async (payload: Partial<ClassItem>): Promise<ClassIte
   return data;
 };
 
+export type ClassRecurrence = Partial<ClassItem> & {
+  start_datetime: string;
+  weekdays: number[];
+  until: string;
+};
+
+export const createClassesBulk = async (payload: {
+  classes?: Partial<ClassItem>[];
+  recurrence?: ClassRecurrence;
+}): Promise<ClassItem[]> => {
+  const { data } = await apiClient.post<ClassItem[]>('/api/classes/bulk/', payload);
+  return data;
+};
+
 export const updateClass = async (id: number, payload: Partial<ClassItem>): Promise<ClassItem> => {
   const { data } = await apiClient.put<ClassItem>(`/api/classes/${id}/`, payload);
   return data;
@@ -51,3 +82,21 @@ export const updateClass = async (id: number, payload: Partial<ClassItem>): Prom
 export const deleteClass = async (id: number): Promise<void> => {
   await apiClient.delete(`/api/classes/${id}/`);
 };
+
+export type ClassEvent =
+  | { type: 'class.created' | 'class.updated' | 'class.count'; id: number; participants_count: number; capacity: number | null }
+  | { type: 'class.deleted'; id: number }
+  | { type: 'resync' };
+
+const CLASS_EVENT_TYPES = ['class.created', 'class.updated', 'class.deleted', 'class.count', 'resync'];
+
+export const subscribeClassEvents = (onEvent: (event: ClassEvent) => void, classIds?: number[]): (() => void) => {
+  const token = localStorage.getItem('token');
+  if (typeof EventSource === 'undefined' || !token) return () => {};
+  const params = new URLSearchParams({ token });
+  if (classIds?.length) params.set('classes', classIds.join(','));
+  const source = new EventSource(`${apiClient.defaults.baseURL}/api/classes/events/?${params}`);
+  const listener = (e: MessageEvent) => onEvent(JSON.parse(e.data));
+  CLASS_EVENT_TYPES.forEach((type) => source.addEventListener(type, listener as EventListener));
+  return () => source.close();
+};
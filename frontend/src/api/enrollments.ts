@@ -38,6 +38,20 @@ export const createEnrollment = async (classId: number, studentId?: number): Pro
   await apiClient.post('/api/enrollments/', payload);
 };
 
+export type BulkEnrollmentResult = {
+  created: number;
+  failed: number;
+  results: { class_ref: number; student: number; status: string }[];
+};
+
+export const createEnrollmentsBulk = async (classId: number, studentIds: number[]): Promise<BulkEnrollmentResult> => {
+  const { data } = await apiClient.post<BulkEnrollmentResult>('/api/enrollments/bulk/', {
+    class_ref: classId,
+    students: studentIds,
+  });
+  return data;
+};
+
 export const deleteEnrollment = async (enrollmentId: number): Promise<void> => {
   await apiClient.delete(`/api/enrollments/${enrollmentId}/`);
 };
@@ -49,3 +63,23 @@ export const deleteEnrollmentByClass = async (classId: number): Promise<void> =>
 export const deleteEnrollmentByClassForStudent = async (classId: number, studentId: number): Promise<void> => {
   await apiClient.delete(`/api/enrollments/by-class/${classId}/student/${studentId}/`);
 };
+
+export type ExportFormat = 'csv' | 'ndjson';
+
+export const exportEnrollments = async (
+  params: { class_ref?: number; student?: number; format?: ExportFormat } = {}
+): Promise<Blob> => {
+  const { data } = await apiClient.get<Blob>('/api/enrollments/export/', {
+    params: { format: 'csv', ...params },
+    responseType: 'blob',
+  });
+  return data;
+};
+
+export const exportClassRoster = async (classId: number, format: ExportFormat = 'csv'): Promise<Blob> => {
+  const { data } = await apiClient.get<Blob>(`/api/classes/${classId}/roster/`, {
+    params: { format },
+    responseType: 'blob',
+  });
+  return data;
+};
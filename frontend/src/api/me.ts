@@ -9,6 +9,7 @@ export type Me = {
   is_superuser?: boolean;
   groups?: string[];
   avatar_url?: string | null;
+  avatar_urls?: Record<string, string>;
 };
 
 export const getMe = async (): Promise<Me> => {
@@ -3,7 +3,7 @@ import { useNavigate } from 'react-router-dom';
 import { Plus, Calendar, Clock, BookOpen, User, Users } from 'lucide-react';
 import { format } from 'date-fns';
 import { ptBR } from 'date-fns/locale';
-import { getClasses, deleteClass, ClassItem } from '../api/classes';
+import { getClasses, deleteClass, subscribeClassEvents, ClassItem } from '../api/classes';
 import Navbar from '../components/Layout/Navbar';
 import Container from '../components/Layout/Container';
 import { Card } from '@/components/ui/card';
@@ -34,6 +34,19 @@ const Dashboard = () => {
       }
     };
     fetchClasses();
+    return subscribeClassEvents((event) => {
+      if (event.type === 'resync' || event.type === 'class.created' || event.type === 'class.updated') {
+        fetchClasses();
+      } else if (event.type === 'class.deleted') {
+        setClasses((prev) => prev.filter((x) => x.id !== event.id));
+      } else {
+        setClasses((prev) =>
+          prev.map((x) =>
+            x.id === event.id ? { ...x, participants_count: event.participants_count, capacity: event.capacity } : x
+          )
+        );
+      }
+    });
   }, []);
 
   const formatDate = (dateString: string) => {